@@ -24,16 +24,11 @@
 __version__ = '4.2.1'
 
 # scientific packages
-import matplotlib.pyplot as plt
-
 import scipy as sp
 import numpy as np
-import cmath, sys, os
-import scipy.optimize
-from scipy import interpolate
+import sys, os
 from scipy import constants
 from scipy.interpolate import splrep, sproot
-from scipy.stats import norm as scipy_norm
 from scipy.differentiate import derivative
 import lmfit
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
@@ -43,11 +38,12 @@ if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
 import pyqtgraph as pg
 import pyqtgraph.exporters  # is not imported automatically with pyqtgraph in newer versions
 from PyQt5 import QtCore
+from PyQt5.QtCore import QItemSelection, QItemSelectionModel
 from PyQt5.QtGui import QColor, QCursor, QFont, QIcon, QPixmap, QTextCursor
-from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QColorDialog, QDialog,
+from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QCheckBox, QColorDialog, QDialog,
                              QFileDialog, QInputDialog, QLabel, QMainWindow,
-                             QMessageBox, QProgressBar, QTextEdit,
-                             QTreeWidgetItem, QWidget)
+                             QMessageBox, QProgressBar, QPushButton, QSpinBox,
+                             QTextEdit, QTreeView, QWidget)
 
 # file writing/reading
 import configparser
@@ -61,7 +57,6 @@ import glob  # for fancy pathname handeling
 
 # miscellaneous
 from packaging.version import Version
-import sip  # includes C++ libaries
 from operator import itemgetter
 import ast
 from ast import literal_eval
@@ -79,11 +74,27 @@ from GUI_Regroup import Ui_Dialog_Regroup
 from GUI_Rename import Ui_Dialog_Rename
 from GUI_RemoveAll import Ui_Dialog_RemoveAll
 from pyArgand import ArgandPlotWidget
-
-# argument of the scipy.interpolate.interp1d interpolation function
-interp1d_kind = 'linear'
-
-#interp1d_kind = 'cubic' # probaly nicer, but very slow
+from pyArgandStore import ArgandStore, ArgandTreeModel
+from pyBatchFit import (MULTISTART_STARTS, bootstrap_summary, bootstrap_tasks,
+                        run_bootstrap, run_multistart_fits, run_yield_fits,
+                        yield_fit_task)
+from pyDatabase import ScatteringFactorDatabase, load_lattice_bases
+from pyDataIO import (DataFileError, ParsedFileCache, mismatched_energy_rows,
+                      normalize_to_I0, read_angles_file, read_refl_file,
+                      read_yield_file)
+from pyDynamical import (structure_factors, darwin_width_and_center,
+                         dynamical_branches,
+                         sample_reflectivity_and_phase,
+                         monochromator_reflectivity_and_phase)
+from pyFit import (REFL_TRACE_NAMES, fit_reflectivity_varpro,
+                   fit_yield_global, fit_yield_linear,
+                   reflectivity_initial_guess, reflectivity_residuals_batch,
+                   yield_chi2_landscape, yield_residuals,
+                   yield_residuals_batch)
+from pyFitTrace import FitTrace
+from pyModel import (ConvolutionEngine, NonDipolarModel, YieldBasis,
+                     electron_polarization_factor, plan_energy_grid,
+                     symmetric_energy_grid, yield_model)
 
 
 ## QDialog requesting the user to choose a group name suffix for regrouping
@@ -152,8 +163,8 @@ class Torricelli(QMainWindow):
         # event is happening without the need to reimplement the whole class.
         # This is very handy if you do not have the chance to reimplement the class
         # for example for  already existing objects that are defined external
-        # For QTreeWidget: One has to access the viewport (the white area) to catch the mouse events
-        self.ui.treeWidget_Argand_List.viewport().installEventFilter(self)
+        # For the QTreeView: One has to access the viewport (the white area) to catch the mouse events
+        self.treeView_Argand.viewport().installEventFilter(self)
         # eventFilter for Torricelli itself. for example for manipulating the keyPress event
         self.installEventFilter(self)
 
@@ -167,46 +178,15 @@ class Torricelli(QMainWindow):
         # for a list of events in QEvent
         # eventfilter for enable editing
         if event.type(
-        ) == QtCore.QEvent.MouseButtonRelease and source is self.ui.treeWidget_Argand_List.viewport(
+        ) == QtCore.QEvent.MouseButtonRelease and source is self.treeView_Argand.viewport(
         ):
             self.TreeWidgetMouseButtonReleasedEvent = event.button()
 
         elif event.type(
-        ) == QtCore.QEvent.MouseButtonDblClick and source is self.ui.treeWidget_Argand_List.viewport(
+        ) == QtCore.QEvent.MouseButtonDblClick and source is self.treeView_Argand.viewport(
         ):
             self.TreeWidgetMouseButtonReleasedEvent = event.type()
-
-        # eventfilter for updating groups when an item is added/removed from a group via drag/drop
-        if event.type() == QtCore.QEvent.DragEnter \
-           and len(self.ui.treeWidget_Argand_List.selectedItems()) > 0 \
-           and source is self.ui.treeWidget_Argand_List.viewport():
-            # items can be moved from several different groups
-            # saved in class variable because the groups should not be updated yet while dragging
-            # but after the drop event (while dragging the item is still part of its old parent!)
-            self.groupsChangedViaDrag.clear()
-            for item in self.ui.treeWidget_Argand_List.selectedItems():
-                self.groupsChangedViaDrag.add(item.parent())
-        elif event.type(
-        ) == QtCore.QEvent.Drop and source is self.ui.treeWidget_Argand_List.viewport(
-        ):
-            # first proceed with the original event handling, then adapt filter
-            self.ui.treeWidget_Argand_List.dropEvent(event)
-            itemThatReceivedIt = self.ui.treeWidget_Argand_List.itemAt(
-                event.pos())
-            if self.Argand_isGroup(itemThatReceivedIt):
-                parentThatReceivedIt = itemThatReceivedIt
-            else:
-                parentThatReceivedIt = itemThatReceivedIt.parent()
-            self.groupsChangedViaDrag.add(
-                parentThatReceivedIt
-            )  # group that received the item changed too
-            self.Argand_groupAverage(
-                gp_items=list(self.groupsChangedViaDrag), refresh=False)
-            # returning True interupts the handling of the event
-            # event handling stopps here. This is neccessary if you want your filter to
-            # be applied after the original event handling. In that case one should add something like
-            # SourceOfEventObject.theEvent(event) before the filter code
-            return True
+        # the groups that are changed by drag/drop are updated by the model (groupsChanged signal)
 
         # returning False lets the event continue
         # all eventfilter events are handled before proceeding with the event
@@ -254,14 +234,6 @@ class Torricelli(QMainWindow):
         else:
             return abs(roots[1] - roots[0])
 
-    ### Define the gaussian function normalized to its area, and centered to the given array
-    # The centering is very important to make sure the cross-correlation function will not end up shifted
-    # Input: -- Sigma of the gaussian
-    # -- An abscissa array
-    def normalized_gauss_centered(self, sigma, array):
-        g = scipy_norm.pdf(array, 0, sigma)
-        return g / sum(g)
-
     ## Looks for the Reflectivity data file and the CasaXPS output file
     ## Expected folder hierarchy: "anything/fileNumber_comment/region_n"
     ## Refl file in "anything/fileNumber_comment" or "anything/fileNumber_comment/region_n"
@@ -466,24 +438,14 @@ class Torricelli(QMainWindow):
 
     def load_angles(self):
         try:
-            with open(self.ui.lineEdit_angles_path.text(), 'r') as file_angles:
-                info0 = file_angles.readline()
-                info1 = file_angles.readline()
-                info2 = file_angles.readline()
-            with open(self.ui.lineEdit_angles_path.text(), 'r') as file_angles:
-                self.slice_to_angle = dict(
-                    np.loadtxt(
-                        file_angles,
-                        dtype={
-                            'names': ('slice', 'angle'),
-                            'formats': ("int", "float")
-                        },
-                        skiprows=5))
-
-            self.ui.label_angles_file_info.setText(info1 + info2[:-2])
+            info, self.slice_to_angle = self.data_files.load(
+                self.ui.lineEdit_angles_path.text(), read_angles_file)
+            self.ui.label_angles_file_info.setText(info)
         except IOError:
             self.ui.statusbar.showMessage(
                 '*** Problem with the slice to angles file. ***')
+        except DataFileError as error:
+            self.ui.statusbar.showMessage('*** ' + str(error) + ' ***')
 
     # Treats and plot the data as given by the user, and fill Torricelli arrays for later use
     # !! -> The Refl and EY are here normalized to I0
@@ -505,15 +467,17 @@ class Torricelli(QMainWindow):
         self.ui.checkBox_AngularModeToggle.setEnabled(True)
 
         # Read in the reflectivity data from the experiments (consists of 3 columns: energy, reflectivity, beam_intensity)
-        data_r = np.loadtxt(
-            str(self.ui.refl_name.text()), dtype="float", skiprows=1)
-
-        # The following lines extract the names of the columns in the yield data file
-        with open(str(self.ui.ey_name.text())) as data_ey_raw:
-            data_ey_raw.readline(), data_ey_raw.readline()
-            ey_column_name_line = data_ey_raw.readline()
+        # Both files are parsed once per session, and again only if they change on disk
+        try:
+            data_r = self.data_files.load(
+                str(self.ui.refl_name.text()), read_refl_file)
+            ey_table = self.data_files.load(
+                str(self.ui.ey_name.text()), read_yield_file)
+        except DataFileError as error:
+            QMessageBox.warning(self, "Warning", str(error))
+            return
 
-        ey_column_names = ey_column_name_line.split("\t")
+        ey_column_names = ey_table.column_names
         # The user chooses the component(s) and the corresponding column name(s) is(are) displayed below
         columns = str(self.ui.signal_name.text())
         if '' == columns:
@@ -531,15 +495,18 @@ class Torricelli(QMainWindow):
         self.ui.column_name_label.setText(", ".join(
             [ey_column_names[x] for x in ey_column_indices]))
 
-        data_ey = np.loadtxt(
-            str(self.ui.ey_name.text()), dtype="float", skiprows=3)
+        data_ey = ey_table.data
 
         # If the user do have several blocks into the CasaXPs output file, then it does not perform usual checks
         if self.ui.checkBox_AngularModeToggle.isChecked():
             np_photon_points = data_r.shape[
                 0]  # number of entries for each slice
-            self.nb_slices = data_ey.shape[
-                0] / np_photon_points  # calculate number of slices
+            try:
+                ey_slices = ey_table.slices(np_photon_points)
+            except ValueError as error:
+                print("\nERROR: " + str(error) + "\n")
+                return
+            self.nb_slices = ey_slices.shape[0]  # number of slices
 
             self.load_angles()
 
@@ -550,13 +517,8 @@ class Torricelli(QMainWindow):
                 self.ui.spinBox_SelectedSlice.setMaximum(self.nb_slices - 1)
                 self.ui.spinBox_SelectedSlice.setValue(self.nb_slices - 1)
 
-            if data_ey.shape[0] % np_photon_points != 0:
-                print("\nERROR: Could not calculate the number of slices!\n")
-                return
-
-            # extract data corrensponding to chosen slice
-            data_ey = data_ey[self.ui.spinBox_SelectedSlice.value()*np_photon_points:\
-                              (self.ui.spinBox_SelectedSlice.value()+1)*np_photon_points]
+            # data corresponding to the chosen slice (a view, nothing is copied)
+            data_ey = ey_slices[self.ui.spinBox_SelectedSlice.value()]
 
         if data_r.shape[0] != data_ey.shape[0]:
             QMessageBox.warning(
@@ -565,61 +527,31 @@ class Torricelli(QMainWindow):
             )
             return
 
-        i0 = data_r[:, 2]  # beam intensity
-        i0average = sum(data_r[:, 2]) / len(
-            data_r[:, 2])  # average beam intensity
-
-        xsw_energies = np.array([])
-        xsw_reflectivity_normalised = np.array([])
-        xsw_reflectivity_estimated_error = np.array([])
-        xsw_ey_normalised = np.array([])
-        xsw_ey_error_casaXPS = np.array([])
-        for i in range(len(
-                data_r[:, 0])):  # for each photon energy, normalized with I0
-            xsw_energies = np.append(xsw_energies, data_r[i, 0])
-            xsw_reflectivity_normalised = np.append(
-                xsw_reflectivity_normalised, data_r[i, 1] / i0[i] * i0average)
-            xsw_reflectivity_estimated_error = np.append(
-                xsw_reflectivity_estimated_error,
-                np.sqrt(data_r[i, 1] / i0[i] * i0average))
-
-            if abs(data_r[i, 0] - data_ey[i, 0]
-                  ) > 1e-1 and not self.ui.checkBox_AngularModeToggle.isChecked(
-                  ) and not self.ui.checkBox_ignore_hvCheck.isChecked():
+        if not self.ui.checkBox_AngularModeToggle.isChecked(
+        ) and not self.ui.checkBox_ignore_hvCheck.isChecked():
+            mismatched = mismatched_energy_rows(data_r[:, 0], data_ey[:, 0])
+            if len(mismatched) > 0:
                 QMessageBox.warning(
                     self, "Warning",
-                    'The photon energies of the reflectivity and electron yield files do not match!'
-                )
+                    'The photon energies of the reflectivity and electron yield files do not match!\n'
+                    + '\n'.join('Point %i: %g eV (refl.) and %g eV (yield)' %
+                                 (i, data_r[i, 0], data_ey[i, 0])
+                                 for i in mismatched))
                 return
 
-            tmp_ey_norm = 0.0
-            tmp_ey_err_squared = 0.0
-            for comp_index in range(
-                    len(self.Components_List_Used_in_EYfit
-                       )):  # for each fit component desired by the user
-                component_number = self.Components_List_Used_in_EYfit[
-                    comp_index]
-                component_col_number = 1 + 2 * component_number  # component_col_number+1 is corresponding the error
-                if component_col_number + 1 >= data_ey.shape[1]:
-                    QMessageBox.warning(
-                        self, "Warning",
-                        'The component number you asked for does not exist!')
-                tmp_ey_norm += data_ey[i, component_col_number]
-                tmp_ey_err_squared += data_ey[
-                    i, component_col_number +
-                    1]**2  # sum up the squares of the errors
-
-            xsw_ey_normalised = np.append(xsw_ey_normalised,
-                                          tmp_ey_norm / i0[i] * i0average)
-            xsw_ey_error_casaXPS = np.append(
-                xsw_ey_error_casaXPS,
-                np.sqrt(tmp_ey_err_squared) / i0[i] * i0average)
-
-        self.Exp_photonEnergy = xsw_energies
-        self.Exp_Refl_Normalised = xsw_reflectivity_normalised
-        self.Exp_Refl_Estimated_Error = xsw_reflectivity_estimated_error
-        self.Exp_EY_Normalised = xsw_ey_normalised
-        self.Exp_EY_casaXPS_Error = xsw_ey_error_casaXPS
+        # normalization to I0 of the reflectivity and of the sum of the fit components
+        try:
+            experimental = normalize_to_I0(data_r, data_ey,
+                                           self.Components_List_Used_in_EYfit)
+        except IndexError as error:
+            QMessageBox.warning(self, "Warning", str(error))
+            return
+
+        self.Exp_photonEnergy = experimental['energy']
+        self.Exp_Refl_Normalised = experimental['refl']
+        self.Exp_Refl_Estimated_Error = experimental['refl_error']
+        self.Exp_EY_Normalised = experimental['ey']
+        self.Exp_EY_casaXPS_Error = experimental['ey_error']
 
         ## Move the experimental photon energy axis relative to the theoretical Bragg energy
         self.Exp_photonEnergy_BraggCentered = self.Exp_photonEnergy - self.ui.doubleSpinBox_ndp_EBragg.value(
@@ -718,8 +650,9 @@ class Torricelli(QMainWindow):
                     np.pi / 180.))  # same as P= cos (2 theta.)
             self.ui.label_pol.setText("\u03C0" + '-polarization')
             self.ui.doubleSpinBox_EYinit_Pe.setEnabled(True)
-            P_electrons = np.sin( self.ui.doubleSpinBox_ndp_phi.value()*np.pi/180 - 2*self.ui.doubleSpinBox_sample_deviation_NI.value()*np.pi/180 )\
-              / np.sin( self.ui.doubleSpinBox_ndp_phi.value()*np.pi/180 )
+            P_electrons = electron_polarization_factor(
+                self.ui.doubleSpinBox_ndp_phi.value(),
+                self.ui.doubleSpinBox_sample_deviation_NI.value())
         self.ui.doubleSpinBox_EYinit_Pe.setValue(P_electrons)
 
     ## return the crystal system given the lattice distances and angles
@@ -931,24 +864,6 @@ class Torricelli(QMainWindow):
             self.ui.comboBox_Sample_Compound_DWMethod.addItem('Zywietz')
         self.ui.comboBox_Sample_Compound_DWMethod.addItem('None')
 
-    ## returns the interpolated value of the variable 'name_y', for a given 'value_x'
-    # reads the data from the csv file 'fname'
-    def interpolate_value_from_csv_file(self,
-                                        fname,
-                                        name_x,
-                                        value_x,
-                                        name_y,
-                                        delim=','):
-        with open(fname, 'r') as csvFile:
-            spamreader = csv.DictReader(csvFile, delimiter=delim)
-            X = []
-            Y = []
-            for row in spamreader:
-                X.append(float(row[name_x]))
-                Y.append(float(row[name_y]))
-            f = sp.interpolate.interp1d(X, Y)  # linear interpolation
-            return f(value_x)
-
     # Clear all structure factor values and theoretical curves as soon as some parameter is changed.
     def clear_structFact_display(self):
         self.Pyqt_View_idealRefl.clear()
@@ -1087,404 +1002,60 @@ class Torricelli(QMainWindow):
                     lambda_bragg**2) / (
                         np.pi * vol_unit_cell_DCM)
 
-        # the minimum and the maximum values of this energy interval could be reduced in order to speed up the calculation, provided that it´s always bigger than the experimental energy range
-        x_min = -self.ui.doubleSpinBox_theoReflRange.value()
-        x_max = self.ui.doubleSpinBox_theoReflRange.value()
-        dx = 0.02  # energy step of this theoretical array of energies
-
-        self.Theory_photonEnergy = np.arange(
-            x_min, x_max + dx,
-            dx)  # array of energies relative to the theoretical Bragg energy
-        self.Theory_Refl_sample = np.zeros(len(self.Theory_photonEnergy))
-        self.Theory_Phase_Sample = np.zeros(len(self.Theory_photonEnergy))
-        self.Theory_Refl_Monochromator = np.zeros(len(self.Theory_photonEnergy))
-        self.Theory_Phase_Monochromator = np.zeros(
-            len(self.Theory_photonEnergy))
-        
-        #########################################################
-        #########################################################
-        #########################################################
-        #########################################################
-        ##            2026.04.  S.Subach    Here I introduce several variables to test formalism and equations
-        ##             lines 1108 - 1160
-
-        eta_cr_img = []
-        eta_cr_real = []
-        eta_cr_sqr_img = []
-        eta_cr_sqr_real = []
-        sqrt_eta_cr_img = []
-        sqrt_eta_cr_real = []
-        eTTA_pl_imag = []
-        eTTA_pl_real = []
-        eTTA_mi_imag = []
-        eTTA_mi_real = []
-
-        sqrt_eta_keyForm_real = []
-        sqrt_eta_keyForm_imag = []
-
-        energy = []
-
-        E_plus_cr_img= []
-        E_plus_cr_real= []
-        E_minus_cr_img= []
-        E_minus_cr_real= []
-        Phase_minus_cr= []
-        Phase_plus_cr= []
-        Ref_minus_cr= []
-        Ref_plus_cr= []
-
-        der_refl_plus = []
-        der_refl_minus = []
-
-        Refl_Theo_final = []
-        Phase_Theo_final = []
-        E_real_combined = []
-
-        Term_1 = []
-        Term_2 = []
-        Term_3 = []
-        Term_4 = []
-        Term_5 = []
-        Term_6 = []
-        Term_7 = []
-        Term_8 = []
-        Term_9 = []
-        Term_10 = []
-
-        Diff_plus = []
-        Diff_minus = []
-
-        SQRT_Values = []
-
-        #########################################################
-        #########################################################
-        #########################################################
-        #########################################################
-
-
-
-
-        #print("===============================================================")
-        # calculate eta, refl and phase for each photon energy.
-        for i in range(int((x_max - x_min) / dx) + 1):
-            # Calculate Eta of crystal
-            eta_cr = ( 2*self.b_cr*( self.Theory_photonEnergy[i]/E_bragg )*(np.sin(self.ui.doubleSpinBox_theta.value()*np.pi/180))**2 + gamma_cr*F_0*(1-self.b_cr)/2 )\
-              / ( np.absolute(P)*gamma_cr*np.sqrt(np.absolute(self.b_cr)*F_H*F_Hbar) )
-        
-            if (np.real(eta_cr) > 0):
-                critical_point_index = i
-
-            # Calculate Eta of monochromator
-            eta_mo = ( 2*b_mo*( self.Theory_photonEnergy[i]/E_bragg )*(np.sin(theta_bragg_mo))**2 + gamma_mo*F_0_DCM*(1-b_mo)/2 )\
-              / ( np.absolute(P_DCM)*gamma_mo*np.sqrt(np.absolute(b_mo)*F_H_DCM*F_Hbar_DCM) )
-
-            ## Sample crystal:
-            ######  Next few lines are from the original version, calculating ideal reflectivity and phase of the crystal // 2026.04 S.Subach
-
-            EH_over_EO_plus_cr  = -1 * (P / np.abs(P)) * ( eta_cr + np.sqrt(eta_cr**2 - 1)) * np.sqrt( np.absolute(self.b_cr) * F_H / F_Hbar)
-            EH_over_EO_minus_cr = -1 * (P / np.abs(P)) * ( eta_cr - np.sqrt(eta_cr**2 - 1)) * np.sqrt( np.absolute(self.b_cr) * F_H / F_Hbar)
-            phi_plus_cr  = np.arctan( np.imag(EH_over_EO_plus_cr ) / np.real(EH_over_EO_plus_cr ))
-            phi_minus_cr = np.arctan( np.imag(EH_over_EO_minus_cr) / np.real(EH_over_EO_minus_cr))
-            refl_plus_cr  = np.abs(EH_over_EO_plus_cr )**2
-            refl_minus_cr = np.abs(EH_over_EO_minus_cr)**2
-
-            
-
-
-
-            ###################################
-            ###################################
-            ###################################
-            ##         2026.04 S.Subach
-
-            energy.append(self.Theory_photonEnergy[i])
-
-            eta_cr_img.append(np.imag(eta_cr))
-            eta_cr_real.append(np.real(eta_cr))
-
-            eta_cr_sqr_img.append(np.imag(eta_cr**2 - 1))
-            eta_cr_sqr_real.append(np.real(eta_cr**2 - 1))
-
-            # square root of (eta_cr**2 - 1) using key formulae https://www.cuemath.com/algebra/square-root-of-complex-number/
-            abs_z = np.abs( np.sqrt(np.real(eta_cr**2 - 1)**2 + np.imag(eta_cr**2 - 1)**2) )     
-            sqrt_eta_key_real = np.sqrt((abs_z + np.real(eta_cr**2 - 1))/2)
-            sqrt_eta_key_imag = np.sqrt((abs_z - np.real(eta_cr**2 - 1))/2) * np.imag(eta_cr**2 - 1) / np.abs(np.imag(eta_cr**2 - 1))
-            sqrt_eta_keyForm_real.append(sqrt_eta_key_real)
-            sqrt_eta_keyForm_imag.append(sqrt_eta_key_imag)
-
-            # square root of (eta_cr**2 - 1) using numpy 
-            sqrt_eta_cr_img.append(np.imag(np.sqrt(eta_cr**2 - 1)))
-            sqrt_eta_cr_real.append(np.real(np.sqrt(eta_cr**2 - 1)))
-
-
-
-            E_plus_cr_img.append(np.imag(EH_over_EO_plus_cr))
-            E_plus_cr_real.append(np.real(EH_over_EO_plus_cr))
-            E_minus_cr_img.append(np.imag(EH_over_EO_minus_cr))
-            E_minus_cr_real.append(np.real(EH_over_EO_minus_cr))
-
-            Phase_minus_cr.append(phi_minus_cr)
-            Phase_plus_cr.append(phi_plus_cr)
-            Ref_minus_cr.append(refl_minus_cr)
-            Ref_plus_cr.append(refl_plus_cr)
-
-            Diff_plus.append(0)
-            Diff_minus.append(0)
-            if (i > 0):
-                Diff_plus[i] = Ref_plus_cr[i] - Ref_plus_cr[i-1]
-                Diff_minus[i] = Ref_minus_cr[i] - Ref_minus_cr[i-1]
-                #print (i, '    ', Diff_plus[i], '    ', (Ref_plus_cr[i] - Ref_plus_cr[i-1]))
-                Diff_plus[0] = Diff_plus[1]
-                Diff_minus[0] = Diff_minus[1]
-                      
-
-            Term_10.append(F_0 / (np.sqrt(F_H*F_Hbar) ))
-
-            if (refl_plus_cr > 0) and (refl_plus_cr):  #chacking first choce condition
-                
-
-                Term_1.append(refl_minus_cr)
-                Term_2.append((phi_minus_cr)/np.pi)
-                if (np.real(EH_over_EO_minus_cr) > 0):    #chacking second choce condition
-                    Term_3.append((phi_minus_cr+np.pi)/np.pi)
-                else:
-                    Term_3.append((phi_minus_cr)/np.pi)
-            else:
-                Term_1.append(refl_plus_cr)
-                Term_2.append(phi_plus_cr/np.pi)
-                Term_3.append(phi_plus_cr/np.pi)
-
-            ###################################
-            ###################################
-            ###################################
-
-
-
-
-            ######.  Outdated (wrong) way to choose reflectivity and phase of the crystal // 2026.04 S.Subach
-
-            #print np.real(EH_over_EO_minus_cr)
-            if refl_plus_cr > 0 and refl_plus_cr < 1:  # choose the branch that has a physically meaningful reflectivity.
-                self.Theory_Refl_sample[i] = refl_plus_cr
-                self.Theory_Phase_Sample[i] = phi_plus_cr
-
-                if np.real(EH_over_EO_plus_cr) < 0 and self.ui.radioButton_sigma_pol_light.isChecked():  # from Zegenhagen 1993 Eq. 2.10, 2.11
-                    self.Theory_Phase_Sample[i] += np.pi
-                # Taking change of sign in real(EH/E0) into account due to the change of sign in the polarization factor when using pi-polarization
-                elif np.real(EH_over_EO_plus_cr) > 0 and self.ui.radioButton_pi_pol_light.isChecked():
-                    self.Theory_Phase_Sample[i] += np.pi
-                    #print("PLU+pi: {:6.2f} eV | *refl_plus: {:8.2f} | refl_minus: {:8.2f} | *phi_plus: {:8.2f} | phi_minus: {:8.2f} | R(EH_over_EO_plus) {:8.8f}".format(self.Theory_photonEnergy[i], refl_plus_cr, refl_minus_cr, phi_plus_cr + np.pi, phi_minus_cr + np.pi, np.real(EH_over_EO_plus_cr)))
-                else:
-                    pass
-                    #print("PLU:    {:6.2f} eV | *refl_plus: {:8.2f} | refl_minus: {:8.2f} | *phi_plus: {:8.2f} | phi_minus: {:8.2f} | R(EH_over_EO_plus) {:8.8f}".format(self.Theory_photonEnergy[i], refl_plus_cr,refl_minus_cr,phi_plus_cr,phi_minus_cr, np.real(EH_over_EO_plus_cr)))
-                
-            else: # Go for minus branch
-                self.Theory_Refl_sample[i] = refl_minus_cr
-                self.Theory_Phase_Sample[i] = phi_minus_cr
-
-                if np.real(EH_over_EO_minus_cr) < 0 and self.ui.radioButton_sigma_pol_light.isChecked():  # from Zegenhagen 1993 Eq. 2.10, 2.11
-                    self.Theory_Phase_Sample[i] += np.pi
-                # Taking change of sign in real(EH/E0) into account due to the change of sign in the polarization factor when using pi-polarization
-                elif np.real(EH_over_EO_minus_cr) > 0 and self.ui.radioButton_pi_pol_light.isChecked():
-                    self.Theory_Phase_Sample[i] += np.pi
-                    #print("MIN+pi: {:6.2f} eV | refl_plus: {:8.2f} | *refl_minus: {:8.2f} | phi_plus: {:8.2f} | *phi_minus: {:8.2f} | R(EH_over_EO_minus) {:8.8f}".format(self.Theory_photonEnergy[i], refl_plus_cr, refl_minus_cr, phi_plus_cr + np.pi, phi_minus_cr + np.pi, np.real(EH_over_EO_minus_cr)))
-                else:
-                    pass
-                    #print("MIN:    {:6.2f} eV | refl_plus: {:8.2f} | *refl_minus: {:8.2f} | phi_plus: {:8.2f} | *phi_minus: {:8.2f}  | R(EH_over_EO_minus) {:8.8f}".format(self.Theory_photonEnergy[i], refl_plus_cr, refl_minus_cr, phi_plus_cr, phi_minus_cr, np.real(EH_over_EO_minus_cr)))
-
-            ######.  Outdated (wrong) way to choose reflectivity and phase of the monochromator // 2026.04 S.Subach
-            ######.  But since for monochromator in a general case it is irrelevant, I dont change this part // 2026.04 S.Subach
-
-            ## monochromator:
-            EH_over_EO_plus_mo = -1 * (P_DCM / np.absolute(P_DCM)) * (
-                eta_mo + np.sqrt(eta_mo**2 - 1)) * np.sqrt(
-                    np.absolute(b_mo) * F_H_DCM / F_Hbar_DCM)
-            EH_over_EO_minus_mo = -1 * (P_DCM / np.absolute(P_DCM)) * (
-                eta_mo - np.sqrt(eta_mo**2 - 1)) * np.sqrt(
-                    np.absolute(b_mo) * F_H_DCM / F_Hbar_DCM)
-            phi_plus_mo = np.arctan(
-                np.imag(EH_over_EO_plus_mo) / np.real(EH_over_EO_plus_mo))
-            phi_minus_mo = np.arctan(
-                np.imag(EH_over_EO_minus_mo) / np.real(EH_over_EO_minus_mo))
-            refl_plus_mo = np.absolute(EH_over_EO_plus_mo)**2
-            refl_minus_mo = np.absolute(EH_over_EO_minus_mo)**2
-  
-            if refl_minus_mo > 0 and refl_minus_mo < 1:  # choose the branch that has a physically meaningful reflectivity.
-                self.Theory_Refl_Monochromator[i] = refl_minus_mo
-                self.Theory_Phase_Monochromator[i] = phi_minus_mo
-                if np.real(EH_over_EO_plus_mo) < 0:
-                    self.Theory_Phase_Monochromator[i] += np.pi
-            else:
-                self.Theory_Refl_Monochromator[i] = refl_plus_mo
-                self.Theory_Phase_Monochromator[i] = phi_plus_mo
-                
-
-
-        ###################################
-        ###################################
-        ###################################
-        ##         2026.04 S.Subach
-
-        if True:  ######.  This is a corrected choice of reflectivity and phase // 2026.04 S.Subach
-
-            print ('!!!!!!!!!!!!!!!!!!!!!')
-
-            print('critical point at the index' , critical_point_index)
-            print (energy[critical_point_index], '  ', sqrt_eta_cr_img[critical_point_index])
-            print (energy[critical_point_index+1], '  ',sqrt_eta_cr_img[critical_point_index+1])
-
-
-            Refl_Plus_Cr_at_Left_Side = 1
-            for i in range(critical_point_index+1):
-                if (Ref_plus_cr[i] < 0) or (Ref_plus_cr[i] > 1):
-                    Refl_Plus_Cr_at_Left_Side = 0      
-            if (Refl_Plus_Cr_at_Left_Side == 1):
-                print('On left side Refl_Plus_Cr,  on right side Refl_Minus_Cr')
-            else:
-                print('On left side Refl_Minus_Cr,  on right side Refl_Plus_Cr')
-
-            Refl_Plus_Cr_at_Right_Side = 1
-            for i in range(critical_point_index+1, int((x_max - x_min) / dx) + 1):
-                if (Ref_plus_cr[i] < 0) or (Ref_plus_cr[i] > 1):
-                    Refl_Plus_Cr_at_Right_Side = 0
-            if (Refl_Plus_Cr_at_Right_Side ==1):
-                print('On left side Refl_Minus_Cr,  on right side Refl_Plus_Cr')
-            else:
-                print('On left side Refl_Plus_Cr,  on right side Refl_Minus_Cr')
-
-            if (Refl_Plus_Cr_at_Right_Side == Refl_Plus_Cr_at_Left_Side):
-                print('PR)BLEM')
-
-
-
-            for i in range(critical_point_index+1):
-                if (Refl_Plus_Cr_at_Left_Side == 1):
-                    Refl_Theo_final.append(Ref_plus_cr[i])
-                    Phase_Theo_final.append(Phase_plus_cr[i])
-                    E_real_combined.append(E_plus_cr_real[i])
-                else:
-                    Refl_Theo_final.append(Ref_minus_cr[i])
-                    Phase_Theo_final.append(Phase_minus_cr[i])
-                    E_real_combined.append(E_minus_cr_real[i])
-                if  (E_real_combined[i] > 0) and self.ui.radioButton_pi_pol_light.isChecked():  ###### only for pi-piolarization
-                    Phase_Theo_final[i] += np.pi 
-                if (E_real_combined[i] < 0) and self.ui.radioButton_sigma_pol_light.isChecked():   ###### only for sigma-piolarization
-                    Phase_Theo_final[i] += np.pi 
-
-            
-            for i in range(critical_point_index+1, int((x_max - x_min) / dx) + 1):
-                if (Refl_Plus_Cr_at_Left_Side == 1):
-                    Refl_Theo_final.append(Ref_minus_cr[i])
-                    Phase_Theo_final.append(Phase_minus_cr[i])
-                    E_real_combined.append(E_minus_cr_real[i])
-                else:
-                    Refl_Theo_final.append(Ref_plus_cr[i])
-                    Phase_Theo_final.append(Phase_plus_cr[i])
-                    E_real_combined.append(E_plus_cr_real[i])
-                if  (E_real_combined[i] > 0) and self.ui.radioButton_pi_pol_light.isChecked():   ###### only for pi-piolarization
-                    Phase_Theo_final[i] += np.pi 
-                if (E_real_combined[i] < 0) and self.ui.radioButton_sigma_pol_light.isChecked():   ###### only for sigma-piolarization
-                    Phase_Theo_final[i] += np.pi 
-
-
-
-        if False: ######.  Plotting different parameters in a separate window for debugging // 2026.04 S.Subach
-            
-            #print (Ref_plus_cr[0])
-            print ('!!!!!!!!!!!!!!!!!!!!!')
-            #print (energy[0])
-            #print (np.gradient(Ref_plus_cr, energy))
-
-            #plt.plot(energy, E_plus_cr_img, color = "green",  label = "EH_over_EO_plus_cr - Imaginary")
-            #plt.plot(energy, E_plus_cr_real, color = "blue",  label = "EH_over_EO_plus_cr - Real")
-            #plt.plot(energy, E_minus_cr_img, color = "green",  label = "EH_over_EO_minus_cr - Imaginary")
-            #plt.plot(energy, E_minus_cr_real, color = "blue",  label = "EH_over_EO_minus_cr - Real")
-
-            #plt.plot(energy, Phase_plus_cr, color = "black",  label = "phi_plus_cr")
-            #plt.plot(energy, Phase_minus_cr, color = "orange",  label = "phi_minus_cr")
-            #plt.plot(energy, Ref_plus_cr, color = "black",  label = "refl_plus_cr")
-            #plt.plot(energy, Ref_minus_cr, color = "orange",  label = "refl_minus_cr")
-
-            plt.plot(energy, Refl_Theo_final, color = "blue",  label = "Refl_Theo_combined")
-            plt.plot(energy, Phase_Theo_final, color = "green",  label = "Phase_Theo_combined")
-            #plt.plot(energy, E_real_combined, color = "green",  label = "EH_over_EO_minus/plus_cr")
-
-            #plt.plot(energy, (np.gradient(Ref_plus_cr, energy)), color = "red",  label = "deriv of refl_plus_cr")
-            #plt.plot(energy, (np.gradient(Ref_minus_cr, energy)), color = "blue",  label = "deriv of refl_minus_cr")
-
-            #plt.plot(energy, Diff_plus, color = "red",  label = "diff of refl_plus_cr")
-            #plt.plot(energy, Diff_minus, color = "blue",  label = "diff of refl_minus_cr")
-            
-            #plt.plot(energy, Term_1, color = "black",  label = "refl_combined")
-            #plt.plot(energy, Term_3, color = "orange",  label = "phase_combined")
-
-            #plt.plot(energy, eta_cr_img, color = "black",  linestyle = "dashed", label = "eta_cr_imag")
-            #plt.plot(energy, eta_cr_real, color = "orange",  linestyle = "dashed", label = "eta_cr_real")
-
-            #plt.plot(energy, eta_cr_sqr_img, color = "black",  label = "imag(eta_cr**2 - 1)")
-            #plt.plot(energy, eta_cr_sqr_real, color = "orange",  label = "real(eta_cr**2 - 1)")
-
-            #plt.plot(energy, sqrt_eta_cr_img, color = "black",  label = "imag sqrt(eta_cr**2 - 1)")
-            #plt.plot(energy, sqrt_eta_cr_real, color = "orange",  label = "real sqrt(eta_cr**2 - 1)")
-
-            #plt.plot(energy, sqrt_eta_keyForm_imag, color = "black",  label = "Imag sqrt(eta_cr**2 - 1)")
-            #plt.plot(energy, sqrt_eta_keyForm_real, color = "orange",  label = "Real sqrt(eta_cr**2 - 1)")
-
-            
-            #plt.plot(energy, np.imag(Term_10), color = "black",  label = "imag F_0/sqrt(F_H*F_Hbar)")
-            #plt.plot(energy, np.real(Term_10), color = "orange",  label = "real F_0/sqrt(F_H*F_Hbar)")
-
-            plt.xlim(0, 0.25)
-            plt.xlim(-1, 1)
-            #plt.ylim(-1, 1)
-            plt.ylim(-0.2, 3.2)
-
-            plt.axhline(y=0, color='r', linestyle='-')
-            plt.axvline(x=energy[critical_point_index], color='red', linestyle='-')
-
-            plt.legend()
-            plt.show()
-
-        if True: ######.  This overwrites ranges of reflectivity and phase chosen according to the original
-                 ######.   version (lines 1260-1290) and substitute by the correctly chosen ranges (lines 1360-1380).    // 2026.04 S.Subach
-            for i in range(int((x_max - x_min) / dx) + 1):
-                self.Theory_Refl_sample[i] = Refl_Theo_final[i]
-                self.Theory_Phase_Sample[i] = Phase_Theo_final[i]
-
-
-        ###################################
-        ###################################
-        ###################################
-
-
-
+        # The energy step resolves the narrowest Darwin curve (and the fitted sigma); once experimental data are
+        # imported, the range covers them plus the support of the kernels, unless the range of the GUI is
+        # set manually. Until then, the range of the GUI is used.
+        # The current offset DeltaE is added on both sides, so the shifted data stay inside the grid.
+        width_cr, center_cr = darwin_width_and_center(
+            E_bragg, np.sin(self.ui.doubleSpinBox_theta.value() * np.pi / 180),
+            self.b_cr, P, gamma_cr, F_0, F_H, F_Hbar)
+        width_mo, center_mo = darwin_width_and_center(
+            E_bragg, np.sin(theta_bragg_mo), b_mo, P_DCM, gamma_mo, F_0_DCM,
+            F_H_DCM, F_Hbar_DCM)
+        x_max, dx = plan_energy_grid(
+            [width_cr, width_mo], [center_cr, center_mo],
+            self.ui.doubleSpinBox_ReflFit_sigma.value(),
+            self.Exp_photonEnergy_BraggCentered,
+            self.ui.doubleSpinBox_theoReflRange.value(),
+            self.ui.doubleSpinBox_ReflFit_InitVal_DeltaE.value(),
+            self.checkBox_theoReflRange_manual.isChecked())
+
+        self.Theory_photonEnergy = symmetric_energy_grid(
+            x_max, dx)  # array of energies relative to the theoretical Bragg energy, with one point at 0
+
+        # eta, both EH/E0 branches, reflectivity and phase over the whole energy grid at once
+        branches_cr = dynamical_branches(
+            self.Theory_photonEnergy, E_bragg,
+            np.sin(self.ui.doubleSpinBox_theta.value() * np.pi / 180),
+            self.b_cr, P, gamma_cr, F_0, F_H, F_Hbar)
+        branches_mo = dynamical_branches(self.Theory_photonEnergy, E_bragg,
+                                         np.sin(theta_bragg_mo), b_mo, P_DCM,
+                                         gamma_mo, F_0_DCM, F_H_DCM,
+                                         F_Hbar_DCM)
+
+        ## Sample crystal: the branch is chosen on each side of the critical point (Re(eta) = 0)
+        self.Theory_Refl_sample, self.Theory_Phase_Sample = sample_reflectivity_and_phase(
+            branches_cr, self.ui.radioButton_pi_pol_light.isChecked())
+        ## Monochromator: in a general case the branch choice is irrelevant for the monochromator
+        self.Theory_Refl_Monochromator, self.Theory_Phase_Monochromator = monochromator_reflectivity_and_phase(
+            branches_mo)
 
         ## Normalization so that it won't affect the area of the the crystal reflectivity when cross-correlated.
         self.Theory_Squared_Refl_Monochromator_norm = self.Theory_Refl_Monochromator**2 / sum(
             self.Theory_Refl_Monochromator**2)
         if len(self.Theory_Refl_sample) == len(
                 self.Theory_Squared_Refl_Monochromator_norm):
-            delta_photon = self.Theory_photonEnergy[
-                1] - self.Theory_photonEnergy[0]
-
-
-            # Make sure the axises are correct: first do a 'full' correlation, and then interpolate in the original range
-            # This assumes that both arrays have the SAME LENGTH and the SAME X AXIS !!! This is very important!
-            # In that case, the x_axis=0 of the array after correlation occurs for the element len(one the array), when both arrays are perfectely superimposed
-            # Therefore the first element of the array after correlation is -1*len(one the array)*step_size
-            full = np.correlate(
-                self.Theory_Refl_sample,
-                self.Theory_Squared_Refl_Monochromator_norm,
-                mode='full')
-
-            full_x = np.linspace(
-                -1 * len(self.Theory_photonEnergy) * delta_photon,
-                (len(self.Theory_photonEnergy) - 1) * delta_photon,
-                2 * len(self.Theory_photonEnergy) - 1)
-            # Now interpolate the result back in the photon energy range we want: that simplifies later use.
-            interp_full = interpolate.interp1d(full_x, full, kind=interp1d_kind)
-            self.Theory_ReflSample_cc_ReflMono2 = interp_full(
-                self.Theory_photonEnergy)
+            # Cross-correlation with the monochromator (and later the Gaussian broadening) in Fourier space.
+            # The kernel spectrum is computed here once and reused by all the fits.
+            self.convolution = ConvolutionEngine(
+                self.Theory_photonEnergy,
+                self.Theory_Squared_Refl_Monochromator_norm)
+            self.Theory_ReflSample_cc_ReflMono2 = self.convolution.convolve(
+                self.Theory_Refl_sample)
+            # basis curves of the electron yield model, convolved once per sigma
+            self.yield_basis = YieldBasis(self.convolution,
+                                          self.Theory_Refl_sample,
+                                          self.Theory_Phase_Sample)
 
             self.Pyqt_View_idealRefl.clear()
             self.Pyqt_View_idealRefl.setXRange(-1, 2)
@@ -1492,85 +1063,31 @@ class Torricelli(QMainWindow):
             self.Pyqt_View_idealRefl.addLegend()
             #self.Pyqt_View_idealRefl.addLegend(offset=(-30, -100))
             line_width_WEW = 3
-            
-            ###############. The following part is modified for tests.   // s.subach 2026.04
-            if True:     ######. Original script 
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    self.Theory_Phase_Sample / np.pi,
-                    #pen=(0, 0, 0),
-                    pen={'color':(0, 0, 0), 'width':line_width_WEW},
-                    name='Phase of Sample normalized by Pi')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    self.Theory_Refl_sample,
-                    #pen=(0, 128, 0),
-                    pen={'color':(0, 140, 0), 'width':line_width_WEW},
-                    name='Refl of Sample')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    self.Theory_Refl_Monochromator,
-                    #pen=(255, 144, 0),
-                    pen={'color':(255, 144, 0), 'width':line_width_WEW},
-                    name='Refl of Monochromator')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    self.Theory_Squared_Refl_Monochromator_norm,
-                    #pen=(0, 0, 255),
-                    pen={'color':(0, 0, 255), 'width':line_width_WEW},
-                    name='Squared Refl of Monochromator')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    self.Theory_ReflSample_cc_ReflMono2,
-                    pen={'color':(255, 0, 0), 'width':line_width_WEW},
-                    #pen=(255, 0, 0),
-                    name='Refl of Sample Cross-correlated with Squared Refl of Monochromator')
-   
-                
-               
-
-            if False:     ########.  tests. 2026.04.  Testing values of Eta terms and critical points
-                self.Pyqt_View_idealRefl.setXRange(-0.1, 0.35)
-                self.Pyqt_View_idealRefl.setYRange(-1.5, 1.5)
-
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    eta_cr_img,
-                    #pen=(0, 0, 0),
-                    pen={'color':(0, 0, 0), 'width':line_width_WEW},
-                    name='Eta /imaginary part')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    eta_cr_real,
-                    #pen=(0, 128, 0),
-                    pen={'color':(0, 140, 0), 'width':line_width_WEW},
-                    name='Eta / real part')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    eta_cr_sqr_img,
-                    #pen=(255, 144, 0),
-                    pen={'color':(255, 144, 0), 'width':line_width_WEW},
-                    name='(eta_cr**2 - 1) / imaginary part')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    eta_cr_sqr_real,
-                    #pen=(0, 0, 255),
-                    pen={'color':(0, 0, 255), 'width':line_width_WEW},
-                    name='(eta_cr**2 - 1) / real part')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    sqrt_eta_cr_real,
-                    #pen=(255, 0, 0))
-                    pen={'color':(0, 125, 125), 'width':line_width_WEW},   
-                    name='sqrt(eta_cr**2 - 1) / real part')
-                self.Pyqt_View_idealRefl.plot(
-                    self.Theory_photonEnergy,
-                    sqrt_eta_cr_img,
-                    pen={'color':(255, 0, 0), 'width':line_width_WEW},
-                    #pen=(255, 0, 0),
-                    name='sqrt(eta_cr**2 - 1) / imaginary part')
-
-
+            self.Pyqt_View_idealRefl.plot(
+                self.Theory_photonEnergy,
+                self.Theory_Phase_Sample / np.pi,
+                pen={'color':(0, 0, 0), 'width':line_width_WEW},
+                name='Phase of Sample normalized by Pi')
+            self.Pyqt_View_idealRefl.plot(
+                self.Theory_photonEnergy,
+                self.Theory_Refl_sample,
+                pen={'color':(0, 140, 0), 'width':line_width_WEW},
+                name='Refl of Sample')
+            self.Pyqt_View_idealRefl.plot(
+                self.Theory_photonEnergy,
+                self.Theory_Refl_Monochromator,
+                pen={'color':(255, 144, 0), 'width':line_width_WEW},
+                name='Refl of Monochromator')
+            self.Pyqt_View_idealRefl.plot(
+                self.Theory_photonEnergy,
+                self.Theory_Squared_Refl_Monochromator_norm,
+                pen={'color':(0, 0, 255), 'width':line_width_WEW},
+                name='Squared Refl of Monochromator')
+            self.Pyqt_View_idealRefl.plot(
+                self.Theory_photonEnergy,
+                self.Theory_ReflSample_cc_ReflMono2,
+                pen={'color':(255, 0, 0), 'width':line_width_WEW},
+                name='Refl of Sample Cross-correlated with Squared Refl of Monochromator')
 
             self.Save_Data_and_PlotPicture('Theoretical values',\
                                            ['photonEnergy',\
@@ -1589,8 +1106,11 @@ class Torricelli(QMainWindow):
             self.ui.button_fit_refl.setEnabled(True)
             self.ui.button_set_refl.setEnabled(True)
             self.ui.statusbar.showMessage(
-                'Ideal Reflectivity and Phase have been successfully calculated!',
-                5000)
+                'Ideal Reflectivity and Phase have been successfully calculated! (%i points, step %.2f meV, %s range +-%.2f eV)'
+                % (len(self.Theory_photonEnergy), dx * 1000, 'manual'
+                   if self.checkBox_theoReflRange_manual.isChecked() or len(
+                       self.Exp_photonEnergy_BraggCentered) == 0 else 'auto',
+                   x_max), 5000)
         else:
             print(
                 'You cannot make a correlation/convolution in such conditions!!!',
@@ -1736,14 +1256,10 @@ class Torricelli(QMainWindow):
         elif DW_method == 'Zywietz':  # Zywietz et al., Phys. Rev. B vol54 (1996)
             # Note that Debye temperatures are also given SiC (Tab. II). Could then be used in the Warren formula, but not implemented yet.
             # We use the Mean-square displacement of each atom species, from Fig. 7:
-            B_A = 8 * (np.pi)**2 * self.interpolate_value_from_csv_file(
-                Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-                'Databases' + os.sep + 'DW' + os.sep + 'DW_Zywietz_Si.csv', 'T',
-                Crystal_temp, '<u^2_Si>') * 1e-2  # in Ang**2
-            B_B = 8 * (np.pi)**2 * self.interpolate_value_from_csv_file(
-                Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-                'Databases' + os.sep + 'DW' + os.sep + 'DW_Zywietz_C.csv', 'T',
-                Crystal_temp, '<u^2_C>') * 1e-2
+            B_A = 8 * (np.pi)**2 * self.scattering_factors.zywietz_u2(
+                'Si', Crystal_temp) * 1e-2  # in Ang**2
+            B_B = 8 * (np.pi)**2 * self.scattering_factors.zywietz_u2(
+                'C', Crystal_temp) * 1e-2
             DW_A = B_A / (4 * d_hkl**2)
             DW_B = B_B / (4 * d_hkl**2)
         else:
@@ -1752,70 +1268,45 @@ class Torricelli(QMainWindow):
                 '.\nProceeds without Debye-Waller correction.')
 
         # The structure factors:
-        f0_A = self.interpolate_value_from_csv_file(
-            Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-            'Databases' + os.sep + 'f0.csv', '1/2dhkl', 1 / (2 * d_hkl),
-            Element_A)
-        f1_A = self.interpolate_value_from_csv_file(
-            Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-            'Databases' + os.sep + 'f1 and f2' + os.sep +
-            str(Element_A).lower() + '.nff', 'E(eV)', E_bragg, 'f1', '\t')
-        f2_A = self.interpolate_value_from_csv_file(
-            Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-            'Databases' + os.sep + 'f1 and f2' + os.sep +
-            str(Element_A).lower() + '.nff', 'E(eV)', E_bragg, 'f2', '\t')
+        f0_A = self.scattering_factors.f0(Element_A, 1 / (2 * d_hkl))
+        f1_A, f2_A = self.scattering_factors.f1f2(Element_A, E_bragg)
         if Element_B is not None:
-            f0_B = self.interpolate_value_from_csv_file(
-                Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-                'Databases' + os.sep + 'f0.csv', '1/2dhkl', 1 / (2 * d_hkl),
-                Element_B)
-            f1_B = self.interpolate_value_from_csv_file(
-                Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-                'Databases' + os.sep + 'f1 and f2' + os.sep +
-                str(Element_B).lower() + '.nff', 'E(eV)', E_bragg, 'f1', '\t')
-            f2_B = self.interpolate_value_from_csv_file(
-                Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-                'Databases' + os.sep + 'f1 and f2' + os.sep +
-                str(Element_B).lower() + '.nff', 'E(eV)', E_bragg, 'f2', '\t')
-
-        structure_factor_0 = 0.0
-        structure_factor_H = 0.0
-        structure_factor_Hbar = 0.0
-        with open(
-                Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-                'Databases' + os.sep + 'Lattices' + os.sep +
-                'AtomCoordinates_' + Cell_type + '.csv', 'r') as atomPos:
-            spamreader = csv.DictReader(atomPos, delimiter=',')
-            for row in spamreader:  # sum on all atomic positions
-                a = float(eval(row['x (a)']))
-                b = float(eval(row['y (b)']))
-                c = float(eval(row['z (c)']))
-                if str(row['Element']) == 'A':
-                    structure_factor_0 = structure_factor_0 + (
-                        f1_A + 1j * f2_A
-                    )  # for the (000), the corresponding d_khl is infinity, and the DW is then 0.
-                    structure_factor_H = structure_factor_H\
-                      + (f0_A - self.Z[Element_A] + f1_A + 1j*f2_A)*np.exp(2j*np.pi*(h*a + k*b + l*c) - DW_A)
-                    structure_factor_Hbar = structure_factor_Hbar\
-                      + (f0_A - self.Z[Element_A] + f1_A + 1j*f2_A)*np.exp(2j*np.pi*(-h*a - k*b - l*c) - DW_A)
-                elif str(row['Element']) == 'B':
-                    structure_factor_0 = structure_factor_0 + (f1_B + 1j * f2_B)
-                    structure_factor_H = structure_factor_H\
-                      + (f0_B - self.Z[Element_B] + f1_B + 1j*f2_B)*np.exp(2j*np.pi*(h*a + k*b + l*c) - DW_B)
-                    structure_factor_Hbar = structure_factor_Hbar\
-                      + (f0_B - self.Z[Element_B] + f1_B + 1j*f2_B)*np.exp(2j*np.pi*(-h*a - k*b - l*c) - DW_B)
-
-            if abs(structure_factor_H) < 1e-10:
-                QMessageBox.warning(
-                    self, "Warning", 'The ' + str(h) + str(k) + str(l) +
-                    ' reflection of ' + Crystal + ' is forbidden!')
-                return None, None, None, None, None, None, None, None, None
-            else:
-                return d_hkl, E_bragg, structure_factor_0, structure_factor_H, structure_factor_Hbar, DW_A * (
-                    4 * d_hkl**2), DW_B * (4 * d_hkl**2), V, Lambda_hkl
+            f0_B = self.scattering_factors.f0(Element_B, 1 / (2 * d_hkl))
+            f1_B, f2_B = self.scattering_factors.f1f2(Element_B, E_bragg)
+
+        # one broadcasted sum over all atomic positions of the unit cell (species 0 is A, 1 is B)
+        coordinates, species = self.lattice_bases[Cell_type]
+        f_forward = [f1_A + 1j * f2_A]
+        f_H = [f0_A - self.Z[Element_A] + f1_A + 1j * f2_A]
+        DW = [DW_A]
+        if Element_B is not None:
+            f_forward.append(f1_B + 1j * f2_B)
+            f_H.append(f0_B - self.Z[Element_B] + f1_B + 1j * f2_B)
+            DW.append(DW_B)
+        # for the (000), the corresponding d_khl is infinity, and the DW is then 0.
+        structure_factor_0, structure_factor_H, structure_factor_Hbar = structure_factors(
+            (h, k, l), coordinates, species, f_forward, f_H, DW)
+
+        if abs(structure_factor_H) < 1e-10:
+            QMessageBox.warning(
+                self, "Warning", 'The ' + str(h) + str(k) + str(l) +
+                ' reflection of ' + Crystal + ' is forbidden!')
+            return None, None, None, None, None, None, None, None, None
+        else:
+            return d_hkl, E_bragg, structure_factor_0, structure_factor_H, structure_factor_Hbar, DW_A * (
+                4 * d_hkl**2), DW_B * (4 * d_hkl**2), V, Lambda_hkl
 
     ## Load once all possible csv files that could be necessary later on
     def loadAll_csv_Files(self):
+        # f0, f1, f2 and Zywietz DW tables, compiled once into arrays (binary cache in imports/Databases)
+        self.scattering_factors = ScatteringFactorDatabase(
+            Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
+            'Databases')
+        # atomic positions of each cell type, parsed once into arrays
+        self.lattice_bases = load_lattice_bases(
+            Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
+            'Databases' + os.sep + 'Lattices')
+
         # Z values for most elements in the periodic table: (call for instance: self.Z['Ir'])
         self.Z = {
             'Ru': 44,
@@ -2109,7 +1600,22 @@ class Torricelli(QMainWindow):
     #####################################################
 
     ## Sets the initial parameters used for refl fit
+    # sigma and DeltaE from an FFT cross-correlation of the experimental and theoretical reflectivities,
+    # or, if that is not possible, from the maxima of both curves
     def set_refl_par(self):
+        guess = None
+        if self.convolution is not None and len(self.Exp_Refl_Normalised) > 0:
+            guess = reflectivity_initial_guess(
+                self.convolution, self.Theory_Refl_sample,
+                self.Exp_photonEnergy_BraggCentered, self.Exp_Refl_Normalised)
+        if guess is not None:
+            sigma, Norm, DR, DE = guess
+            self.ui.doubleSpinBox_ReflFit_InitVal_Sigma.setValue(sigma)
+            self.ui.doubleSpinBox_ReflFit_InitVal_Norm.setValue(Norm)
+            self.ui.doubleSpinBox_ReflFit_InitVal_Bgd.setValue(DR)
+            self.ui.doubleSpinBox_ReflFit_InitVal_DeltaE.setValue(DE)
+            return
+
         self.ui.doubleSpinBox_ReflFit_InitVal_Sigma.setValue(0.1)
         self.ui.doubleSpinBox_ReflFit_InitVal_Norm.setValue(
             np.amax(self.Exp_Refl_Normalised) /
@@ -2122,19 +1628,41 @@ class Torricelli(QMainWindow):
             self.ui.doubleSpinBox_ReflFit_InitVal_DeltaE.setValue(self.Theory_photonEnergy[np.argmax(self.Theory_ReflSample_cc_ReflMono2)]\
                                                                       - self.Exp_photonEnergy_BraggCentered[np.argmax(self.Exp_Refl_Normalised)])
 
-    ## Reports the evolution of the fitting procedure in a log file
+    ## Reports the evolution of the fitting procedure in the trace of the reflectivity fit
+    # The trace is written to the log file once per fit, by flush_fit_trace()
     def write_to_refl_log_file(self, text):
+        self.refl_trace.message(text)
+        self.show_fit_trace(self.refl_trace, self.ui.QTextEdit_FitResult_Refl)
+
+    ## Appends the new lines of a fit trace to its QTextEdit, at most every pyFitTrace.GUI_UPDATE_INTERVAL
+    def show_fit_trace(self, trace, text_edit, force=False):
+        if force or trace.gui_update_due():
+            lines = trace.take_new_lines()
+            if lines:
+                text_edit.append('\n'.join(lines))
+                text_edit.moveCursor(QTextCursor.End)
+
+    ## Writes the buffered lines of a fit trace to the log file, and shows them in the GUI
+    def flush_fit_trace(self, trace, log_path, text_edit):
+        self.show_fit_trace(trace, text_edit, True)
         try:
-            with open(self.log_file_name, 'a') as Refl_log_file:
-                Refl_log_file.write(text + '\n')
+            trace.flush(log_path)
         except IOError:
             QMessageBox.warning(
                 self, "Warning",
                 'Problem with the log file.\nThe \"results\" folder may have been deleted during the analysis.'
             )
-            raise IOError('Problem with the reflectivity log file')
-        self.ui.QTextEdit_FitResult_Refl.append(text)
-        self.ui.QTextEdit_FitResult_Refl.moveCursor(QTextCursor.End)
+            raise IOError('Problem with the log file ' + log_path)
+
+    ## Warns that the shifted experimental energies are outside of the theoretical ones
+    def warn_refl_out_of_theory_range(self, DE):
+        QMessageBox.warning(self, "ERROR", "ERROR: Failed to interpolate the experimental data."+\
+        "ValueError in the interpolation"+\
+        "\n\nThis error can occur if your experimental refl data"+\
+        "\nexceeds the limits of the previous calculated theoretical data."
+        "\nLimits of theoretical data:  "+str(self.Theory_photonEnergy[0])+", "+str(self.Theory_photonEnergy[-1]) + \
+        "\nLimits of experimental data: "+str(self.Exp_photonEnergy_BraggCentered[0]+DE)+", "+str(self.Exp_photonEnergy_BraggCentered[-1]+DE) +\
+        "\n\nYou can change the range in the theoretical reflectivity tab.")
 
     # Computes the difference between the experimental values and the calculated ones
     def residuals_Refl(self, params):
@@ -2142,34 +1670,32 @@ class Torricelli(QMainWindow):
         Norm = params[1]
         DR = params[2]
         DE = params[3]
-        Theory_refl = np.correlate (self.Theory_ReflSample_cc_ReflMono2,\
-                                    self.normalized_gauss_centered(sigma, self.Theory_photonEnergy),\
-                                    mode = "same") # with a centered gaussian, the axis does not change
+        Theory_refl = self.convolution.convolve(self.Theory_Refl_sample, sigma)
 
         # Interpolates the fit functions on the precise experimental photon energies
-        theo = interpolate.interp1d(
-            self.Theory_photonEnergy, Theory_refl, kind=interp1d_kind)
         try:
-            self.Theory_refl_on_Exp_points = Norm * theo(
-                self.Exp_photonEnergy_BraggCentered + DE)
-        except ValueError as err:
-            QMessageBox.warning(self, "ERROR", "ERROR: Failed to interpolate the experimental data."+\
-            "ValueError in scipy.interp1d()"+\
-            "\n\nThis error can occur if your experimental refl data"+\
-            "\nexceeds the limits of the previous calculated theoretical data."
-            "\nLimits of theoretical data:  "+str(self.Theory_photonEnergy[0])+", "+str(self.Theory_photonEnergy[-1]) + \
-            "\nLimits of experimental data: "+str(self.Exp_photonEnergy_BraggCentered[0]+DE)+", "+str(self.Exp_photonEnergy_BraggCentered[-1]+DE) +\
-            "\n\nYou can change the range in the theoretical reflectivity tab.")
+            self.Theory_refl_on_Exp_points = Norm * self.convolution.sample(
+                Theory_refl, self.Exp_photonEnergy_BraggCentered + DE)
+        except ValueError:
+            self.warn_refl_out_of_theory_range(DE)
             raise
 
-        self.write_to_refl_log_file('Sigma=' + str(sigma) + '\tNorm=' +
-                                    str(Norm) + '\tBgd=' + str(DR) +
-                                    '\tDeltaEn=' + str(DE))
         # The estimated error (for a while SQRT) does not make sense as it is unit-dependant. Unless the user has a proper way of calculating the error for the reflectivity, we prefer not to weight each point at all.
         # The /np.amax(self.Exp_Refl_Normalised) only serves to somehow yield a normalized/readable value of the chi2
-        return (
+        residuals = (
             self.Exp_Refl_Normalised - DR
         ) - self.Theory_refl_on_Exp_points  #/ np.amax(self.Exp_Refl_Normalised)
+        self.refl_trace.record([sigma, Norm, DR, DE], np.sum(residuals**2))
+        self.show_fit_trace(self.refl_trace, self.ui.QTextEdit_FitResult_Refl)
+        return residuals
+
+    ## Residuals of residuals_Refl for M parameter sets at once, (M, n_points).
+    # parameters: (M, 4) array of (sigma, Norm, DR, DE)
+    def residuals_Refl_batch(self, parameters):
+        return reflectivity_residuals_batch(
+            self.convolution, self.Theory_Refl_sample,
+            self.Exp_photonEnergy_BraggCentered, self.Exp_Refl_Normalised,
+            parameters)
 
     # Fits the reflectivity
     def fit_Refl(self):
@@ -2196,6 +1722,7 @@ class Torricelli(QMainWindow):
             )
             raise IOError('Problem with the reflectivity log file')
 
+        self.refl_trace = FitTrace(REFL_TRACE_NAMES)
         self.write_to_refl_log_file(
             'All the fit parameters combinations tested are reported in the following:'
         )
@@ -2207,16 +1734,34 @@ class Torricelli(QMainWindow):
                                   self.ui.doubleSpinBox_ReflFit_InitVal_Bgd.value(),\
                                   self.ui.doubleSpinBox_ReflFit_InitVal_DeltaE.value()]
 
-        # Fit !
-        bestFit_param, cov_x, info, msg, ierr = scipy.optimize.leastsq(
-            self.residuals_Refl,
-            initial_parameter_list,
-            args=(),
-            ftol=1e-24,
-            full_output=1)
+        # Fit ! Norm and Bgd are linear: they are eliminated analytically and only sigma and DeltaE are iterated
+        try:
+            refl_fit = fit_reflectivity_varpro(
+                self.convolution, self.Theory_Refl_sample,
+                self.Exp_photonEnergy_BraggCentered, self.Exp_Refl_Normalised,
+                initial_parameter_list[0], initial_parameter_list[3],
+                self.refl_trace)
+        except ValueError:
+            self.flush_fit_trace(self.refl_trace, self.log_file_name,
+                                 self.ui.QTextEdit_FitResult_Refl)
+            self.warn_refl_out_of_theory_range(initial_parameter_list[3])
+            raise
+        bestFit_param = refl_fit['params']
+        cov_x = refl_fit['cov_x']
+        # sets self.Theory_refl_on_Exp_points and reports the final parameters in the log
+        self.residuals_Refl(bestFit_param)
+        self.write_to_refl_log_file(
+            'Variable projection fit of (sigma, DeltaE): %i function and %i Jacobian evaluations in %.3f s (%s)'
+            % (refl_fit['nfev'], refl_fit['njev'], refl_fit['time'],
+               refl_fit['message']))
+        self.ui.statusbar.showMessage(
+            'Reflectivity fitted with %i evaluations in %.3f s' %
+            (refl_fit['nfev'] + refl_fit['njev'], refl_fit['time']), 5000)
         if cov_x is None:
             self.write_to_refl_log_file(
                 'Singular matrix encountered while optimizing')
+            self.flush_fit_trace(self.refl_trace, self.log_file_name,
+                                 self.ui.QTextEdit_FitResult_Refl)
             QMessageBox.warning(
                 self, "Warning",
                 'Singular matrix encountered while fitting.\n\nConsider changing the initial value of sigma and trying to fit again.'
@@ -2227,9 +1772,9 @@ class Torricelli(QMainWindow):
 
         # Chi Squared according to Pearsons definition:
         ChiSq_refl = sum(
-            np.divide(info['fvec']**2, self.Theory_refl_on_Exp_points)) / (
+            np.divide(refl_fit['fvec']**2, self.Theory_refl_on_Exp_points)) / (
                 len(self.Exp_photonEnergy_BraggCentered) - len(bestFit_param))
-        # keep in mind: info['fvec'] contains the residuals used of the leastsq method. There is no need to calculate them again
+        # keep in mind: refl_fit['fvec'] contains the residuals at the best fit. There is no need to calculate them again
 
         # experimental and theoretical data as defined in the residual function
         expData = self.Exp_Refl_Normalised - self.ui.doubleSpinBox_ReflFit_InitVal_Bgd.value(
@@ -2248,6 +1793,8 @@ class Torricelli(QMainWindow):
             self.ui.doubleSpinBox_ReflFit_RSquared.setValue(self.R_squared_refl)
         self.write_to_refl_log_file("*** R_squared = " +
                                     str(self.R_squared_refl))
+        self.flush_fit_trace(self.refl_trace, self.log_file_name,
+                             self.ui.QTextEdit_FitResult_Refl)
 
         ## covariance matrix: obtained by multiplying the matrix cov_x times the residual standard deviation.
         cov = ChiSq_refl * np.diag(cov_x)
@@ -2264,9 +1811,8 @@ class Torricelli(QMainWindow):
         self.ui.doubleSpinBox_ReflDeviation_dr.setValue(bestFit_dev[2])
         self.ui.doubleSpinBox_ReflDeviation_de.setValue(bestFit_dev[3])
 
-        bestFit_theo_refl = np.correlate (self.Theory_ReflSample_cc_ReflMono2,\
-                                    self.normalized_gauss_centered(bestFit_param[0], self.Theory_photonEnergy),\
-                                    mode = "same") # with a centered gaussian, the axis does not change
+        bestFit_theo_refl = self.convolution.convolve(self.Theory_Refl_sample,
+                                                      bestFit_param[0])
 
         fit_results_plot_note = self.data_file_name\
                                 + '<br>b<span style=" vertical-align:sub;">substrate</span>='+str(self.b_cr)\
@@ -2389,17 +1935,8 @@ class Torricelli(QMainWindow):
 
     ## Fills the log file.
     def write_line_EY_log_file(self, line):
-        try:
-            with open(self.path_fit_ey_log, 'a') as EY_log_file:
-                EY_log_file.write(line + '\n')
-        except IOError:
-            QMessageBox.warning(
-                self, "Warning",
-                'Problem with the log file.\nThe \"results\" folder may have been deleted during the analysis.'
-            )
-            raise IOError('Problem with the EY fit log file')
-        self.ui.QTextEdit_FitResult_EY.append(line)
-        self.ui.QTextEdit_FitResult_EY.moveCursor(QTextCursor.End)
+        self.ey_trace.message(line)
+        self.show_fit_trace(self.ey_trace, self.ui.QTextEdit_FitResult_EY)
 
     ## Sets the suggested fitting parameters for the electron yield
     def reset_ey_par(self,):
@@ -2431,6 +1968,54 @@ class Torricelli(QMainWindow):
             if self.ui.checkBox_display_manual_EY.isChecked():
                 self.the_plot_EY_manual.setData(self.Theory_photonEnergy,
                                                 theoretical_EY_curve)
+        self.chi2_map_manual.setData([self.ui.doubleSpinBox_pc.value()],
+                                     [self.ui.doubleSpinBox_fc.value()])
+
+    ## Reduced chi^2 of the EY fit on a (Fc, Pc) grid, with the other parameters at their initial values.
+    # N is profiled (best N at each point) if it is fitted, fixed otherwise. Sr, Si and Psi
+    # follow gamma unless Sr is given manually. Redrawn when sigma, DeltaE or these parameters change.
+    def update_chi2_map(self):
+        self.Pyqt_View_chi2_map.setVisible(self.checkBox_chi2_map.isChecked())
+        if not self.checkBox_chi2_map.isChecked(
+        ) or not self.ui.button_fit_ey.isEnabled():
+            return
+        if self.ui.radioButton_EYinit_man_SR.isChecked():
+            Sr = self.ui.doubleSpinBox_EYinit_man_SR.value()
+            Si = self.ui.doubleSpinBox_EYinit_abs_si.value()
+            Psi = self.ui.doubleSpinBox_EYinit_Psi.value()
+        else:
+            Sr, Si, Psi = self.compute_ndp_from_gamma(
+                self.get_init_value_gamma(),
+                self.ui.doubleSpinBox_EYinit_Delta.value())[:3]
+        if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+            EY_error = np.ones_like(self.Exp_EY_Normalised)
+        else:
+            EY_error = self.Exp_EY_casaXPS_Error
+        N = None if self.ui.checkBox_eyfit_fitN.isChecked(
+        ) else self.ui.doubleSpinBox_n.value()
+        landscape = yield_chi2_landscape(
+            self.yield_basis.sampled(
+                self.ui.doubleSpinBox_ReflFit_sigma.value(),
+                self.Exp_photonEnergy_BraggCentered +
+                self.ui.doubleSpinBox_ReflFit_de.value()),
+            self.Exp_EY_Normalised, EY_error, Sr, Si, Psi, N)
+
+        # ImageItem data are indexed [x, y], that is [Pc, Fc]
+        log_redchi = np.log10(np.maximum(landscape['redchi'].T, 1e-300))
+        self.chi2_map_image.setImage(log_redchi, autoLevels=True)
+        self.chi2_map_image.setRect(
+            QtCore.QRectF(0, 0, 1, landscape['Fc'][-1]))
+        for contour, level in zip(self.chi2_map_contours,
+                                  landscape['levels']):
+            contour.setData(log_redchi)
+            contour.setLevel(np.log10(level))
+        Fc_min, Pc_min, redchi_min = landscape['minimum']
+        self.chi2_map_minimum.setData([Pc_min], [Fc_min])
+        self.chi2_map_manual.setData([self.ui.doubleSpinBox_pc.value()],
+                                     [self.ui.doubleSpinBox_fc.value()])
+        self.Pyqt_View_chi2_map.setTitle(
+            'Reduced \u03c7\u00b2 (log scale): minimum %.4g at Fc = %.3f, Pc = %.3f'
+            % (redchi_min, Fc_min, Pc_min))
 
     ## One has to clear everything and replot everything again because it is not possible to re-fresh the textItem only...
     # Called by fit_ElYield() and by checkBox_display_manual_EY.clicked
@@ -2470,6 +2055,7 @@ class Torricelli(QMainWindow):
             np.amax(self.Exp_photonEnergy_BraggCentered) + 0.5 +
             self.ui.doubleSpinBox_ReflFit_de.value())
         self.Pyqt_View_ey_fit.setYRange(0, 4)
+        self.update_chi2_map()
 
     ## Returns the gamma initial value, either theo or man
     def get_init_value_gamma(self):
@@ -2494,57 +2080,66 @@ class Torricelli(QMainWindow):
         elif parameters['gamma'].vary:
             Sr, Si, Psi, Q_0, Q_h = self.compute_ndp_from_gamma(gamma, Delta)
 
-        Theo_Sample_EY = (
-            1 + Sr * self.Theory_Refl_sample +
-            2 * Fc * Si * np.sqrt(self.Theory_Refl_sample) *
-            np.cos(self.Theory_Phase_Sample - 2 * np.pi * Pc + Psi))
-        Theo_Sample_EY_cc_Gauss = np.correlate(Theo_Sample_EY,\
-                                               self.normalized_gauss_centered(self.ui.doubleSpinBox_ReflFit_sigma.value(), self.Theory_photonEnergy),\
-                                               mode = 'same') # with a centered gaussian, the axis does not change
-        Theo_Sample_EY_cc_Gauss_cc_RMono2_full = np.correlate(
-            Theo_Sample_EY_cc_Gauss,
-            self.Theory_Squared_Refl_Monochromator_norm,
-            mode='full')
-
-        delta_photon = self.Theory_photonEnergy[1] - self.Theory_photonEnergy[0]
-        full_x = np.linspace(-1 * len(self.Theory_photonEnergy) * delta_photon,
-                             (len(self.Theory_photonEnergy) - 1) * delta_photon,
-                             2 * len(self.Theory_photonEnergy) - 1)
-        interp_full = interpolate.interp1d(
-            full_x, Theo_Sample_EY_cc_Gauss_cc_RMono2_full, kind=interp1d_kind)
-        self.Theo_Sample_EY_cc_Gauss_cc_RMono2 = interp_full(
-            self.Exp_photonEnergy_BraggCentered +
-            self.ui.doubleSpinBox_ReflFit_de.value())
-
-        if parameters['Sr'].vary:
-            self.write_line_EY_log_file('Fc=' + str(Fc) + '\tPc=' + str(Pc) +
-                                        '\tN=' + str(N) + '\tSr=' + str(Sr))
-        elif parameters['gamma'].vary:
-            self.write_line_EY_log_file('Fc=' + str(Fc) + '\tPc=' + str(Pc) +
-                                        '\tN=' + str(N) + '\tgamma=' +
-                                        str(gamma))
+        # 1 + Sr*R + 2*Fc*Si*sqrt(R)*cos(phi - 2*pi*Pc + Psi), from the basis curves already
+        # broadened by the Gaussian, cross-correlated with the monochromator and sampled on the experimental energies
+        sigma = self.ui.doubleSpinBox_ReflFit_sigma.value()
+        self.Theo_Sample_EY_cc_Gauss_cc_RMono2 = yield_model(
+            self.yield_basis.sampled(
+                sigma, self.Exp_photonEnergy_BraggCentered +
+                self.ui.doubleSpinBox_ReflFit_de.value()), Sr, Fc, Pc, Si,
+            Psi)
+
+        # without the Monte Carlo errors, sum((y/N - model)^2) is minimised; the linear solver
+        # and the batch fits (pyFit.yield_residuals_batch) minimise sum((y - N*model)^2) instead
+        if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+            residuals = (self.Exp_EY_Normalised / N -
+                         self.Theo_Sample_EY_cc_Gauss_cc_RMono2)
         else:
-            self.write_line_EY_log_file('Fc=' + str(Fc) + '\tPc=' + str(Pc) +
-                                        '\tN=' + str(N))
+            residuals = (self.Exp_EY_Normalised / N -
+                         self.Theo_Sample_EY_cc_Gauss_cc_RMono2) / (
+                             self.Exp_EY_casaXPS_Error / N)
+
+        if self.ey_fit_running:  # not the evaluations of the manual plot
+            values = [Fc, Pc, N]
+            if parameters['Sr'].vary:
+                values.append(Sr)
+            elif parameters['gamma'].vary:
+                values.append(gamma)
+            self.ey_trace.record(values, np.sum(residuals**2))
+            self.show_fit_trace(self.ey_trace, self.ui.QTextEdit_FitResult_EY)
 
         if manual:  #return both the difference and the theoretical curve
-            if self.ui.checkBox_ignore_MonteCarlo.isChecked():
-                return (self.Exp_EY_Normalised / N -
-                        self.Theo_Sample_EY_cc_Gauss_cc_RMono2), interp_full(
-                            self.Theory_photonEnergy)
-            else:
-                return (self.Exp_EY_Normalised / N -
-                        self.Theo_Sample_EY_cc_Gauss_cc_RMono2) / (
-                            self.Exp_EY_casaXPS_Error / N), interp_full(
-                                self.Theory_photonEnergy)
+            Theo_Sample_EY_cc_Gauss_cc_RMono2_theo = yield_model(
+                self.yield_basis.convolved(sigma), Sr, Fc, Pc, Si, Psi)
+            return residuals, Theo_Sample_EY_cc_Gauss_cc_RMono2_theo
         else:
-            if self.ui.checkBox_ignore_MonteCarlo.isChecked():
-                return (self.Exp_EY_Normalised / N -
-                        self.Theo_Sample_EY_cc_Gauss_cc_RMono2)
-            else:
-                return (self.Exp_EY_Normalised / N -
-                        self.Theo_Sample_EY_cc_Gauss_cc_RMono2) / (
-                            self.Exp_EY_casaXPS_Error / N)
+            return residuals
+
+    ## Residuals of residual_ey for M parameter sets at once, (M, n_points).
+    # parameters: (M, len(names)) array, names among 'Fc', 'Pc', 'N', 'Sr' and 'gamma';
+    # the other parameters take their initial values of the GUI, which is read only once.
+    def residual_ey_batch(self, parameters, names):
+        fixed = {
+            'Fc': self.ui.doubleSpinBox_fc.value(),
+            'Pc': self.ui.doubleSpinBox_pc.value(),
+            'N': self.ui.doubleSpinBox_n.value(),
+            'Sr': self.ui.doubleSpinBox_EYinit_man_SR.value(),
+            'gamma': self.get_init_value_gamma()
+        }
+        if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+            EY_error = np.ones_like(self.Exp_EY_Normalised)
+        else:
+            EY_error = self.Exp_EY_casaXPS_Error
+        return yield_residuals_batch(
+            parameters, names,
+            self.yield_basis.sampled(
+                self.ui.doubleSpinBox_ReflFit_sigma.value(),
+                self.Exp_photonEnergy_BraggCentered +
+                self.ui.doubleSpinBox_ReflFit_de.value()),
+            self.Exp_EY_Normalised, EY_error,
+            self.ui.doubleSpinBox_EYinit_abs_si.value(),
+            self.ui.doubleSpinBox_EYinit_Psi.value(), fixed,
+            self.nondipolar_model(self.ui.doubleSpinBox_EYinit_Delta.value()))
 
     ### Fitting procedure for the Electron yield.
     # Check Mercurio et al. Phys. Rev. B vol88, p 045421 (2013) for more details
@@ -2578,9 +2173,6 @@ class Torricelli(QMainWindow):
             raise IOError('Problem with the EY fit log file')
 
 
-        self.write_line_EY_log_file(
-            "All the fit parameters combinations tested are reported in the following:"
-        )
         fit_params = lmfit.Parameters()
         fit_params.add(
             'Fc',
@@ -2608,12 +2200,42 @@ class Torricelli(QMainWindow):
             value=self.get_init_value_gamma(),
             vary=self.ui.checkBox_eyfit_fitgamma.isChecked() and
             (not self.ui.radioButton_EYinit_man_SR.isChecked()))
-        fit_result_output = lmfit.minimize(
-            self.residual_ey, fit_params, args=())
+
+        if fit_params['Sr'].vary:
+            self.ey_trace = FitTrace(['Fc', 'Pc', 'N', 'Sr'])
+        elif fit_params['gamma'].vary:
+            self.ey_trace = FitTrace(['Fc', 'Pc', 'N', 'gamma'])
+        else:
+            self.ey_trace = FitTrace(['Fc', 'Pc', 'N'])
+        # residual_ey records its evaluations in the trace while the fit runs only
+        self.ey_fit_running = True
+        try:
+            if self.checkBox_eyfit_multistart.isChecked(
+            ) and not self.multistart_ElYield(fit_params):
+                self.flush_fit_trace(self.ey_trace, self.path_fit_ey_log,
+                                     self.ui.QTextEdit_FitResult_EY)
+                return
+            self.write_line_EY_log_file(
+                "All the fit parameters combinations tested are reported in the following:"
+            )
+            if self.checkBox_eyfit_linear.isChecked(
+            ) and fit_params['Fc'].vary and fit_params['Pc'].vary:
+                fit_result_output = self.fit_ElYield_linear(fit_params)
+                if fit_result_output is None:
+                    self.flush_fit_trace(self.ey_trace, self.path_fit_ey_log,
+                                         self.ui.QTextEdit_FitResult_EY)
+                    return
+            else:
+                fit_result_output = lmfit.minimize(
+                    self.residual_ey, fit_params, args=())
+        finally:
+            self.ey_fit_running = False
 
         if fit_result_output.success is not True:
             self.write_line_EY_log_file('Fit did not converge:' +
                                         fit_result_output.message)
+            self.flush_fit_trace(self.ey_trace, self.path_fit_ey_log,
+                                 self.ui.QTextEdit_FitResult_EY)
             QMessageBox.warning(
                 self, "Fit does not converge",
                 'Try to change the parameter start values.\n\"' +
@@ -2622,6 +2244,7 @@ class Torricelli(QMainWindow):
         else:
             self.write_line_EY_log_file('Successful fit: \"' +
                                         fit_result_output.message + '\"')
+            self.ey_fit_params = fit_result_output.params
             self.ui.statusbar.showMessage(
                 'Successful fit: \"' + fit_result_output.message + '\"', 5000)
 
@@ -2697,6 +2320,8 @@ class Torricelli(QMainWindow):
             self.write_line_EY_log_file(
                 '--> ' + var + ' with ' +
                 str(fit_result_output.params[var].correl))
+        self.flush_fit_trace(self.ey_trace, self.path_fit_ey_log,
+                             self.ui.QTextEdit_FitResult_EY)
 
         selected_slice = ''
         if self.ui.checkBox_AngularModeToggle.isChecked():
@@ -2748,6 +2373,503 @@ class Torricelli(QMainWindow):
         self.ui.statusbar.showMessage(
             'Experimental Electron Yield has been successfully fitted!', 5000)
 
+    ## Multi-start search of the EY fit: local fits from a Latin hypercube of (Fc, Pc, gamma)
+    # start points run concurrently, and the start values of fit_params are set to the best
+    # optimum, from which fit_ElYield then makes its usual fit. Returns False if no start converged.
+    def multistart_ElYield(self, fit_params):
+        if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+            EY_error = np.ones_like(self.Exp_EY_Normalised)
+        else:
+            EY_error = self.Exp_EY_casaXPS_Error
+        task = yield_fit_task(
+            'multistart', [(name, p.value, p.vary)
+                           for name, p in fit_params.items()],
+            self.yield_basis.sampled(
+                self.ui.doubleSpinBox_ReflFit_sigma.value(),
+                self.Exp_photonEnergy_BraggCentered +
+                self.ui.doubleSpinBox_ReflFit_de.value()),
+            self.Exp_EY_Normalised, EY_error,
+            self.ui.doubleSpinBox_EYinit_abs_si.value(),
+            self.ui.doubleSpinBox_EYinit_Psi.value(),
+            self.nondipolar_model(fit_params['Delta'].value),
+            self.checkBox_eyfit_linear.isChecked())
+        self.ui.statusbar.showMessage('Multi-start fit running...')
+        QApplication.processEvents()
+        best = next(
+            run_multistart_fits([task], self.spinBox_eyfit_starts.value()))
+        self.ui.statusbar.clearMessage()
+        if not best['success']:
+            self.write_line_EY_log_file('Multi-start: ' + best['message'])
+            QMessageBox.warning(
+                self, "Fit does not converge",
+                'None of the %i starts converged.' % best['n_starts'])
+            return False
+        self.write_line_EY_log_file(
+            'Multi-start: %i of %i starts converged, %i of them to the best optimum (chi2=%s):'
+            % (best['n_converged'], best['n_starts'], best['n_same'],
+               best['chisqr']))
+        for name in fit_params:
+            if fit_params[name].vary:
+                fit_params[name].value = best['values'][name]
+                self.write_line_EY_log_file('--> ' + name + '=' +
+                                            str(best['values'][name]))
+        return True
+
+    ## Solves the EY fit as a weighted linear least-squares problem in N, N*Fc*cos(2*pi*Pc) and N*Fc*sin(2*pi*Pc).
+    # Returns a result similar to lmfit.minimize()
+    def fit_ElYield_linear(self, fit_params):
+        if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+            EY_error = np.ones_like(self.Exp_EY_Normalised)
+        else:
+            EY_error = self.Exp_EY_casaXPS_Error
+        basis = self.yield_basis.sampled(
+            self.ui.doubleSpinBox_ReflFit_sigma.value(),
+            self.Exp_photonEnergy_BraggCentered +
+            self.ui.doubleSpinBox_ReflFit_de.value())
+        try:
+            fit_result_output = fit_yield_linear(
+                fit_params, basis, self.Exp_EY_Normalised, EY_error,
+                self.ui.doubleSpinBox_EYinit_abs_si.value(),
+                self.ui.doubleSpinBox_EYinit_Psi.value())
+        except (np.linalg.LinAlgError, ValueError) as err:
+            self.write_line_EY_log_file('Linear fit failed: ' + str(err))
+            QMessageBox.warning(self, "Fit failed",
+                                'The linear fit failed:\n\"' + str(err) +
+                                '\"\nUncheck the linear solver to use lmfit.')
+            return None
+        # also sets the fitted curve on the experimental points and reports the solution in the log
+        self.residual_ey(fit_result_output.params)
+        return fit_result_output
+
+    ## Fits every slice of the angular yield file, for each of the selected components separately.
+    # The fits run in a pool of processes (pyBatchFit); they share the theory sampled with the
+    # sigma and Delta E of the reflectivity fit. The start values and free parameters are those
+    # of fit_ElYield, except N which starts from the first point of each data set (as reset_ey_par),
+    # and Si, Psi (and Sr from gamma) which are computed for the angle of each slice.
+    # Each result is added to the Argand tree and to the RESULTS file as soon as it is known.
+    def fit_all_slices(self):
+        if not self.ui.checkBox_AngularModeToggle.isChecked():
+            QMessageBox.warning(self, "Information",
+                                "Fitting all slices needs the angular mode.")
+            return
+        if self.ui.doubleSpinBox_ReflFit_de.value(
+        ) == 0 or self.ui.doubleSpinBox_ReflFit_sigma.value(
+        ) == 0 or self.yield_basis is None:
+            QMessageBox.warning(self, "Information",
+                                "You forgot to fit the reflectivity!")
+            return
+        try:
+            data_r = self.data_files.load(
+                str(self.ui.refl_name.text()), read_refl_file)
+            ey_table = self.data_files.load(
+                str(self.ui.ey_name.text()), read_yield_file)
+            ey_slices = ey_table.slices(data_r.shape[0])
+        except (IOError, ValueError) as error:  # DataFileError is a ValueError
+            QMessageBox.warning(self, "Warning", str(error))
+            return
+
+        sigma = self.ui.doubleSpinBox_ReflFit_sigma.value()
+        basis = self.yield_basis.sampled(
+            sigma, self.Exp_photonEnergy_BraggCentered +
+            self.ui.doubleSpinBox_ReflFit_de.value())
+        man_SR = self.ui.radioButton_EYinit_man_SR.isChecked()
+        vary = {
+            'Fc': self.ui.checkBox_eyfit_fitFc.isChecked(),
+            'Pc': self.ui.checkBox_eyfit_fitPc.isChecked(),
+            'N': self.ui.checkBox_eyfit_fitN.isChecked(),
+            'Delta': False,
+            'Sr': self.ui.checkBox_eyfit_fitSr.isChecked() and man_SR,
+            'gamma': self.ui.checkBox_eyfit_fitgamma.isChecked() and not man_SR
+        }
+        gamma = self.get_init_value_gamma()
+        if gamma is None:
+            gamma = 0
+        Delta = self.ui.doubleSpinBox_EYinit_Delta.value()
+        linear = self.checkBox_eyfit_linear.isChecked()
+
+        tasks = []
+        models = {}
+        for slice_nb in range(ey_slices.shape[0]):
+            angle = self.ui.doubleSpinBox_ndp_phi.value()
+            if self.ui.lineEdit_angles_path.text() != '':
+                angle = self.slice_to_angle.get(slice_nb, angle)
+            models[slice_nb] = (angle, self.nondipolar_model(Delta, angle))
+            Sr_theo, Si, Psi, Q_0, Q_h = models[slice_nb][1](gamma)
+            for component in self.Components_List_Used_in_EYfit:
+                try:
+                    experimental = normalize_to_I0(data_r, ey_slices[slice_nb],
+                                                   [component])
+                except IndexError as error:
+                    QMessageBox.warning(self, "Warning", str(error))
+                    return
+                if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+                    EY_error = np.ones_like(experimental['ey'])
+                else:
+                    EY_error = experimental['ey_error']
+                start = {
+                    'Fc': self.ui.doubleSpinBox_fc.value(),
+                    'Pc': self.ui.doubleSpinBox_pc.value(),
+                    'N': experimental['ey'][0],
+                    'Delta': Delta,
+                    'Sr': self.ui.doubleSpinBox_EYinit_man_SR.value(),
+                    'gamma': gamma
+                }
+                tasks.append(
+                    yield_fit_task(
+                        (slice_nb, int(component)),
+                        [(name, start[name], vary[name]) for name in start],
+                        basis, experimental['ey'], EY_error, Si, Psi,
+                        models[slice_nb][1], linear))
+
+        self.path_fit_ey_log = str(
+            self.ui.LineEdit_CurrentWorkingDirectory.text()
+        ) + os.sep + 'results' + os.sep + 'Fit_ey_comp' + str(
+            self.Components_List_Used_in_EYfit) + '_all_slices.log'
+        self.ui.QTextEdit_FitResult_EY.clear()
+        self.ey_trace = FitTrace([])
+        self.write_line_EY_log_file(
+            'Fit of %i slices x %i components:' %
+            (ey_slices.shape[0], len(self.Components_List_Used_in_EYfit)))
+
+        progressLabel = QLabel()
+        progressLabel.setText("FITTING SLICES - ")
+        progressBar = QProgressBar()
+        progressBar.setMaximum(len(tasks))
+        self.ui.statusbar.addPermanentWidget(progressLabel)
+        self.ui.statusbar.addPermanentWidget(progressBar)
+        base_results = self.get_dict_with_all_values()
+        n_failed = 0
+        if self.checkBox_eyfit_multistart.isChecked():
+            fits = run_multistart_fits(tasks, self.spinBox_eyfit_starts.value())
+        else:
+            fits = run_yield_fits(tasks)
+        for i, result in enumerate(fits):
+            slice_nb, component = result['key']
+            component_name = ey_table.column_names[1 + 2 * component].strip()
+            if result['success']:
+                angle, model = models[slice_nb]
+                results = self.slice_fit_result_dictionary(
+                    base_results, result, vary, component_name, slice_nb,
+                    angle, model(gamma), model.P_electrons)
+                self.Argand_AddDataset(
+                    self.Argand_groupOfFitResults(component_name),
+                    results,
+                    refresh=True)
+                self.autoSaveResults(results=results)
+                self.write_line_EY_log_file(
+                    'slice%02i %s: Fc=%s Pc=%s N=%s red. chi2=%s' %
+                    (slice_nb, component_name, results['Fc'], results['Pc'],
+                     result['values']['N'], result['redchi']))
+                if 'n_same' in result:
+                    self.write_line_EY_log_file(
+                        '    %i of %i converged starts reached this optimum' %
+                        (result['n_same'], result['n_converged']))
+            else:
+                n_failed += 1
+                self.write_line_EY_log_file(
+                    'slice%02i %s: fit did not converge: %s' %
+                    (slice_nb, component_name, result['message']))
+            progressBar.setValue(i + 1)
+            QApplication.processEvents()
+        self.ui.statusbar.removeWidget(progressLabel)
+        self.ui.statusbar.removeWidget(progressBar)
+        self.flush_fit_trace(self.ey_trace, self.path_fit_ey_log,
+                             self.ui.QTextEdit_FitResult_EY)
+
+        self.Argand_Save(
+            str(self.ui.LineEdit_CurrentWorkingDirectory.text()) + os.sep +
+            self.argand_SaveSubFolder + 'autosave_' + self.timestamp() +
+            '_newFitResultAdded.csv')
+        if n_failed > 0:
+            QMessageBox.warning(
+                self, "Fit does not converge",
+                '%i of the %i fits did not converge, see the log.' %
+                (n_failed, len(tasks)))
+        self.ui.statusbar.showMessage(
+            '%i of %i slice fits added to the Argand diagram.' %
+            (len(tasks) - n_failed, len(tasks)), 5000)
+
+    ## Global fit of all the slices of the angular yield file (sum of the selected components).
+    # Fc and Pc (and gamma if checkBox_eyfit_fitgamma is checked) are shared by all the slices,
+    # N is fitted per slice, and Sr, Si and Psi are computed from gamma at the angle of each slice
+    # (Sr is the manual one in the manual Sr mode). The free parameters follow the checkboxes of fit_ElYield.
+    # The result is shown in the fit results, added to the Argand diagram and autosaved.
+    def fit_global_angular(self):
+        if not self.ui.checkBox_AngularModeToggle.isChecked():
+            QMessageBox.warning(self, "Information",
+                                "The global fit needs the angular mode.")
+            return
+        if self.ui.doubleSpinBox_ReflFit_de.value(
+        ) == 0 or self.ui.doubleSpinBox_ReflFit_sigma.value(
+        ) == 0 or self.yield_basis is None:
+            QMessageBox.warning(self, "Information",
+                                "You forgot to fit the reflectivity!")
+            return
+        try:
+            data_r = self.data_files.load(
+                str(self.ui.refl_name.text()), read_refl_file)
+            ey_slices = self.data_files.load(
+                str(self.ui.ey_name.text()),
+                read_yield_file).slices(data_r.shape[0])
+            experimental = [
+                normalize_to_I0(data_r, ey_slice,
+                                self.Components_List_Used_in_EYfit)
+                for ey_slice in ey_slices
+            ]
+        except (IOError, ValueError, IndexError) as error:
+            QMessageBox.warning(self, "Warning", str(error))
+            return
+
+        basis = self.yield_basis.sampled(
+            self.ui.doubleSpinBox_ReflFit_sigma.value(),
+            self.Exp_photonEnergy_BraggCentered +
+            self.ui.doubleSpinBox_ReflFit_de.value())
+        Delta = self.ui.doubleSpinBox_EYinit_Delta.value()
+        angles = []
+        for slice_nb in range(len(ey_slices)):
+            angle = self.ui.doubleSpinBox_ndp_phi.value()
+            if self.ui.lineEdit_angles_path.text() != '':
+                angle = self.slice_to_angle.get(slice_nb, angle)
+            angles.append(angle)
+        models = [self.nondipolar_model(Delta, angle) for angle in angles]
+        if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+            errors = [np.ones_like(e['ey']) for e in experimental]
+        else:
+            errors = [e['ey_error'] for e in experimental]
+        gamma = self.get_init_value_gamma()
+        if gamma is None:
+            gamma = 0
+        man_SR = self.ui.radioButton_EYinit_man_SR.isChecked()
+        fit_gamma = self.ui.checkBox_eyfit_fitgamma.isChecked() and not man_SR
+        fit_Fc = self.ui.checkBox_eyfit_fitFc.isChecked()
+        fit_Pc = self.ui.checkBox_eyfit_fitPc.isChecked()
+        fit_N = self.ui.checkBox_eyfit_fitN.isChecked()
+        if not (fit_Fc or fit_Pc or fit_N or fit_gamma):
+            QMessageBox.warning(self, "Information",
+                                "There is no free parameter to fit.")
+            return
+
+        result = fit_yield_global(
+            [basis] * len(ey_slices), [e['ey'] for e in experimental], errors,
+            models, self.ui.doubleSpinBox_fc.value(),
+            self.ui.doubleSpinBox_pc.value(),
+            [e['ey'][0] for e in experimental], gamma, fit_gamma, fit_Fc,
+            fit_Pc, fit_N,
+            self.ui.doubleSpinBox_EYinit_man_SR.value() if man_SR else None)
+
+        self.path_fit_ey_log = str(
+            self.ui.LineEdit_CurrentWorkingDirectory.text()
+        ) + os.sep + 'results' + os.sep + 'Fit_ey_comp' + str(
+            self.Components_List_Used_in_EYfit) + '_global.log'
+        self.ui.QTextEdit_FitResult_EY.clear()
+        self.ey_trace = FitTrace([])
+        self.write_line_EY_log_file(
+            'Global fit of %i slices, %i points, %i function evaluations: %s'
+            % (len(ey_slices), result['ndata'], result['nfev'],
+               result['message']))
+        for name, value, err in zip(result['names'], result['values'],
+                                    result['stderr']):
+            self.write_line_EY_log_file('%s = %s +- %s' % (name, value, err))
+        self.write_line_EY_log_file("Reduced chi squared = " +
+                                    str(result['redchi']))
+        self.flush_fit_trace(self.ey_trace, self.path_fit_ey_log,
+                             self.ui.QTextEdit_FitResult_EY)
+        if not result['success']:
+            QMessageBox.warning(
+                self, "Fit does not converge",
+                'Try to change the parameter start values.\n\"' +
+                result['message'] + '\"')
+            return
+
+        values = dict(zip(result['names'], result['values']))
+        stderr = dict(zip(result['names'], result['stderr']))
+
+        def error(name):  # nan for the fixed parameters
+            return stderr[name] if np.isfinite(stderr[name]) else '-'
+
+        self.ui.doubleSpinBox_EYFit_fc.setValue(values['Fc'])
+        self.ui.doubleSpinBox_EYFit_pc.setValue(values['Pc'])
+        self.ui.doubleSpinBox_stddev_ey_fc.setValue(np.nan_to_num(stderr['Fc']))
+        self.ui.doubleSpinBox_stddev_ey_pc.setValue(np.nan_to_num(stderr['Pc']))
+        if fit_gamma:
+            self.ui.doubleSpinBox_EYFit_gamma.setValue(values['gamma'])
+            self.ui.doubleSpinBox_stddev_gamma.setValue(stderr['gamma'])
+        self.ui.doubleSpinBox_FitEY_RedChiSquare.setValue(
+            0 if self.ui.checkBox_ignore_MonteCarlo.isChecked() else
+            result['redchi'])
+
+        results = self.get_dict_with_all_values()
+        results.update({'Fc'        : values['Fc'],\
+                        'Pc'        : values['Pc'],\
+                        'Fc_err'    : error('Fc'),\
+                        'Pc_err'    : error('Pc'),\
+                        'Gamma'     : '-' if man_SR else values['gamma'] if fit_gamma else gamma,\
+                        'Gamma_err' : error('gamma') if fit_gamma else '-',\
+                        'Sr'        : self.ui.doubleSpinBox_EYinit_man_SR.value() if man_SR else '-',\
+                        '|Si|'      : '-',\
+                        'Psi'       : '-',\
+                        'Q_0'       : '-',\
+                        'Q_H'       : '-',\
+                        'Slice nb'  : '',\
+                        'Phi'       : '-',\
+                        'P el'      : '-',\
+                        'Note'      : 'Global fit of %i slices (%g to %g deg)' % (len(angles), min(angles), max(angles))})
+        self.Argand_AddDataset(
+            self.Argand_groupOfFitResults(str(
+                self.ui.column_name_label.text())),
+            results,
+            refresh=True)
+        self.autoSaveResults(results=results)
+        self.Argand_Save(
+            str(self.ui.LineEdit_CurrentWorkingDirectory.text()) + os.sep +
+            self.argand_SaveSubFolder + 'autosave_' + self.timestamp() +
+            '_newFitResultAdded.csv')
+        self.ui.statusbar.showMessage(
+            'Global fit of %i slices added to the Argand diagram.' %
+            len(ey_slices), 5000)
+
+    ## Parametric bootstrap of the last EY fit, an alternative to its covariance errors.
+    # The yield is perturbed by its errors (by the rms of the residuals if they are ignored), and
+    # sigma and Delta E by the standard errors of the reflectivity fit; each replicate is refitted
+    # from the best fit in a pool of processes. The statistics are written to the log and the fit
+    # is added to the Argand diagram and to the RESULTS file with the bootstrap standard deviations
+    # as Fc_err and Pc_err.
+    def bootstrap_ElYield(self):
+        if self.ey_fit_params is None or self.yield_basis is None:
+            QMessageBox.warning(self, "Information",
+                                "You have to fit the electron yield first!")
+            return
+        n_replicates, ok = QInputDialog.getInt(self, 'Bootstrap',
+                                               'Number of refits:', 1000, 10,
+                                               100000, 100)
+        if not ok:
+            return
+
+        sigma = self.ui.doubleSpinBox_ReflFit_sigma.value()
+        delta_E = self.ui.doubleSpinBox_ReflFit_de.value()
+        basis = self.yield_basis.sampled(
+            sigma, self.Exp_photonEnergy_BraggCentered + delta_E)
+        Si = self.ui.doubleSpinBox_EYinit_abs_si.value()
+        Psi = self.ui.doubleSpinBox_EYinit_Psi.value()
+        ndp = self.nondipolar_model(self.ey_fit_params['Delta'].value)
+        if self.ui.checkBox_ignore_MonteCarlo.isChecked():
+            EY_error = np.ones_like(self.Exp_EY_Normalised)
+            residuals = yield_residuals(self.ey_fit_params, basis,
+                                        self.Exp_EY_Normalised, EY_error, Si,
+                                        Psi, ndp)
+            n_free = len(residuals) - len(
+                [p for p in self.ey_fit_params.values() if p.vary])
+            noise = np.full_like(EY_error,
+                                 np.sqrt(np.sum(residuals**2) / n_free))
+        else:
+            EY_error = self.Exp_EY_casaXPS_Error
+            noise = EY_error
+        seed = np.random.SeedSequence().entropy
+        tasks = bootstrap_tasks(
+            [(name, p.value, p.vary)
+             for name, p in self.ey_fit_params.items()], self.yield_basis,
+            self.Exp_photonEnergy_BraggCentered,
+            (sigma, self.ui.doubleSpinBox_ReflDeviation_sigma.value()),
+            (delta_E, self.ui.doubleSpinBox_ReflDeviation_de.value()),
+            self.Exp_EY_Normalised, EY_error, noise, Si, Psi, ndp,
+            self.checkBox_eyfit_linear.isChecked(), n_replicates, seed)
+
+        progressLabel = QLabel()
+        progressLabel.setText("BOOTSTRAP - ")
+        progressBar = QProgressBar()
+        progressBar.setMaximum(n_replicates)
+        self.ui.statusbar.addPermanentWidget(progressLabel)
+        self.ui.statusbar.addPermanentWidget(progressBar)
+        chunks = []
+        for result in run_bootstrap(tasks):
+            chunks.append(result)
+            progressBar.setValue(progressBar.value() +
+                                 tasks[result['key']]['n_replicates'])
+            QApplication.processEvents()
+        self.ui.statusbar.removeWidget(progressLabel)
+        self.ui.statusbar.removeWidget(progressBar)
+
+        chunks.sort(key=itemgetter('key'))  # same order of the samples for the same seed
+        names = chunks[0]['names']
+        samples = np.vstack([chunk['samples'] for chunk in chunks])
+        n_failed = sum(chunk['n_failed'] for chunk in chunks)
+        if len(samples) < 2 or 'Fc' not in names or 'Pc' not in names:
+            QMessageBox.warning(
+                self, "Warning",
+                'The bootstrap needs Fc and Pc free and at least two converged refits.'
+            )
+            return
+        summary = bootstrap_summary(samples, names)
+
+        self.write_line_EY_log_file(
+            'Bootstrap: %i refits (%i did not converge), seed %i' %
+            (len(samples), n_failed, seed))
+        for name in names:
+            self.write_line_EY_log_file(
+                '--> %s: mean=%s std=%s %g%% interval=[%s, %s]' %
+                (name, summary[name]['mean'], summary[name]['std'],
+                 100 * summary['confidence'], summary[name]['low'],
+                 summary[name]['high']))
+        self.write_line_EY_log_file('--> correlation of Fc and Pc = %s' %
+                                    summary['correlation'])
+        self.flush_fit_trace(self.ey_trace, self.path_fit_ey_log,
+                             self.ui.QTextEdit_FitResult_EY)
+
+        results = self.get_dict_with_all_values()
+        results.update({'Fc_err'    : summary['Fc']['std'],\
+                        'Pc_err'    : summary['Pc']['std'],\
+                        'Note'      : 'Bootstrap of %i refits: Fc in [%.4f, %.4f], Pc in [%.4f, %.4f] (%g%%), corr(Fc, Pc)=%.3f'\
+                                      % (len(samples), summary['Fc']['low'], summary['Fc']['high'], summary['Pc']['low'],
+                                         summary['Pc']['high'], 100 * summary['confidence'], summary['correlation'])})
+        self.Argand_AddDataset(
+            self.Argand_groupOfFitResults(str(
+                self.ui.column_name_label.text())),
+            results,
+            refresh=True)
+        self.autoSaveResults(results=results)
+        self.Argand_Save(
+            str(self.ui.LineEdit_CurrentWorkingDirectory.text()) + os.sep +
+            self.argand_SaveSubFolder + 'autosave_' + self.timestamp() +
+            '_newFitResultAdded.csv')
+        self.ui.statusbar.showMessage(
+            'Bootstrap of %i refits added to the Argand diagram.' %
+            len(samples), 5000)
+
+    ## Argand/RESULTS entry of one fit of fit_all_slices, following get_dict_with_all_values()
+    # ndp_start: (Sr, Si, Psi, Q_0, Q_H) of the slice at the initial gamma
+    def slice_fit_result_dictionary(self, base_results, result, vary,
+                                    component_name, slice_nb, angle,
+                                    ndp_start, P_electrons):
+        values, stderr = result['values'], result['stderr']
+        man_SR = self.ui.radioButton_EYinit_man_SR.isChecked()
+        Sr, Si, Psi, Q_0, Q_h = result['ndp'] if vary['gamma'] else ndp_start
+        Fc = values['Fc']
+
+        def error(name):
+            if vary[name] and stderr[name] is not None:
+                return stderr[name]
+            return '-'
+
+        dic = base_results.copy()
+        dic.update({'Fc'        : Fc,\
+                    'Pc'        : values['Pc'] if Fc > 1e-4 else '-',\
+                    'Gamma'     : '-' if man_SR else values['gamma'],\
+                    'Gamma_err' : error('gamma'),\
+                    'Fc_err'    : error('Fc'),\
+                    'Pc_err'    : error('Pc'),\
+                    'Sr'        : values['Sr'] if man_SR else Sr,\
+                    'Sr_err'    : error('Sr'),\
+                    '|Si|'      : Si if Fc > 1e-4 else '-',\
+                    'Psi'       : Psi if Fc > 1e-4 and not man_SR else '-',\
+                    'Q_0'       : Q_0 if Fc > 1e-4 else '-',\
+                    'Q_H'       : Q_h if Fc > 1e-4 else '-',\
+                    'Component' : component_name,\
+                    'Slice nb'  : slice_nb,\
+                    'Phi'       : angle,\
+                    'P el'      : P_electrons,\
+                    'X2 Yield'  : 0 if self.ui.checkBox_ignore_MonteCarlo.isChecked() else result['redchi']})
+        return dic
+
     ## Re-loads the list of components to be used for the EY fit.
     # NOTE that if self.ui.signal_name.text() is '', [0] is returned anyway!
     def update_component_list(self):
@@ -2789,6 +2911,7 @@ class Torricelli(QMainWindow):
     autoSaveResults(saveFilePath='fullpath') for auto generated file with specified path and filename
     autoSaveResults(description='this is awesome') for auto generated file with specified description
     autoSaveResults(saveFilePath='fullpath', description='yeah!') combination of the both above
+    autoSaveResults(results=dict) saves the given results instead of the ones displayed in the GUI
     autoSaveResults(saveFilePath='fullpath'
                 description='C1s datasets - July 2015',
                 add=boolean  - add to an existing file?
@@ -2802,6 +2925,7 @@ class Torricelli(QMainWindow):
                         saveFilePath='auto',
                         description='automatically generated file',
                         add=True,
+                        results=None,
                         **kwargs):
         # list that stores the dictionaries with the results
         results_list = []
@@ -2820,7 +2944,10 @@ class Torricelli(QMainWindow):
                 filename += '_Torricelli_ver' + __version__ + '.csv'
             saveFilePath = str(self.ui.LineEdit_CurrentWorkingDirectory.text()
                               ) + os.sep + 'results' + os.sep + filename
-            current_results = self.get_dict_with_all_values()
+            if results is None:
+                current_results = self.get_dict_with_all_values()
+            else:
+                current_results = results
 
             # if a result file is already existing
             # search for a corresponding line to replace it
@@ -3111,23 +3238,25 @@ class Torricelli(QMainWindow):
 
     ## Function separated from theo_ndp() because it is to be used by residual_ey()
     def compute_ndp_from_gamma(self, gamma, Delta):
-        electron_emission_angle = self.ui.doubleSpinBox_ndp_phi.value(
-        ) * np.pi / 180  # \phi
-        Reflection_angle = 2 * self.ui.doubleSpinBox_sample_deviation_NI.value(
-        ) * np.pi / 180  # 2 times \xi
-        if self.ui.radioButton_pi_pol_light.isChecked(
-        ):  #Both for dipole AND dipole+quadrupole!
-            Q_0 = gamma * np.cos(electron_emission_angle) / 3.
-            Q_h = gamma * np.cos(electron_emission_angle -
-                                 Reflection_angle) / 3.
+        return self.nondipolar_model(Delta)(gamma)
+
+    ## Non-dipolar parameters as a function of gamma, for the emission angle phi of the GUI (or the given one, in degrees)
+    def nondipolar_model(self, Delta, emission_angle=None):
+        if emission_angle is None:
+            emission_angle = self.ui.doubleSpinBox_ndp_phi.value()
             P_electrons = self.ui.doubleSpinBox_EYinit_Pe.value()
-            Sr = P_electrons * P_electrons * (1 + Q_h) / (1 - Q_0)
-            Si, Psi = cmath.polar(P_electrons *
-                                  (1 + (Q_h - Q_0) / 2. + 1j * np.tan(Delta) *
-                                   (Q_h + Q_0) / 2.) / (1 - Q_0))
-            return Sr, Si, Psi, Q_0, Q_h
-        else:  # sigma pol,  #Both for dipole AND dipole+quadrupole!
-            return 1, 1, 0, 0, 0
+        else:
+            P_electrons = electron_polarization_factor(
+                emission_angle,
+                self.ui.doubleSpinBox_sample_deviation_NI.value())
+        return NonDipolarModel(
+            Delta,
+            emission_angle * np.pi / 180,  # \phi
+            2 * self.ui.doubleSpinBox_sample_deviation_NI.value() * np.pi /
+            180,  # 2 times \xi
+            P_electrons,
+            self.ui.radioButton_pi_pol_light.isChecked(
+            ))  #Both for dipole AND dipole+quadrupole!
 
     # The function that updates the SR, SI, Psi, Q0 and QH values when GUI is changed.
     def setYieldParameters(self):
@@ -3301,12 +3430,14 @@ class Torricelli(QMainWindow):
     ## ------------------ Argand Diagram ------------------ ##
     ##########################################################
     ## "Group" assembles similar "Dataset" together
-    ## Data are saved in self.ui.treeWidget_Argand_List
+    ## Data are saved in self.Argand_store (one numpy array per column, see pyArgandStore)
+    ## and shown by self.treeView_Argand through self.Argand_model.
+    ## Groups and datasets are designated by their id in the store, which is also their
+    ## ident in the Argand diagram.
     ## self.Argand_col is a dict of column indexes
 
     ## Creates a group. In groups, will be gather datasets to be displayed with the same symbol and color
     def Argand_AddGroup(self, GroupDict_new, refresh=False):
-        self.Argand_QTreeWidgetSignalsSwitch(on=False)
         if GroupDict_new is False:  # Called through the 'Add group' button
             group_name, group_confirmed = QInputDialog.getText(
                 self, 'Create a new group', 'Group name:')
@@ -3318,218 +3449,113 @@ class Torricelli(QMainWindow):
         else:
             GroupDict = self.Argand_default_group_dictionary.copy()
             GroupDict.update(GroupDict_new)
-        item = HashableQTreeWidgetItem(self.ui.treeWidget_Argand_List)
-        self.ui.treeWidget_Argand_List.setCurrentItem(item)
-        if 'checkState' in GroupDict:  # pass checkState if known
-            item.setCheckState(
-                self.Argand_col['Name'], QtCore.Qt.Checked if
-                GroupDict['checkState'] == 'checked' else QtCore.Qt.Unchecked)
-        else:
-            item.setCheckState(self.Argand_col['Name'], QtCore.Qt.Checked)
-        item.setText(self.Argand_col['Name'], str(GroupDict['Name']))
-        item.setText(self.Argand_col['Symbol'], str(GroupDict['Symbol']))
-        item.setText(self.Argand_col['Pc'], str(GroupDict['Pc']))
-        item.setText(self.Argand_col['Fc'], str(GroupDict['Fc']))
-        item.setText(self.Argand_col['Note'], str(GroupDict['Note']))
-        if type(GroupDict['Color']) == str or type(GroupDict['Color']) == tuple:
-            color = eval(str(GroupDict['Color']))
-            item.setBackground(self.Argand_col['Color'],
-                                    QColor(color[0], color[1], color[2]))
-        elif type(GroupDict['Color']) == QColor:
-            item.setBackground(self.Argand_col['Color'],
-                                    GroupDict['Color'])
-        else:
-            print('Unkonwn group color type:', type(GroupDict['Color']))
-        #item.setToolTip(   self.Argand_col['Name'], os.path.basename(str(DataDict['Path'])))
-        item.setIcon(
-            0,
-            QIcon(Torricelli_program_folder_path + os.sep + 'imports' + os.sep +
-                  'Torricelli_icon.png'))
-        item.setExpanded(True)
-        item.setFlags(
-            QtCore.Qt.ItemFlags(QtCore.Qt.ItemIsSelectable
-                                | QtCore.Qt.ItemIsEnabled
-                                | QtCore.Qt.ItemIsDropEnabled
-                                | QtCore.Qt.ItemIsUserCheckable))
-
-        self.Argand_QTreeWidgetSignalsSwitch(on=True)
+        gp = self.Argand_model.add_group(GroupDict)
+        self.treeView_Argand.expand(self.Argand_model.index_of(gp))
+        self.treeView_Argand.setCurrentIndex(self.Argand_model.index_of(gp))
         if refresh:
             self.Argand_refresh_tree_and_plot()
-        return item
+        return gp
 
-    ## Generic function that adds a data point to the treeWidget and plots into the Argand diagram
+    ## Generic function that adds a data point to the list and plots into the Argand diagram
     # takes in dict that contains all data and metadata of a point and adds it to the given group (gp)
     def Argand_AddDataset(self, gp, DataDict, refresh=False):
-        if DataDict['Fc_err'] == '':
-            DataDict['Fc_err'] = 0.0001
-        if DataDict['Pc_err'] == '':
-            DataDict['Pc_err'] = 0.0001
-        self.Argand_QTreeWidgetSignalsSwitch(on=False)
-        child = HashableQTreeWidgetItem(gp)
-        child.setFlags(
-            QtCore.Qt.ItemFlags(QtCore.Qt.ItemIsSelectable
-                                | QtCore.Qt.ItemIsEnabled
-                                | QtCore.Qt.ItemIsDragEnabled
-                                | QtCore.Qt.ItemIsUserCheckable))
-        if 'checkState' in DataDict:  # pass checkState if known
-            child.setCheckState(
-                self.Argand_col['Name'], QtCore.Qt.Checked
-                if DataDict['checkState'] == 'checked' else QtCore.Qt.Unchecked)
-        else:
-            child.setCheckState(self.Argand_col['Name'], QtCore.Qt.Checked)
-        child.setText(self.Argand_col['Name'], str(DataDict['Name']))
-        child.setToolTip(self.Argand_col['Name'], str(DataDict['Path']))
-        if type(DataDict['Color']) == str or type(DataDict['Color']) == tuple:
-            color = eval(str(DataDict['Color']))
-            child.setBackground(self.Argand_col['Color'],
-                                     QColor(color[0], color[1], color[2]))
-        elif type(DataDict['Color']) == QColor:
-            child.setBackground(self.Argand_col['Color'],
-                                     DataDict['Color'])
-        else:
-            print('Unkonwn point color type:', type(DataDict['Color']))
-        child.setText(self.Argand_col['Symbol'], str(DataDict['Symbol']))
-        child.setText(self.Argand_col['Pc'], str(DataDict['Pc']))
-        child.setText(self.Argand_col['Pc_err'], str(DataDict['Pc_err']))
-        child.setText(self.Argand_col['Fc'], str(DataDict['Fc']))
-        child.setText(self.Argand_col['Fc_err'], str(DataDict['Fc_err']))
-        child.setText(self.Argand_col['Sr'], str(DataDict['Sr']))
-        child.setText(self.Argand_col['Sr_err'], str(DataDict['Sr_err']))
-        child.setText(self.Argand_col['|Si|'], str(DataDict['|Si|']))
-        child.setText(self.Argand_col['Psi'], str(DataDict['Psi']))
-        child.setText(self.Argand_col['Q_0'], str(DataDict['Q_0']))
-        child.setText(self.Argand_col['Q_H'], str(DataDict['Q_H']))
-        child.setText(self.Argand_col['Gamma'], str(DataDict['Gamma']))
-        child.setText(self.Argand_col['Gamma_err'], str(DataDict['Gamma_err']))
-        child.setText(self.Argand_col['Delta'], str(DataDict['Delta']))
-        child.setText(self.Argand_col['Sigma'], str(DataDict['Sigma']))
-        child.setText(self.Argand_col['Component'], str(DataDict['Component']))
-        child.setText(self.Argand_col['Slice nb'],
-                      str(self.intOrEmpty(DataDict['Slice nb'])))
-        child.setText(self.Argand_col['delta hnu'], str(DataDict['delta hnu']))
-        child.setText(self.Argand_col['Yield file'],
-                      str(DataDict['Yield file']))
-        child.setText(self.Argand_col['Note'], str(DataDict['Note']))
-        child.setText(self.Argand_col['Core level'],
-                      str(DataDict['Core level']))
-        child.setText(self.Argand_col['Phi'], str(DataDict['Phi']))
-        child.setText(self.Argand_col['P el'], str(DataDict['P el']))
-        child.setText(self.Argand_col['Zeta'], str(DataDict['Zeta']))
-        child.setText(self.Argand_col['b sample'], str(DataDict['b sample']))
-        child.setText(self.Argand_col['b DCM'], str(DataDict['b DCM']))
-        child.setText(self.Argand_col['Xi'], str(DataDict['Xi']))
-        child.setText(self.Argand_col['Pol.'], str(DataDict['Pol.']))
-        child.setText(self.Argand_col['P Refl'], str(DataDict['P Refl']))
-        child.setText(self.Argand_col['R2 Refl'], str(DataDict['R2 Refl']))
-        child.setText(self.Argand_col['X2 Yield'], str(DataDict['X2 Yield']))
-        child.setText(self.Argand_col['Monte Carlo analysis'],
-                      str(DataDict['Monte Carlo analysis']))
-        child.setText(self.Argand_col['DW'], str(DataDict['DW']))
-        child.setText(self.Argand_col['Temp.'], str(DataDict['Temp.']))
-        child.setText(self.Argand_col['(hkl)'], str(DataDict['(hkl)']))
-        child.setText(self.Argand_col['Substrate'], str(DataDict['Substrate']))
-
-        # Alignment settings
-        #child.setTextElideMode(self.Argand_col['Yield file'], QtCore.Qt.ElideLeft)
-        #child.setTextAlignment(self.Argand_col['Yield file'], QtCore.Qt.ElideLeft)
-
-        # add Datapoint to diagram
-        if child.checkState(self.Argand_col['Name']) == QtCore.Qt.Checked:
-            try:
-                self.argand.addDataSet(data_argand=[float(child.text(self.Argand_col['Pc'])), float(child.text(self.Argand_col['Fc']))],\
-                                       data_err=[self.Argand_error_OR_0(child.text(self.Argand_col['Pc_err'])), self.Argand_error_OR_0(child.text(self.Argand_col['Fc_err']))], \
-                                       drawError=self.ui.checkBox_Argand_display_errorBars.isChecked(),\
-                                       color=child.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                       symb=str(child.text(self.Argand_col['Symbol'])),\
-                                       ident=id(child))
-            except ValueError:
-                self.argand.addDataSet(data_argand=[0.0, 0.0],\
-                                       data_err=[0.0, 0.0], \
-                                       drawError=self.ui.checkBox_Argand_display_errorBars.isChecked(),\
-                                       color=child.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                       symb=str(child.text(self.Argand_col['Symbol'])),\
-                                       ident=id(child))
-
-        if child.text(self.Argand_col['Pc']) == '-' or float(
-                child.text(self.Argand_col['Fc'])) < 1e-8:
-            child.setCheckState(self.Argand_col['Name'], False)
+        return self.Argand_AddDatasets(gp, [DataDict], refresh)[0]
+
+    ## Adds many data points to the group gp at once, see Argand_AddDataset
+    def Argand_AddDatasets(self, gp, DataDicts, refresh=False):
+        for DataDict in DataDicts:
+            if DataDict['Fc_err'] == '':
+                DataDict['Fc_err'] = 0.0001
+            if DataDict['Pc_err'] == '':
+                DataDict['Pc_err'] = 0.0001
+        ids = self.Argand_model.add_points(gp, DataDicts)
+        # points without position or fraction are not displayed
+        store = self.Argand_store
+        self.Argand_model.set_checked(
+            ids[store.dash['Pc'][ids] | ~(store.values['Fc'][ids] >= 1e-8)],
+            False)
+        self.Argand_plotDatasets(ids)
 
-        self.Argand_QTreeWidgetSignalsSwitch(on=True)
         if refresh:
             self.Argand_groupAverage([
                 gp
             ])  # recalculate group vector and replot it in argand diagram
+            self.Argand_resort()
+        return ids
 
-    # If the error are not existing, the '-' will be replaced by very small value,
+    # If the error are not existing (NaN in the store), they will be replaced by very small value,
     # if the error bars exist then the value is just given.
-    # input text, output float
     def Argand_error_OR_0(self, err):
-        if ('-' == err) or ('' == err):
+        if np.isnan(err):
             return 1e-5
         else:
             return float(err)
 
+    ## (Re)plots data points in the Argand diagram, if they are checked.
+    # The points of each group are given to the diagram at once.
+    def Argand_plotDatasets(self, ids):
+        store = self.Argand_store
+        ids = np.asarray(ids, dtype=np.int64)
+        self.argand.remove_dataSets(ids.tolist())
+        ids = ids[store.checked[ids]]
+        if len(ids) == 0:
+            return
+        pc = store.values['Pc'][ids]
+        fc = store.values['Fc'][ids]
+        # error bars that do not exist are replaced by very small values (see Argand_error_OR_0)
+        pc_err = np.where(np.isnan(store.values['Pc_err'][ids]), 1e-5,
+                          store.values['Pc_err'][ids])
+        fc_err = np.where(np.isnan(store.values['Fc_err'][ids]), 1e-5,
+                          store.values['Fc_err'][ids])
+        computable = np.isfinite(pc) & np.isfinite(fc)
+        if not np.all(computable):
+            print(
+                "\nWarning: Dataset vector positions and fractions are not computable. Group is empty or one data set has corrupt values.\n"
+            )
+            for values in (pc, fc, pc_err, fc_err):
+                values[~computable] = 0.0
+        # split the points by group
+        order = np.argsort(store.parent[ids], kind='stable')
+        groups, starts = np.unique(store.parent[ids][order], return_index=True)
+        for gp, in_gp in zip(groups, np.split(order, starts[1:])):
+            self.argand.addDataSets(pc[in_gp], fc[in_gp], pc_err[in_gp], fc_err[in_gp],
+                                    ids[in_gp].tolist(),
+                                    drawError=self.ui.checkBox_Argand_display_errorBars.isChecked(),
+                                    colors=store.color[ids[in_gp]],
+                                    symbols=store.texts['Symbol'][ids[in_gp]],
+                                    group=int(gp))
+
     ## Recalculates averages and refresh display
     def Argand_updateItems(self, item_list, col=None, recalcGP=True):
-
+        groupsChanged = set()
+        points = []
         for item in item_list:
-
-            # recalculate group average if points were edited
-            if recalcGP and self.Argand_isDataPoint(item):
-                self.Argand_groupAverage(
-                    gp_items=[item.parent()], refresh=False)
-
-            # check if group item, then delete and replot groupAverage
+            # check if group item, then replot groupAverage and its children (they follow its check state)
             if self.Argand_isGroup(item):
-                # remove group item if existing
-                if id(item) in self.argand.originVectorDict:
-                    self.argand.remove_originVector(id(item))
-                # check/uncheck all children (child items are removed recursivly via this function)
-                for i in range(item.childCount()):
-                    item.child(i).setCheckState(
-                        self.Argand_col['Name'],
-                        item.checkState(self.Argand_col['Name']))
-                if item.checkState(
-                        self.Argand_col['Name']) == QtCore.Qt.Checked:
-                    self.Argand_replotGroupAverage(item)
-
+                self.Argand_replotGroupAverage(item)
+                points += self.Argand_store.children[item]
             # if not group item it is a child. Remove if existing and add new item if checked
-            elif not self.Argand_isGroup(item):
-                # remove item if existing
-                if id(item) in self.argand.dataSetDict:
-                    self.argand.remove_dataSet(id(item))
-                # add item if checked
-                if item.checkState(
-                        self.Argand_col['Name']) == QtCore.Qt.Checked:
-                    try:
-                        self.argand.addDataSet(data_argand=[float(item.text(self.Argand_col['Pc'])), float(item.text(self.Argand_col['Fc']))],\
-                                               data_err=[float(item.text(self.Argand_col['Pc_err'])), float(item.text(self.Argand_col['Fc_err']))], \
-                                               drawError=self.ui.checkBox_Argand_display_errorBars.isChecked(),\
-                                               color=item.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                               symb=str(item.text(self.Argand_col['Symbol'])),\
-                                               ident=id(item))
-                    except ValueError:
-                        self.argand.addDataSet(data_argand=[0.0, 0.0],\
-                                               data_err=[0.0, 0.0], \
-                                               drawError=self.ui.checkBox_Argand_display_errorBars.isChecked(),\
-                                               color=item.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                               symb=str(item.text(self.Argand_col['Symbol'])),\
-                                               ident=id(item))
-
+            else:
+                # recalculate group average if points were edited
+                if recalcGP:
+                    groupsChanged.add(self.Argand_store.group_of(item))
+                points.append(item)
+        self.Argand_plotDatasets(points)
+
+        if len(groupsChanged) > 0:
+            self.Argand_groupAverage(gp_items=list(groupsChanged))
         self.Argand_selectionChanged()
 
     ## Removes the selected group and its datasets, or the selected current datasets
-    # Since the items in the diagram are connected with the id() of the TreeWidgetItems
+    # Since the items in the diagram are connected with the ids of the store
     # we can access each single element and remove it. There is no need of replotting the whole diagram.
     def Argand_Remove(self, item_list):
-        # do not use the remove signal.
-        # reason: if several items are removed the signal would be emitted after each removed item
-        # In this way the group average is calculated AFTER removal of ALL the (selected) items
+        if len(item_list) == 0:
+            return
         name = ''
         for i in range(len(item_list)):
             if i < 10:
-                name = name + str(item_list[i].text(
-                    self.Argand_col['Name'])) + '\n'
+                name = name + str(self.Argand_store.texts['Name'][item_list[i]]) + '\n'
         if len(item_list) >= 10:
             name = name + '...'
         reply = QMessageBox.question(self, 'Delete items',\
@@ -3537,50 +3563,22 @@ class Torricelli(QMainWindow):
                                            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
 
         if reply == QMessageBox.Yes:
-            groupsChanged = set()
-            item_list_ch = set()
-            item_list_gp = set()
-
-            # Devide item_list in children and groups to avoid conflicts if removing both simultaneously
-            for currentItem in item_list:
-                if not self.Argand_isGroup(currentItem):
-                    item_list_ch.add(currentItem)
-                elif self.Argand_isGroup(currentItem):
-                    item_list_gp.add(currentItem)
-                else:
-                    print("ERROR while removing item: unknown item type.")
-
-            # Make sure you delete points BEFORE groups!
-            # Otherwise there is a bug when deleting points of a group together with the parent group.
-            for currentItem in item_list_ch:  # Iterate through all points
-                if not self.Argand_isGroup(currentItem):
-                    # if the group that is changed will be deleted, too
-                    # avoid that the group will be updated because
-                    # it will not exist anymore
-                    if not currentItem.parent() in item_list:
-                        groupsChanged.add(currentItem.parent())
-                    self.argand.remove_dataSet(id(currentItem))
-
-                    # delete the item in the TreeWidget
-                    sip.delete(
-                        currentItem
-                    )  # using the C++ 'delete' command... works fine and immediately
-
-            # Deleting groups including their children
-            for currentItem in item_list_gp:  # Iterate through all groups
-                # If a group is deleted, make sure the children are deleted, too
-                if self.Argand_isGroup(currentItem):
-                    for i in range(currentItem.childCount()):
-                        self.argand.remove_dataSet(id(currentItem.child(i)))
-                    self.argand.remove_originVector(id(currentItem))
-
-                    # delete the item in the TreeWidget
-                    sip.delete(
-                        currentItem
-                    )  # using the C++ 'delete' command... works fine and immediately
+            store = self.Argand_store
+            item_list_gp = set(i for i in item_list if self.Argand_isGroup(i))
+            # groups that lose points but are not deleted themselves
+            groupsChanged = set(
+                store.group_of(i) for i in item_list
+                if not self.Argand_isGroup(i)) - item_list_gp
+            points = [i for i in item_list if not self.Argand_isGroup(i)]
+            points += store.points(list(item_list_gp)).tolist()
+            self.argand.remove_dataSets(points)
+            for gp in item_list_gp:
+                if gp in self.argand.originVectorDict:
+                    self.argand.remove_originVector(gp)
+            self.Argand_model.remove(item_list)
 
             # recalculate the group average of the groups that changed and are still existant
-            self.Argand_groupAverage(gp_items=groupsChanged)
+            self.Argand_groupAverage(gp_items=list(groupsChanged))
 
     ## This will remove all elements of your list and clear the Argand Diagram
     def Argand_RemoveAll(self):
@@ -3590,17 +3588,20 @@ class Torricelli(QMainWindow):
                 str(self.ui.LineEdit_CurrentWorkingDirectory.text()) + os.sep +
                 self.argand_SaveSubFolder + 'autosave_' + self.timestamp() +
                 '_beforeRemoveAll.csv')
-            self.ui.treeWidget_Argand_List.clear()  # clear the TreeWidget
+            self.Argand_model.clear()  # clear the list
             self.argand.clearArgand()  # clear the argandDiagram
 
+    ## Id of the current group, or of the group of the current data point (None if there is no current item)
+    def Argand_currentGroup(self):
+        current_item = self.Argand_currentItem()
+        if current_item is None:
+            return None
+        return self.Argand_store.group_of(current_item)
+
     ## Ask the user to choose the .log file containing Torricelli fit results in which results are loaded
     def Argand_ValueLogFile(self):
-        current_item = self.ui.treeWidget_Argand_List.currentItem()
-        if current_item.parent() is None:
-            current_gp = current_item
-        else:
-            current_gp = current_item.parent()
-        if current_gp is not None and self.Argand_isGroup(current_gp):
+        current_gp = self.Argand_currentGroup()
+        if current_gp is not None:
             dataset_names, _ = QFileDialog.getOpenFileNames(
                 self, "Open Files",
                 self.ui.LineEdit_CurrentWorkingDirectory.text(),
@@ -3610,7 +3611,7 @@ class Torricelli(QMainWindow):
                     try:
                         with open(dataset_name, 'r') as log_file:
                             lastLine = log_file.readlines()[-1]
-                            dic = self.Argand_default_data_dictionary
+                            dic = self.Argand_default_data_dictionary.copy()
                             if 5 == len(
                                     lastLine.split('\t')
                             ):  # Output from old Torricelli version (before r70)
@@ -3619,7 +3620,7 @@ class Torricelli(QMainWindow):
                                             'Q'         : lastLine.split('\t')[3].split('=')[1],\
                                             'Delta'     : lastLine.split('\t')[4].split('=')[1],\
                                             'Path'      : dataset_name,\
-                                            'Color'     : current_gp.background(self.Argand_col['Color']),\
+                                            'Color'     : tuple(self.Argand_store.color[current_gp]),\
                                             'Symbol'    : 'o'})
                                 self.Argand_AddDataset(current_gp, dic)
                             else:
@@ -3634,13 +3635,8 @@ class Torricelli(QMainWindow):
 
     ##  Requires the user to type the values in.
     def Argand_ManualValues(self):
-        current_item = self.ui.treeWidget_Argand_List.currentItem()
-        if current_item.parent() is None:
-            current_gp = current_item
-        else:
-            current_gp = current_item.parent()
-
-        if current_gp is not None and self.Argand_isGroup(current_gp):
+        current_gp = self.Argand_currentGroup()
+        if current_gp is not None:
             dic = self.Argand_default_data_dictionary.copy()
             dialog = QDialog_manualVal()
             if dialog.exec_():  # only if OK is clicked
@@ -3657,323 +3653,102 @@ class Torricelli(QMainWindow):
                             'Gamma_err' : dialog.ui.doubleSpinBox_gammaErr.value(),\
                             'SR_err'    : dialog.ui.doubleSpinBox_SRErr.value(),\
                             'Symbol'    : 'o',\
-                            'Color'     : current_gp.background(self.Argand_col['Color']).color().getRgb()[0:3],\
+                            'Color'     : tuple(self.Argand_store.color[current_gp]),\
                             'Name'      : name})
                 self.Argand_AddDataset(current_gp, dic)
 
-    ## Displays the selected items in the Diagram
-    # Works only for data sets. No average value of the group yet.
+    ## Displays the checked items in the Diagram, from the arrays of the store
     def Argand_replotDiagram(self):
         self.ui.statusbar.showMessage("LOADING & PLOTTING - in progress")
         self.argand.clearArgand()
+        store = self.Argand_store
         # show a ProgressBar in statusbar while plotting
         progressLabel0 = QLabel()
         progressLabel1 = QLabel()
-        progressLabel2 = QLabel()
         progressBarGROUP = QProgressBar()
-        progressBarCHILD = QProgressBar()
         progressLabel0.setText("PLOTTING - ")
         progressLabel1.setText("Groups: ")
-        progressLabel2.setText("Datapoints of group: ")
         self.ui.statusbar.addPermanentWidget(progressLabel0)
         self.ui.statusbar.addPermanentWidget(progressLabel1)
         self.ui.statusbar.addPermanentWidget(progressBarGROUP)
-        self.ui.statusbar.addPermanentWidget(progressLabel2)
-        self.ui.statusbar.addPermanentWidget(progressBarCHILD)
-
-        # Unfortunately QTreeWidgetItemIterator does not work in Python
-        # Using: https://riverbankcomputing.com/pipermail/pyqt/2007-July/016823.html
-        root = self.ui.treeWidget_Argand_List.invisibleRootItem()
-        child_count = root.childCount()
-        for i in range(child_count):  # Iterate on the groups
-            gp = root.child(i)
-            if gp.checkState(self.Argand_col['Name']) == QtCore.Qt.Checked:
-                if str(gp.text(self.Argand_col['Pc_err'])) == '-':
-                    g_Pcerr = 0.0
-                else:
-                    g_Pcerr = float(gp.text(self.Argand_col['Pc_err']))
-                if str(gp.text(self.Argand_col['Fc_err'])) == '-':
-                    g_Fcerr = 0.0
-                else:
-                    g_Fcerr = float(gp.text(self.Argand_col['Fc_err']))
-                try:
-                    self.argand.addOriginVector(pc=float(gp.text(self.Argand_col['Pc'])),\
-                                                fc=float(gp.text(self.Argand_col['Fc'])),\
-                                                pc_err=g_Pcerr,\
-                                                fc_err=g_Fcerr,\
-                                                drawOriginLine = self.ui.checkBox_Argand_display_originVectors.isChecked(),\
-                                                drawError = self.ui.checkBox_Argand_display_group_errorBars.isChecked(),\
-                                                symb=str(gp.text(self.Argand_col['Symbol'])),\
-                                                color=gp.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                                ident=id(gp))
-                # if no float value for pc or fc is given draw an origin vector with pc and fc equal 0
-                except ValueError:
-                    print(
-                        "\nWarning: Group vector positions and fractions are not computable. Group is empty or one data set has corrupt values.\n"
-                    )
-                    self.argand.addOriginVector(pc=0.0,\
-                                                fc=0.0,\
-                                                pc_err=0.0,\
-                                                fc_err=0.0,\
-                                                drawOriginLine = self.ui.checkBox_Argand_display_originVectors.isChecked(),\
-                                                drawError = self.ui.checkBox_Argand_display_group_errorBars.isChecked(),\
-                                                symb=str(gp.text(self.Argand_col['Symbol'])),\
-                                                color=gp.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                                ident=id(gp))
-
-                gp_children = gp.childCount()
-                for j in range(gp_children):  # Iterate in all points in a group
-                    point = gp.child(j)
-                    if point.checkState(
-                            self.Argand_col['Name']) == QtCore.Qt.Checked:
-                        if str(gp.text(self.Argand_col['Pc_err'])) == '-':
-                            Pcerr = 0.0
-                        else:
-                            Pcerr = float(point.text(self.Argand_col['Pc_err']))
-                        if str(gp.text(self.Argand_col['Fc_err'])) == '-':
-                            Fcerr = 0.0
-                        else:
-                            Fcerr = float(point.text(self.Argand_col['Fc_err']))
-
-                        try:
-                            self.argand.addDataSet(data_argand=[float(point.text(self.Argand_col['Pc'])), float(point.text(self.Argand_col['Fc']))],\
-                                                   data_err=[Pcerr, Fcerr],\
-                                                       #[float(point.text(self.Argand_col['Pc_err'])), float(point.text(self.Argand_col['Fc_err']))],\
-                                                   drawError=self.ui.checkBox_Argand_display_errorBars.isChecked(), \
-                                                   color=point.background(self.Argand_col['Color']).color().getRgb()[0:3], \
-                                                   symb=str(point.text(self.Argand_col['Symbol'])), \
-                                                   ident=id(point))
-                        except ValueError:
-                            print(
-                                "\nWarning: Dataset vector positions and fractions are not computable. Group is empty or one data set has corrupt values.\n"
-                            )
-                            self.argand.addDataSet(data_argand=[0.0, 0.0],\
-                                                   data_err=[0.0, 0.0],\
-                                                       #[float(point.text(self.Argand_col['Pc_err'])), float(point.text(self.Argand_col['Fc_err']))],\
-                                                   drawError=self.ui.checkBox_Argand_display_errorBars.isChecked(), \
-                                                   color=point.background(self.Argand_col['Color']).color().getRgb()[0:3], \
-                                                   symb=str(point.text(self.Argand_col['Symbol'])), \
-                                                   ident=id(point))
-
-                    progressBarGROUP.setValue(
-                        round(float(i + 1) / child_count * 100))
-                    progressBarCHILD.setValue(
-                        round(float(j + 1) / gp_children * 100))
-                    # old but gold:
-                    #self.ui.statusbar.showMessage("PLOTTING - "+self.progressBar(i+1,child_count,50,prefix="Groups: ")+"   "+self.progressBar(j+1,gp_children,50,prefix="Datapoints of group: "), 20000)
+
+        # the points of a group are drawn together, by a single item of the diagram
+        child_count = len(store.groups)
+        for i, gp in enumerate(store.groups):  # Iterate on the groups
+            if store.checked[gp]:
+                self.Argand_addGroupVector(gp)
+                self.Argand_plotDatasets(store.children[gp])
+            progressBarGROUP.setValue(round(float(i + 1) / child_count * 100))
+        self.argand.updateDataSets()
 
         # remove the progress bars
         self.ui.statusbar.removeWidget(progressLabel0)
         self.ui.statusbar.removeWidget(progressLabel1)
         self.ui.statusbar.removeWidget(progressBarGROUP)
-        self.ui.statusbar.removeWidget(progressLabel2)
-        self.ui.statusbar.removeWidget(progressBarCHILD)
         self.Argand_splitVector()
         self.Argand_Labels(self.ui.checkBox_displayLabels.isChecked())
         self.ui.statusbar.showMessage("LOADING & PLOTTING - complete", 10000)
 
-    ## replots the group average vectors if there were changes in the treeWidget
+    ## Plots the average vector of a group
+    def Argand_addGroupVector(self, gp):
+        store = self.Argand_store
+        pc = store.values['Pc'][gp]
+        fc = store.values['Fc'][gp]
+        if np.isfinite(pc) and np.isfinite(fc):
+            pc_err = self.Argand_error_OR_0(store.values['Pc_err'][gp])
+            fc_err = self.Argand_error_OR_0(store.values['Fc_err'][gp])
+        # if no float value for pc or fc is given draw an origin vector with pc and fc equal 0
+        else:
+            print(
+                "\nWarning: Group vector positions and fractions are not computable. Group is empty or one data set has corrupt values.\n"
+            )
+            pc = fc = pc_err = fc_err = 0.0
+        self.argand.addOriginVector(pc=pc,\
+                                    fc=fc,\
+                                    pc_err=pc_err,\
+                                    fc_err=fc_err,\
+                                    drawOriginLine = self.ui.checkBox_Argand_display_originVectors.isChecked(),\
+                                    drawError = self.ui.checkBox_Argand_display_group_errorBars.isChecked(),\
+                                    symb=str(store.texts['Symbol'][gp]),\
+                                    color=tuple(int(c) for c in store.color[gp]),\
+                                    ident=gp)
+
+    ## replots the group average vectors if there were changes in the list
     def Argand_replotGroupAverage(self, item):
-        if self.Argand_isGroup(item) and item.childCount() > 0:
-            # remove the old group vector if there is already one in the diagram
-            if id(item) in self.argand.originVectorDict:
-                self.argand.remove_originVector(ident=id(item))
-            if item.checkState(self.Argand_col['Name']) == QtCore.Qt.Checked:
-                try:
-                    self.argand.addOriginVector(pc=float(item.text(self.Argand_col['Pc'])),\
-                                                fc=float(item.text(self.Argand_col['Fc'])),\
-                                                pc_err=self.Argand_error_OR_0(item.text(self.Argand_col['Pc_err'])),\
-                                                fc_err=self.Argand_error_OR_0(item.text(self.Argand_col['Fc_err'])),\
-                                                drawOriginLine = self.ui.checkBox_Argand_display_originVectors.isChecked(),\
-                                                drawError = self.ui.checkBox_Argand_display_group_errorBars.isChecked(),\
-                                                symb=str(item.text(self.Argand_col['Symbol'])),\
-                                                color=item.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                                ident=id(item))
-                except ValueError:
-                    print(
-                        "\nWarning: Group vector positions and fractions are not computable. Group is empty or one data set has corrupt values.\n"
-                    )
-                    self.argand.addOriginVector(pc=0.0,\
-                                                fc=0.0,\
-                                                pc_err=0.0,\
-                                                fc_err=0.0,\
-                                                drawOriginLine = self.ui.checkBox_Argand_display_originVectors.isChecked(),\
-                                                drawError = self.ui.checkBox_Argand_display_group_errorBars.isChecked(),\
-                                                symb=str(item.text(self.Argand_col['Symbol'])),\
-                                                color=item.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                                ident=id(item))
-        # remove group vector if the number of childs is empty
-        elif self.Argand_isGroup(item) and item.childCount() == 0 and id(
-                item) in self.argand.originVectorDict:
-            self.argand.remove_originVector(ident=id(item))
+        # remove the old group vector if there is already one in the diagram
+        if item in self.argand.originVectorDict:
+            self.argand.remove_originVector(ident=item)
+        # no group vector if the group is empty
+        if len(self.Argand_store.children[item]) > 0 \
+           and self.Argand_store.checked[item]:
+            self.Argand_addGroupVector(item)
 
         self.Argand_Labels(self.ui.checkBox_displayLabels.isChecked())
 
-    ## Compute the average Fc and Pc for all groups
+    ## Compute the average Fc and Pc for all groups, or for the groups given
     # Uses a proper error propagation
     def Argand_groupAverage(self, gp_items=[], refresh=True):
-        self.Argand_QTreeWidgetSignalsSwitch(on=False)
-        root = self.ui.treeWidget_Argand_List.invisibleRootItem()
-        # if no items are given process all group items
-        if len(gp_items) == 0:
-            gp_items = list(map(root.child, list(range(root.childCount()))))
-        if root.childCount() == 0:
+        store = self.Argand_store
+        if len(store.groups) == 0:
             return  # There is nothing at all!
+        # if no items are given process all group items,
+        # and sum their points again instead of relying on the running sums
+        if len(gp_items) == 0:
+            gp_items = list(store.groups)
+            store.update_sums()
 
-        gp_items_with_possible_averaging = gp_items
-        # if at least on point has no error bars, then no average is calculated:
-        for current_gp in gp_items:  # Iterate on the groups
-            for child_index in range(current_gp.childCount()):
-                if current_gp.child(child_index).text(
-                        self.Argand_col['Pc_err']
-                ) == '-' or current_gp.child(child_index).text(
-                        self.Argand_col['Fc_err']
-                ) == '-' or current_gp.child(child_index).text(
-                        self.Argand_col['Pc_err']
-                ) == '' or current_gp.child(child_index).text(
-                        self.Argand_col['Fc_err']) == '' or float(
-                            current_gp.child(child_index).text(
-                                self.Argand_col['Pc_err'])) < 1e-8 or float(
-                                    current_gp.child(child_index).text(
-                                        self.Argand_col['Fc_err'])) < 1e-8:
-                    current_gp.setText(self.Argand_col['Pc'], '0')
-                    current_gp.setText(self.Argand_col['Fc'], '0')
-                    current_gp.setText(self.Argand_col['Pc_err'], '-')
-                    current_gp.setText(self.Argand_col['Fc_err'], '-')
-                    gp_items_with_possible_averaging.remove(current_gp)
-                    break
-
-        for current_gp in gp_items_with_possible_averaging:  # Iterate on the groups
-            if current_gp.childCount() == 0:
-                current_gp.setText(self.Argand_col['Pc'], '-')
-                current_gp.setText(self.Argand_col['Fc'], '-')
-                current_gp.setText(self.Argand_col['Pc_err'], '-')
-                current_gp.setText(self.Argand_col['Fc_err'], '-')
-            elif current_gp.childCount() == 1:
-                current_gp.setText(
-                    self.Argand_col['Pc'],
-                    current_gp.child(0).text(self.Argand_col['Pc']))
-                current_gp.setText(
-                    self.Argand_col['Fc'],
-                    current_gp.child(0).text(self.Argand_col['Fc']))
-                current_gp.setText(
-                    self.Argand_col['Pc_err'],
-                    current_gp.child(0).text(self.Argand_col['Pc_err']))
-                current_gp.setText(
-                    self.Argand_col['Fc_err'],
-                    current_gp.child(0).text(self.Argand_col['Fc_err']))
-            else:  # At least 2 points
-                # First go into cartesian coordinates, where the average is performed
-                av_Re = 0
-                av_Im = 0
-                av_weighting_norm_factor_Re = 0
-                av_weighting_norm_factor_Im = 0
-                for child_index in range(current_gp.childCount()):
-                    try:
-                        child_pc = float(
-                            current_gp.child(child_index).text(
-                                self.Argand_col['Pc']))
-                        child_fc = float(
-                            current_gp.child(child_index).text(
-                                self.Argand_col['Fc']))
-                    except ValueError:
-                        child_pc = 0.0
-                        child_fc = 0.0
-                        QMessageBox.warning(
-                            self, "ERROR",
-                            "Your coherent position or coherent fraction is not computable. Check your yield fit!"
-                        )
-                    pc_err_child = float(
-                        current_gp.child(child_index).text(
-                            self.Argand_col['Pc_err']))
-                    fc_err_child = float(
-                        current_gp.child(child_index).text(
-                            self.Argand_col['Fc_err']))
-                    err_child_Re = np.sqrt(
-                        (np.cos(2 * np.pi * child_pc) * fc_err_child)**2 +
-                        (2 * np.pi * child_fc * np.sin(2 * np.pi * child_pc) *
-                         pc_err_child)**2)
-                    err_child_Im = np.sqrt(
-                        (np.sin(2 * np.pi * child_pc) * fc_err_child)**2 +
-                        (2 * np.pi * child_fc * np.cos(2 * np.pi * child_pc) *
-                         pc_err_child)**2)
-                    av_weighting_norm_factor_Re = av_weighting_norm_factor_Re + 1 / (
-                        err_child_Re)**2
-                    av_weighting_norm_factor_Im = av_weighting_norm_factor_Im + 1 / (
-                        err_child_Im)**2
-                    av_Re = av_Re + child_fc * np.cos(
-                        2 * np.pi * child_pc) / (err_child_Re)**2
-                    av_Im = av_Im + child_fc * np.sin(
-                        2 * np.pi * child_pc) / (err_child_Im)**2
-
-                av_Re = av_Re / av_weighting_norm_factor_Re
-                av_Im = av_Im / av_weighting_norm_factor_Im
-                av_err_Re = np.sqrt(1 / av_weighting_norm_factor_Re)
-                av_err_Im = np.sqrt(1 / av_weighting_norm_factor_Im)
-                # In the case of data point spread larger than the propagated error bars,
-                # let's compute the std deviation with respect to weighted averages
-                av_err_Re_StdDev = 0
-                av_err_Im_StdDev = 0
-                for child_index in range(current_gp.childCount(
-                )):  # (as av_Re and av_Im are required, we need a second loop!)
-                    try:
-                        child_pc = float(
-                            current_gp.child(child_index).text(
-                                self.Argand_col['Pc']))
-                        child_fc = float(
-                            current_gp.child(child_index).text(
-                                self.Argand_col['Fc']))
-                    except ValueError:
-                        child_pc = 0.0
-                        child_fc = 0.0
-                        QMessageBox.warning(
-                            self, "ERROR",
-                            "Your coherent position or coherent fraction is not computable. Check your yield fit!"
-                        )
-                    av_err_Re_StdDev = av_err_Re_StdDev + (
-                        child_fc * np.cos(2 * np.pi * child_pc) - av_Re)**2
-                    av_err_Im_StdDev = av_err_Im_StdDev + (
-                        child_fc * np.sin(2 * np.pi * child_pc) - av_Im)**2
-                av_err_Re_StdDev = np.sqrt(av_err_Re_StdDev /
-                                           (current_gp.childCount() - 1))
-                av_err_Im_StdDev = np.sqrt(av_err_Im_StdDev /
-                                           (current_gp.childCount() - 1))
-
-                #Now back to polar coordinates
-                av_pc = np.arctan2(av_Im, av_Re) / (2 * np.pi)
-                if av_pc < 0.:
-                    av_pc = av_pc + 1.
-                av_fc = np.sqrt(av_Re**2 + av_Im**2)
-                av_err_pc_ErrorPropagation = np.sqrt(
-                    (av_Im * av_err_Re / (2 * np.pi * av_fc**2))**2 +
-                    (av_Re * av_err_Im / (2 * np.pi * av_fc**2))**2)
-                av_err_pc_StdDev = np.sqrt((av_Im * av_err_Re_StdDev /
-                                            (2 * np.pi * av_fc**2))**2 +
-                                           (av_Re * av_err_Im_StdDev /
-                                            (2 * np.pi * av_fc**2))**2)
-                av_err_fc_ErrorPropagation = np.sqrt(
-                    (av_Re * av_err_Re / av_fc)**2 +
-                    (av_Im * av_err_Im / av_fc)**2)
-                av_err_fc_StdDev = np.sqrt(
-                    (av_Re * av_err_Re_StdDev / av_fc)**2 +
-                    (av_Im * av_err_Im_StdDev / av_fc)**2)
-
-                #if np.isnan(av_pc) or np.isnan(av_fc) or np.isnan(max(av_err_pc_ErrorPropagation, av_err_pc_StdDev)) or np.isnan(max(av_err_fc_ErrorPropagation, av_err_fc_StdDev))):
-
-                current_gp.setText(self.Argand_col['Pc'], str('%.4f' % av_pc))
-                current_gp.setText(self.Argand_col['Fc'], str('%.4f' % av_fc))
-                # Choose the largest error bars:
-                current_gp.setText(
-                    self.Argand_col['Pc_err'],
-                    str(max(av_err_pc_ErrorPropagation, av_err_pc_StdDev)))
-                current_gp.setText(
-                    self.Argand_col['Fc_err'],
-                    str(max(av_err_fc_ErrorPropagation, av_err_fc_StdDev)))
-
+        if np.any(store.not_computable(gp_items)):
+            QMessageBox.warning(
+                self, "ERROR",
+                "Your coherent position or coherent fraction is not computable. Check your yield fit!"
+            )
+        # all averages are computed at once from the sums of the groups (see pyArgandStore)
+        for column, (numbers, dash) in store.averages(gp_items).items():
+            self.Argand_model.set_numbers(gp_items, column, numbers, dash)
         if refresh:
-            self.Argand_replotGroupAverage(
-                current_gp)  # replot the group average vector
-        self.Argand_QTreeWidgetSignalsSwitch(on=True)
+            for current_gp in gp_items:
+                self.Argand_replotGroupAverage(
+                    current_gp)  # replot the group average vector
 
     ## convert a complex (cartesian) value to positon and fraction
     # Makes sure that 0<pc<1
@@ -3986,7 +3761,7 @@ class Torricelli(QMainWindow):
             pc = pc + 1.
         return pc, fc
 
-    ## connecting/disconnecting singals sensitive to changings in the TreeWidget
+    ## connecting/disconnecting singals sensitive to changings in the list
     # it is important that one is able to connect/disconnect this signals easily
     # because if you are e.g. loading a file you do not want Torricelli to react
     # after every line. This increases performance!
@@ -3999,87 +3774,113 @@ class Torricelli(QMainWindow):
                 on = True
         elif on == self.Argand_QTreeWidgetSignalsOn:
             return on  # already set as wished, nothing to do
-        # connecting/disconnecting singals sensitive to changings in the TreeWidget
+        # connecting/disconnecting singals sensitive to changings in the list
         if on:
-            self.ui.treeWidget_Argand_List.itemDoubleClicked.connect(
-                self.Argand_editColumn)
-            self.ui.treeWidget_Argand_List.itemClicked.connect(
-                self.Argand_editColumn)
-            self.ui.treeWidget_Argand_List.itemSelectionChanged.connect(
+            self.treeView_Argand.doubleClicked.connect(self.Argand_editColumn)
+            self.treeView_Argand.clicked.connect(self.Argand_editColumn)
+            self.treeView_Argand.selectionModel().selectionChanged.connect(
                 self.Argand_selectionChanged)
-            self.ui.treeWidget_Argand_List.itemChanged.connect(
-                lambda item, col: self.Argand_updateItems(
-                    item_list=[item], col=col, recalcGP=True))
+            self.Argand_model.itemsEdited.connect(
+                lambda item_list, col: self.Argand_updateItems(
+                    item_list=item_list, col=col, recalcGP=True))
+            self.Argand_model.checkStateChanged.connect(
+                lambda item_list: self.Argand_updateItems(
+                    item_list=item_list, recalcGP=True))
+            # groups that lost or received points via drag/drop
+            self.Argand_model.groupsChanged.connect(
+                lambda gp_items: self.Argand_groupAverage(gp_items=gp_items))
         else:
-            self.ui.treeWidget_Argand_List.itemDoubleClicked.disconnect()
-            self.ui.treeWidget_Argand_List.itemClicked.disconnect()
-            self.ui.treeWidget_Argand_List.itemSelectionChanged.disconnect()
-            self.ui.treeWidget_Argand_List.itemChanged.disconnect()
+            self.treeView_Argand.doubleClicked.disconnect()
+            self.treeView_Argand.clicked.disconnect()
+            self.treeView_Argand.selectionModel().selectionChanged.disconnect()
+            self.Argand_model.itemsEdited.disconnect()
+            self.Argand_model.checkStateChanged.disconnect()
+            self.Argand_model.groupsChanged.disconnect()
         self.Argand_QTreeWidgetSignalsOn = on
         return on
 
     def Argand_isDataPoint(self, item):
-        return (item.parent() is not self.ui.treeWidget_Argand_List and
-                not self.Argand_isGroup(item))
+        return not self.Argand_isGroup(item)
 
-    ## return True if the selected item is a group
-    #  return False if the selected item a dataset
+    ## return True if the item is a group
+    #  return False if the item a dataset
     def Argand_isGroup(self, item):
-        return (item.parent() is None)
+        return self.Argand_store.is_group(item)
+
+    ## Id of the current item of the list, None if there is none
+    def Argand_currentItem(self):
+        index = self.treeView_Argand.currentIndex()
+        if not index.isValid():
+            return None
+        return self.Argand_model.id_of(index)
+
+    ## Ids of the selected items of the list
+    def Argand_selectedItems(self):
+        return [
+            self.Argand_model.id_of(index)
+            for index in self.treeView_Argand.selectionModel().selectedRows()
+        ]
 
     ## Return the RGB of selected item
     def Agand_currentColor(self):
-        ci = self.ui.treeWidget_Argand_List.currentItem()
-        return ci.background(
-            self.Argand_col['Color']).color().getRgb()[0:3]  #This return also alpha
-
-    def Argand_selectionChanged(self):
-        items = self.ui.treeWidget_Argand_List.selectedItems()
-        self.argand.markSelected(list(map(id, items)))
+        return tuple(int(c) for c in self.Argand_store.color[self.Argand_currentItem()])
+
+    def Argand_selectionChanged(self, *args):
+        self.argand.markSelected(self.Argand_selectedItems())
+
+    ## Selects in the list the data points picked in the Argand diagram
+    # (the selection in the diagram then follows the list, see Argand_selectionChanged)
+    def Argand_selectFromDiagram(self, item_list, extend=False):
+        store = self.Argand_store
+        model = self.Argand_model
+        # consecutive rows of a group are selected as one range
+        rows = sorted((store.position(store.parent[i]), store.position(i), i)
+                      for i in item_list
+                      if store.alive[i] and not store.is_group(i))
+        selection = QItemSelection()
+        first = last = None
+        for gp_row, row, i in rows + [(None, None, None)]:
+            if last is not None and (gp_row, row) == (last[0], last[1] + 1):
+                last = (gp_row, row, i)
+                continue
+            if first is not None:
+                selection.select(model.index_of(first[2]),
+                                 model.index_of(last[2], model.columnCount() - 1))
+            first = last = (gp_row, row, i)
+        if extend:
+            flags = QItemSelectionModel.Select | QItemSelectionModel.Rows
+        else:
+            flags = QItemSelectionModel.ClearAndSelect | QItemSelectionModel.Rows
+        self.treeView_Argand.selectionModel().select(selection, flags)
+        if len(rows) > 0:
+            self.treeView_Argand.scrollTo(model.index_of(rows[0][2]))
 
     ## allows to edit the specified column
-    def Argand_editColumn(self, item_clicked, col):
-        # Only execute if the right mouse button is used
-        # set item non editable if column should not be handled via standard editor of QTreeWidget
-        if not self.Argand_isGroup(
-                item_clicked
-        ):  # make sure not to change group item flags (they are always non editable since they are calculated)
-            signalsON = self.Argand_QTreeWidgetSignalsSwitch(
-                on=False)  #changing flags shall not emit signals
-            # Use the standard edit mode of QTreeWidget for other columns that should be editable
-            if col in self.editableColumns:
-                item_clicked.setFlags(
-                    QtCore.Qt.ItemFlags(QtCore.Qt.ItemIsSelectable
-                                        | QtCore.Qt.ItemIsEditable
-                                        | QtCore.Qt.ItemIsEnabled
-                                        | QtCore.Qt.ItemIsDragEnabled
-                                        | QtCore.Qt.ItemIsUserCheckable))
-                if self.TreeWidgetMouseButtonReleasedEvent == QtCore.Qt.RightButton:  # add the right click as a "editTrigger"
-                    self.ui.treeWidget_Argand_List.editItem(item_clicked, col)
-            elif col not in self.editableColumns:
-                item_clicked.setFlags(
-                    QtCore.Qt.ItemFlags(QtCore.Qt.ItemIsSelectable
-                                        | QtCore.Qt.ItemIsEnabled
-                                        | QtCore.Qt.ItemIsDragEnabled
-                                        | QtCore.Qt.ItemIsUserCheckable))
-            self.Argand_QTreeWidgetSignalsSwitch(on=True)
+    def Argand_editColumn(self, index):
+        col = index.column()
+        # Use the standard edit mode of the list for other columns that should be editable
+        # (the model only lets the editable columns of data points be edited)
+        if col in self.editableColumns and self.TreeWidgetMouseButtonReleasedEvent == QtCore.Qt.RightButton:  # add the right click as a "editTrigger"
+            self.treeView_Argand.edit(index)
 
         if self.TreeWidgetMouseButtonReleasedEvent == QtCore.Qt.RightButton or\
            self.TreeWidgetMouseButtonReleasedEvent == QtCore.QEvent.MouseButtonDblClick:
             # A small window pops up to ask for a new name
             if col == self.Argand_col['Name']:
-                item_list = self.ui.treeWidget_Argand_List.selectedItems()
+                item_list = self.Argand_selectedItems()
                 dialog = QDialog_rename()
-                dialog.ui.lineEdit_newName.setText(item_list[0].text(
-                    self.Argand_col['Name']))
+                dialog.ui.lineEdit_newName.setText(
+                    self.Argand_store.texts['Name'][item_list[0]])
                 if dialog.exec_():
                     prefix = dialog.ui.lineEdit_newName.text()
                     if len(item_list) == 1:
-                        item_list[0].setText(self.Argand_col['Name'], prefix)
+                        self.Argand_model.set_values(item_list, 'Name', prefix)
                     else:
-                        for i, item in enumerate(item_list):
-                            name = prefix + "_{:02d}".format(i)
-                            item.setText(self.Argand_col['Name'], name)
+                        self.Argand_model.set_values(
+                            item_list, 'Name', [
+                                prefix + "_{:02d}".format(i)
+                                for i in range(len(item_list))
+                            ])
                 else:
                     return
             # A small window pops up to ask for the symbol to use
@@ -4098,9 +3899,8 @@ class Torricelli(QMainWindow):
                         s = '+'
                     elif dialog.ui.radioButton_None.isChecked():
                         s = 'n'
-                    item_list = self.ui.treeWidget_Argand_List.selectedItems()
-                    for item in item_list:
-                        item.setText(self.Argand_col['Symbol'], s)
+                    item_list = self.Argand_selectedItems()
+                    self.Argand_model.set_values(item_list, 'Symbol', s)
                     self.Argand_updateItems(item_list, recalcGP=False)
 
                 else:  # if Cancel is clicked or escape pressed
@@ -4110,9 +3910,8 @@ class Torricelli(QMainWindow):
                 color = QColorDialog(self).getColor()
                 if color.isValid(
                 ):  # color is invalid if the user aborts choosing a color
-                    item_list = self.ui.treeWidget_Argand_List.selectedItems()
-                    for item in item_list:
-                        item.setBackground(self.Argand_col['Color'], color)
+                    item_list = self.Argand_selectedItems()
+                    self.Argand_model.set_values(item_list, 'Color', color)
                     self.Argand_updateItems(item_list, recalcGP=False)
 
     ## Regroups the selected items to group by slices
@@ -4124,23 +3923,21 @@ class Torricelli(QMainWindow):
         dialog = QDialog_regroup()
         if dialog.exec_():  # if OK is clicked
             suffix = dialog.ui.lineEdit_GpNameSuffix.text()
-            item_list = self.ui.treeWidget_Argand_List.selectedItems()
-            item_set_full = set()
+            store = self.Argand_store
+            item_list = self.Argand_selectedItems()
             # distinguish between group and element selection
-            for item in item_list:
-                if self.Argand_isGroup(item):
-                    for i in range(item.childCount()):
-                        item_set_full.add(item.child(i))
-                else:
-                    item_set_full.add(item)
-            # set of slices
-            slices_set = set()
-            for item in item_set_full:
-                # int(float(x)) for the case that slice_nb is saved as float
-                slices_set.add(
-                    int(float(item.text(self.Argand_col['Slice nb']))))
-
-            # create groups and at items
+            groups = [item for item in item_list if self.Argand_isGroup(item)]
+            points = store.points(groups)
+            points = np.concatenate([
+                points,
+                [item for item in item_list
+                 if not self.Argand_isGroup(item) and store.parent[item] not in groups]
+            ]).astype(np.int64)
+            # slices (the slice number can have been saved as float)
+            slices = store.values['Slice nb'][points].astype(int)
+            slices_set = set(slices)
+
+            # create groups and move the items into them
             for slice_nb in slices_set:
                 color = int(255 * slice_nb / len(slices_set))
                 gp_dict = {}
@@ -4149,18 +3946,12 @@ class Torricelli(QMainWindow):
                     'Color': '({:d},{:d},{:d})'.format(color, 0, 255 - color)
                 })
                 new_gp = self.Argand_AddGroup(gp_dict, refresh=False)
-                for item in item_set_full:
-                    if int(float(item.text(
-                            self.Argand_col['Slice nb']))) == slice_nb:
-                        # for some reason new_gp.addChild(item) is not working
-                        # but adding a clone of the child is working!
-                        # So I just clone the item and remove it from its previous parent manually
-                        item.setBackground(self.Argand_col['Color'],
-                                           QColor(color, 0, 255 - color))
-                        new_gp.addChild(item.clone())
-            # delete the original items (including groups if groups wre selected, too)
-            for item in item_list:
-                sip.delete(item)
+                slice_points = points[slices == slice_nb]
+                self.Argand_model.set_values(slice_points, 'Color',
+                                             (color, 0, 255 - color))
+                self.Argand_model.move(slice_points, new_gp)
+            # delete the original groups if groups were selected, too (they are empty now)
+            self.Argand_model.remove(groups)
             self.Argand_refresh_tree_and_plot()
 
         else:
@@ -4169,11 +3960,11 @@ class Torricelli(QMainWindow):
 
     ## Draws a polygon around the current item that represent two vectors whose sum equals the current item.
     def Argand_splitVector(self):
-        current_item = self.ui.treeWidget_Argand_List.currentItem()
-        if self.ui.checkBox_splitVector.isChecked() and current_item != None:
+        current_item = self.Argand_currentItem()
+        if self.ui.checkBox_splitVector.isChecked() and current_item is not None:
             nA = 0.5
-            pc_sum = float(current_item.text(self.Argand_col['Pc']))
-            fc_sum = float(current_item.text(self.Argand_col['Fc']))
+            pc_sum = self.Argand_store.values['Pc'][current_item]
+            fc_sum = self.Argand_store.values['Fc'][current_item]
             # setting initial values for split vectors
             fc_split = 1.0
             # The quotient fc_sum/fc_split has to be between -1..1
@@ -4243,9 +4034,9 @@ class Torricelli(QMainWindow):
             # split vector A coordinates
             xA, yA = pos_cartesian_A
             # currently marked original vector coordinates
-            current_item = self.ui.treeWidget_Argand_List.currentItem()
-            pc_sum = float(current_item.text(self.Argand_col['Pc']))
-            fc_sum = float(current_item.text(self.Argand_col['Fc']))
+            current_item = self.Argand_currentItem()
+            pc_sum = self.Argand_store.values['Pc'][current_item]
+            fc_sum = self.Argand_store.values['Fc'][current_item]
             x_sum, y_sum = self.argand.convertPcFc_to_cartesian(pc_sum, fc_sum)
             #pos_cartesian_sum = np.array([x_sum, y_sum])
 
@@ -4282,9 +4073,9 @@ class Torricelli(QMainWindow):
     def Argand_update_splitVector_position(self, pos_cartesian_A):
 
         # Node that should be splitted
-        current_item = self.ui.treeWidget_Argand_List.currentItem()
-        pc_sum = float(current_item.text(self.Argand_col['Pc']))
-        fc_sum = float(current_item.text(self.Argand_col['Fc']))
+        current_item = self.Argand_currentItem()
+        pc_sum = self.Argand_store.values['Pc'][current_item]
+        fc_sum = self.Argand_store.values['Fc'][current_item]
         x_sum, y_sum = self.argand.convertPcFc_to_cartesian(pc_sum, fc_sum)
         #pos_cartesian_sum = np.array([x_sum, y_sum])
 
@@ -4345,25 +4136,34 @@ class Torricelli(QMainWindow):
     # all columns are resized, averages recalculated and the Argand diagram refreshed.
     def Argand_refresh_tree_and_plot(self):
         self.Argand_QTreeWidgetSignalsSwitch(on=False)
-        for c in range(self.ui.treeWidget_Argand_List.columnCount()):
-            self.ui.treeWidget_Argand_List.resizeColumnToContents(c)
+        for c in range(self.Argand_model.columnCount()):
+            self.treeView_Argand.resizeColumnToContents(c)
         #self.Argand_removeDoubles() #not implemented yet
         self.Argand_groupAverage(
             refresh=False)  # do not refresh because it is followed by replot
+        self.Argand_resort()
         self.Argand_replotDiagram()
         self.Argand_QTreeWidgetSignalsSwitch(on=True)
 
+    ## The model does not sort itself when rows are added or changed
+    # (the QTreeWidget did), so sort again along the current sort indicator
+    def Argand_resort(self):
+        if self.treeView_Argand.isSortingEnabled():
+            header = self.treeView_Argand.header()
+            self.Argand_model.sort(header.sortIndicatorSection(),
+                                   header.sortIndicatorOrder())
+
     ## regarding Argand_Save and Argand_Load
     # -------------------------------------------
     # The loading and saving is robust against changes in the format of the csv file
     # For saving in a csv file the Argand_default_data_dictionary is used for the fieldnames
-    # that atuomatically contains all columns of the QTreeWidget. Additionally to that a
+    # that atuomatically contains all columns of the list. Additionally to that a
     # other columns like e.g. 'Type', 'checkState' are added
     # if no critical information is missing it can be loaded even if columns are missing
     # missing information will are set to '0' as default
     # conversion to load from old format v3.3.273 is implemented
 
-    ## Save the content of the treeWidget to a standard CSV file
+    ## Save the content of the list to a standard CSV file
     def Argand_Save(self, auto_save=False):
         if auto_save is False:
             newfile_dial = QFileDialog()
@@ -4394,92 +4194,17 @@ class Torricelli(QMainWindow):
                         quoting=csv.QUOTE_NONNUMERIC,
                         fieldnames=fieldnames)
                     w.writeheader()
-                    root = self.ui.treeWidget_Argand_List.invisibleRootItem()
-                    currentDict = {}
-                    for i_gp in range(
-                            root.childCount()):  # Iterate on the groups
-                        gp = root.child(i_gp)
-                        # clear the dict, fill it with defaults, overwirte defaults with values present in the QTreeWidget
-                        currentDict.clear()
-                        currentDict.update(self.Argand_default_data_dictionary)
-                        currentDict.update({'Type'        : 'Group',\
-                                            'checkState'  : 'checked' if gp.checkState(self.Argand_col['Name']) == QtCore.Qt.Checked else 'unchecked',\
-                                            'Name'        : str(gp.text(self.Argand_col['Name'])),\
-                                            'Pc'          : self.floatOrEmpty(gp.text(self.Argand_col['Pc'])),\
-                                            'Pc_err'      : self.floatOrEmpty(gp.text(self.Argand_col['Pc_err'])),\
-                                            'Fc'          : self.floatOrEmpty(gp.text(self.Argand_col['Fc'])),\
-                                            'Fc_err'      : self.floatOrEmpty(gp.text(self.Argand_col['Fc_err'])),\
-                                            'Color'       : gp.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                            'Symbol'      : str(gp.text(self.Argand_col['Symbol'])),\
-                                            'Path'        : str(gp.toolTip(self.Argand_col['Name'])),\
-                                            'Note'        : str(gp.text(self.Argand_col['Note']))})
-                        w.writerow(currentDict)
-                        for j_child in range(gp.childCount(
-                        )):  # Iterate in all points in a group
-                            point = gp.child(j_child)
-                            # clear the dict, fill it with defaults, overwirte defaults with values present in the QTreeWidget
-                            currentDict.clear()
-                            currentDict.update(
-                                self.Argand_default_data_dictionary)
-                            currentDict.update({'Type'        : 'Point',\
-                                                'checkState'  : 'checked' if point.checkState(self.Argand_col['Name']) == QtCore.Qt.Checked else 'unchecked',\
-                                                'Name'        : str(point.text(self.Argand_col['Name'])),\
-                                                'Pc'          : self.floatOrEmpty(point.text(self.Argand_col['Pc'])),\
-                                                'Pc_err'      : self.floatOrEmpty(point.text(self.Argand_col['Pc_err'])),\
-                                                'Fc'          : self.floatOrEmpty(point.text(self.Argand_col['Fc'])),\
-                                                'Fc_err'      : self.floatOrEmpty(point.text(self.Argand_col['Fc_err'])),\
-                                                'Sr'          : self.floatOrEmpty(point.text(self.Argand_col['Sr'])),\
-                                                'Sr_err'      : self.floatOrEmpty(point.text(self.Argand_col['Sr_err'])),\
-                                                '|Si|'        : self.floatOrEmpty(point.text(self.Argand_col['|Si|'])),\
-                                                'Psi'         : self.floatOrEmpty(point.text(self.Argand_col['Psi'])),\
-                                                'Q_0'         : self.floatOrEmpty(point.text(self.Argand_col['Q_0'])),\
-                                                'Q_H'         : self.floatOrEmpty(point.text(self.Argand_col['Q_H'])),\
-                                                'Gamma'       : self.floatOrEmpty(point.text(self.Argand_col['Gamma'])),\
-                                                'Gamma_err'   : self.floatOrEmpty(point.text(self.Argand_col['Gamma_err'])),\
-                                                'Delta'       : self.floatOrEmpty(point.text(self.Argand_col['Delta'])),\
-                                                'Phi'         : self.floatOrEmpty(point.text(self.Argand_col['Phi'])),\
-                                                'P el'        : self.floatOrEmpty(point.text(self.Argand_col['P el'])),\
-                                                'Zeta'        : self.floatOrEmpty(point.text(self.Argand_col['Zeta'])),\
-                                                'b sample'    : self.floatOrEmpty(point.text(self.Argand_col['b sample'])),\
-                                                'b DCM'       : self.floatOrEmpty(point.text(self.Argand_col['b DCM'])),\
-                                                'Xi'          : self.floatOrEmpty(point.text(self.Argand_col['Xi'])),\
-                                                'Pol.'        : str(point.text(self.Argand_col['Pol.'])),\
-                                                'Temp.'       : self.floatOrEmpty(point.text(self.Argand_col['Temp.'])),\
-                                                'P Refl'      : self.floatOrEmpty(point.text(self.Argand_col['P Refl'])),\
-                                                'R2 Refl'     : self.floatOrEmpty(point.text(self.Argand_col['R2 Refl'])),\
-                                                'X2 Yield'    : self.floatOrEmpty(point.text(self.Argand_col['X2 Yield'])),\
-                                                'Component'   : str(point.text(self.Argand_col['Component'])),\
-                                                'Slice nb'    : self.intOrEmpty(point.text(self.Argand_col['Slice nb'])),\
-                                                'Sigma'       : self.floatOrEmpty(point.text(self.Argand_col['Sigma'])),\
-                                                'delta hnu'   : self.floatOrEmpty(point.text(self.Argand_col['delta hnu'])),\
-                                                'Color'       : point.background(self.Argand_col['Color']).color().getRgb()[0:3],\
-                                                'Symbol'      : str(point.text(self.Argand_col['Symbol'])),\
-                                                'Core level'  : str(point.text(self.Argand_col['Core level'])),\
-                                                'Monte Carlo analysis'      : str(point.text(self.Argand_col['Monte Carlo analysis'])),\
-                                                'Substrate'   : str(point.text(self.Argand_col['Substrate'])),\
-                                                'DW'          : str(point.text(self.Argand_col['DW'])),\
-                                                '(hkl)'       : str(point.text(self.Argand_col['(hkl)'])),\
-                                                'Path'        : str(point.toolTip(self.Argand_col['Name'])),\
-                                                'Yield file'  : str(point.text(self.Argand_col['Yield file'])),\
-                                                'Note'        : str(point.text(self.Argand_col['Note']))})
-                            w.writerow(currentDict)
+                    store = self.Argand_store
+                    for gp in store.groups:  # Iterate on the groups
+                        w.writerow(store.record(gp))
+                        # Iterate in all points in a group
+                        w.writerows(map(store.record, store.children[gp]))
 
             except csv.Error as e:
                 sys.exit('file %s, line %d: %s' %
                          (filename, reader.line_num, e))
 
-    def floatOrEmpty(self, text):
-        if text == '' or 'None' == text:
-            return ''
-        elif text == '-':
-            return '-'
-        else:
-            return float(text)
-
-    def intOrEmpty(self, text):
-        return '' if text == '' else int(float(text))
-
-    ## Loads a standard CSV file into the treeWidget
+    ## Loads a standard CSV file into the list
     def Argand_Load(self):
         # beautiful waiting cursor while loading (has to be followed by restoreOverrideCursor() at some point)
         QApplication.setOverrideCursor(QCursor(QtCore.Qt.WaitCursor))
@@ -4522,13 +4247,21 @@ class Torricelli(QMainWindow):
                     reader = csv.DictReader(
                         csvfile, delimiter=';', quoting=csv.QUOTE_NONNUMERIC
                     )  # keys are taken from first row
+                    # the points of a group are added all at once, when the next group starts
+                    gp = None
+                    dic_points = []
                     for i, row in enumerate(reader):
                         # progressBar for long files
                         # remember i starts with 0 and and one comment and one header line is skipped
                         # so you need i+3 for the progressBar
-                        progressBarLOADING.setValue(int((i + 3) / total_lines * 100))
+                        if i % 1000 == 0:
+                            progressBarLOADING.setValue(int((i + 3) / total_lines * 100))
+                            QApplication.processEvents()
 
                         if 'Group' == row['Type']:
+                            if gp is not None:
+                                self.Argand_AddDatasets(gp, dic_points, refresh=False)
+                            dic_points = []
                             dic_group = self.Argand_default_group_dictionary.copy(
                             )
                             dic_group.update(row)
@@ -4545,10 +4278,12 @@ class Torricelli(QMainWindow):
                             if csvOutdated:
                                 dic_point.update(
                                     {'Name': dic_point.get('Path', 'NewPoint')})
-                            self.Argand_AddDataset(gp, dic_point, refresh=False)
+                            dic_points.append(dic_point)
                         else:
                             print('Your .csv has content problems!')
                             return
+                    if gp is not None:
+                        self.Argand_AddDatasets(gp, dic_points, refresh=False)
                     self.ui.statusbar.removeWidget(progressLabel)
                     self.ui.statusbar.removeWidget(progressBarLOADING)
                     self.Argand_refresh_tree_and_plot()
@@ -4565,39 +4300,37 @@ class Torricelli(QMainWindow):
     # toggles if sorting is enabled or disabled
     def Argand_sortOnOff(self):
         if self.ui.checkBox_SortOnOff.isChecked():
-            #self.ui.treeWidget_Argand_List.isSortingEnabled():
-            self.ui.treeWidget_Argand_List.setSortingEnabled(True)
-            self.ui.treeWidget_Argand_List.sortItems(self.Argand_col['Name'],
-                                                     QtCore.Qt.AscendingOrder)
+            self.treeView_Argand.setSortingEnabled(True)
+            self.treeView_Argand.sortByColumn(self.Argand_col['Name'],
+                                              QtCore.Qt.AscendingOrder)
         else:
-            self.ui.treeWidget_Argand_List.setSortingEnabled(False)
+            self.treeView_Argand.setSortingEnabled(False)
 
     ## Function called by the user once she/he is happy with the fit result and want to keep the value.
     def Argand_saveFitResult_and_plot(self):
-        path, lastFold = os.path.split(
-            str(self.ui.LineEdit_CurrentWorkingDirectory.text()))
-        path, lastButOneFold = os.path.split(path)
-        gp_name = lastButOneFold + os.sep + lastFold + '_' + str(
-            self.ui.column_name_label.text())
-
-        # check if the group corresponding to this folder already exists, otherwise creates it
-        root = self.ui.treeWidget_Argand_List.invisibleRootItem()
-        gp_already_exists = False
-        for i_gp in range(root.childCount()):  # Iterate on the groups
-            gp = root.child(i_gp)
-            if str(gp.text(self.Argand_col['Name'])) == gp_name:
-                gp_already_exists = True
-                gp_liveAn = gp
-        if not gp_already_exists:
-            gp_liveAn = self.Argand_AddGroup({'Name': gp_name})
-
         self.Argand_AddDataset(
-            gp_liveAn, self.get_dict_with_all_values(), refresh=True)
+            self.Argand_groupOfFitResults(str(
+                self.ui.column_name_label.text())),
+            self.get_dict_with_all_values(),
+            refresh=True)
         self.Argand_Save(
             str(self.ui.LineEdit_CurrentWorkingDirectory.text()) + os.sep +
             self.argand_SaveSubFolder + 'autosave_' + self.timestamp() +
             '_newFitResultAdded.csv')
 
+    ## Group of the fit results of the working directory for the given component(s), created if needed
+    def Argand_groupOfFitResults(self, component_name):
+        path, lastFold = os.path.split(
+            str(self.ui.LineEdit_CurrentWorkingDirectory.text()))
+        path, lastButOneFold = os.path.split(path)
+        gp_name = lastButOneFold + os.sep + lastFold + '_' + component_name
+
+        # check if the group corresponding to this folder already exists, otherwise creates it
+        for gp in self.Argand_store.groups:  # Iterate on the groups
+            if self.Argand_store.texts['Name'][gp] == gp_name:
+                return gp
+        return self.Argand_AddGroup({'Name': gp_name})
+
     # return a dictionay that contains all informations/parameters that can be saved. This also contains the fit results!
     def get_dict_with_all_values(self):
         dic = self.Argand_default_data_dictionary.copy()
@@ -4780,19 +4513,15 @@ class Torricelli(QMainWindow):
 
         # average vector labels
         if self.ui.checkBox_Argand_display_originVectors.isChecked():
-            root = self.ui.treeWidget_Argand_List.invisibleRootItem()
-            child_count = root.childCount()
-
-            for i in range(child_count):
-                gp = root.child(i)
-                if gp.checkState(self.Argand_col['Name']) == QtCore.Qt.Checked:
+            for gp in self.Argand_store.groups:
+                if self.Argand_store.checked[gp] and gp in self.argand.originVectorDict:
 
-                    vec = self.argand.originVectorDict[id(gp)]
+                    vec = self.argand.originVectorDict[gp]
 
                     if checked:
                         originvec_label = [
                             '', '<big>' +
-                            str(gp.text(self.Argand_col['Name'])) + '</big>'
+                            str(self.Argand_store.texts['Name'][gp]) + '</big>'
                         ]
                     else:
                         originvec_label = ['', '']
@@ -4830,6 +4559,7 @@ class Torricelli(QMainWindow):
         else:
             self.editableColumns = list(
                 map(self.Argand_col.get, self.noteditableColList))
+        self.Argand_model.editable_columns = set(self.editableColumns)
 
     ###########################################################################
     ### --------------- General methods concerning the GUI ---------------  ###
@@ -4863,7 +4593,7 @@ class Torricelli(QMainWindow):
             ' = 90-' + xi + find_Geometry)
         self.ui.doubleSpinBox_b_cr.setToolTip('Asymmetry parameter')
         self.ui.doubleSpinBox_theoReflRange.setToolTip(
-            'Here you can set the photon energy range for calculating the theoretical reflectivity.\nThis range must be wider than your experimental reflectivity otherwise the\nfitting of the reflectivity will fail because interpolation of your experimental\ndata will exceed the range of available datapoints!\n\n\tRecommended value: 8 eV'
+            'Here you can set the photon energy range for calculating the theoretical reflectivity.\nIt is used before the data are imported, or if "Manual range" is checked.\nThis range must be wider than your experimental reflectivity otherwise the\nfitting of the reflectivity will fail because interpolation of your experimental\ndata will exceed the range of available datapoints!\n\n\tRecommended value: 8 eV'
         )
         self.ui.radioButton_sigma_pol_light.setToolTip(
             'Electric field perpendicular to the plane of incidence')
@@ -4997,6 +4727,9 @@ class Torricelli(QMainWindow):
         self.Theory_Phase_Monochromator = np.array([])
         self.Theory_Squared_Refl_Monochromator_norm = np.array([])
         self.Theory_ReflSample_cc_ReflMono2 = np.array([])
+        self.convolution = None
+        self.yield_basis = None
+        self.ey_fit_params = None  # lmfit.Parameters of the last successful EY fit
         #self.Theory_Refl_Sample_Correlated_Monochromator_squared  = np.array([])
         #self.Theory_Phase_Sample_Convoluted_Sqrt_Monochromator = np.array([])
         # experimental arrays
@@ -5006,9 +4739,14 @@ class Torricelli(QMainWindow):
         self.Exp_Refl_Estimated_Error = np.array([])
         self.Exp_EY_Normalised = np.array([])
         self.Exp_EY_casaXPS_Error = np.array([])
+        # parsed experimental files (reflectivity, yield, angles) of the session
+        self.data_files = ParsedFileCache()
 
         ### section: Fit reflectivity ###
         self.R_squared_refl = 0
+        self.refl_trace = FitTrace(REFL_TRACE_NAMES)
+        self.ey_trace = FitTrace(['Fc', 'Pc', 'N'])
+        self.ey_fit_running = False
 
         ### section: Fit yield ###
         # loads the database ini file with all the gamma values elements up to Z=54
@@ -5020,8 +4758,8 @@ class Torricelli(QMainWindow):
         self.R_squared_ey = 0
         self.Theo_Sample_EY_cc_Gauss_cc_RMono2 = np.array([])
 
-        ### Argand TreeWidget ###
-        # dict of the treeWidget column content and corresponding numbers ('path' is saved in the toolTip())
+        ### Argand list ###
+        # dict of the list column content and corresponding numbers ('path' is saved in the toolTip())
         self.Argand_ColList = [
             'Name',
             'Symbol',
@@ -5066,13 +4804,32 @@ class Torricelli(QMainWindow):
             list(
                 zip(self.Argand_ColList,
                     list(range(len(self.Argand_ColList))))))
-        # Set the header ot the TreeWidget according to Argand_ColList
-        self.ui.treeWidget_Argand_List.setHeaderLabels(
-            list(self.Argand_ColList))
-        self.ui.treeWidget_Argand_List.setEditTriggers(
+        # The list shows the columns of Argand_ColList from a store of numpy arrays:
+        # a QTreeView on self.Argand_model replaces the QTreeWidget of the .ui file
+        self.Argand_store = ArgandStore(self.Argand_ColList)
+        self.Argand_model = ArgandTreeModel(self.Argand_store)
+        self.Argand_model.group_icon = QIcon(Torricelli_program_folder_path +
+                                             os.sep + 'imports' + os.sep +
+                                             'Torricelli_icon.png')
+        self.treeView_Argand = QTreeView()
+        self.treeView_Argand.setModel(self.Argand_model)
+        self.treeView_Argand.setUniformRowHeights(True)
+        self.treeView_Argand.setSelectionMode(
+            QAbstractItemView.ExtendedSelection)
+        self.treeView_Argand.setDragEnabled(True)
+        self.treeView_Argand.setDragDropMode(QAbstractItemView.DragDrop)
+        self.treeView_Argand.setDefaultDropAction(QtCore.Qt.MoveAction)
+        self.treeView_Argand.header().setDefaultSectionSize(100)
+        self.treeView_Argand.header().setMinimumSectionSize(50)
+        self.treeView_Argand.header().setHighlightSections(False)
+        self.treeView_Argand.setEditTriggers(
             QAbstractItemView.DoubleClicked
             | QAbstractItemView.EditKeyPressed
         )  # sets the events to enter into the edit mode
+        self.ui.treeWidget_Argand_List.parentWidget().replaceWidget(
+            self.ui.treeWidget_Argand_List.parentWidget().indexOf(
+                self.ui.treeWidget_Argand_List), self.treeView_Argand)
+        self.ui.treeWidget_Argand_List.deleteLater()
         self.editableColList = [
             'Component', 'Core level', 'Phi', 'Element', 'Subshell',
             'Components', 'Slice nb', 'Phi', 'Pc', 'Fc', 'Pc_err', 'Fc_err',
@@ -5084,13 +4841,13 @@ class Torricelli(QMainWindow):
         self.noteditableColList = ['Note']
         self.editableColumns = list(
             map(self.Argand_col.get, self.noteditableColList))
+        self.Argand_model.editable_columns = set(self.editableColumns)
         self.argand_SaveSubFolder = ''
         # Default dict containing data use to fill data points in a group
         self.Argand_default_data_dictionary = dict.fromkeys(
             self.Argand_ColList, '')
         self.Argand_default_group_dictionary = dict.fromkeys(
             self.Argand_ColList, '')
-        self.groupsChangedViaDrag = set()
         self.Argand_QTreeWidgetSignalsOn = False
         # set some defaults
         self.Argand_default_data_dictionary.update({'Name'      : 'NewDataPoint',\
@@ -5101,10 +4858,11 @@ class Torricelli(QMainWindow):
         self.Argand_default_group_dictionary.update({'Name'      : 'NewGroup',\
                                                      'Symbol'    : '+',\
                                                      'Color'     : QColor(0,0,0)})
-        self.ui.treeWidget_Argand_List.sortItems(self.Argand_col['Name'],
-                                                 QtCore.Qt.AscendingOrder)
+        self.treeView_Argand.setSortingEnabled(True)
+        self.treeView_Argand.sortByColumn(self.Argand_col['Name'],
+                                          QtCore.Qt.AscendingOrder)
         # style settings
-        self.ui.treeWidget_Argand_List.setTextElideMode(QtCore.Qt.ElideMiddle)
+        self.treeView_Argand.setTextElideMode(QtCore.Qt.ElideMiddle)
 
         self.TreeWidgetMouseButtonReleasedEvent = None
         # Argand Diagram
@@ -5112,6 +4870,55 @@ class Torricelli(QMainWindow):
         self.ui.label_ArgandVersion.setText('pyArgand v' +
                                             str(self.argand.__version__))
         self.ui.verticalLayout_argand.addWidget(self.argand)
+        # Theoretical reflectivity: the range of the GUI is used instead of the planned one if checked
+        self.checkBox_theoReflRange_manual = QCheckBox('Manual range')
+        self.checkBox_theoReflRange_manual.setToolTip(
+            'Unchecked, the range covers the imported experimental data plus the support of the\nmonochromator and Gaussian kernels. Checked, the range above is used.'
+        )
+        self.ui.verticalLayout.insertWidget(
+            self.ui.verticalLayout.indexOf(self.ui.doubleSpinBox_theoReflRange)
+            + 1, self.checkBox_theoReflRange_manual)
+        # EY fit: solve Fc, Pc and N as a linear least-squares problem instead of iterating with lmfit
+        self.checkBox_eyfit_linear = QCheckBox('Linear solver')
+        self.checkBox_eyfit_linear.setToolTip(
+            'Solve Fc, Pc and N (and Sr) in closed form.\nIf the Monte Carlo errors are ignored, it minimises sum((y - N*model)^2),\nnot sum((y/N - model)^2) as the default fit does.'
+        )
+        self.ui.horizontalLayout_29.addWidget(self.checkBox_eyfit_linear)
+        # angular mode: fits all the slices times the selected components at once
+        self.pushButton_fit_all_slices = QPushButton('Fit all slices')
+        self.pushButton_fit_all_slices.setToolTip(
+            'Fits every slice of the angular yield file, for each component of the list separately,\nand adds the results to the Argand diagram.'
+        )
+        self.ui.horizontalLayout_29.addWidget(self.pushButton_fit_all_slices)
+        # multi-start: local fits from many start points, for the single fit and for all slices
+        self.checkBox_eyfit_multistart = QCheckBox('Multi-start')
+        self.checkBox_eyfit_multistart.setToolTip(
+            'Fits from a Latin hypercube of start points in Fc, Pc (and gamma) in parallel,\nand keeps the best optimum. The log reports how many starts reached it.'
+        )
+        self.spinBox_eyfit_starts = QSpinBox()
+        self.spinBox_eyfit_starts.setRange(2, 1000)
+        self.spinBox_eyfit_starts.setValue(MULTISTART_STARTS)
+        self.spinBox_eyfit_starts.setToolTip('Number of start points')
+        self.ui.horizontalLayout_29.addWidget(self.checkBox_eyfit_multistart)
+        self.ui.horizontalLayout_29.addWidget(self.spinBox_eyfit_starts)
+        # angular mode: one fit of all the slices with shared Fc, Pc (and gamma)
+        self.pushButton_fit_global = QPushButton('Global fit')
+        self.pushButton_fit_global.setToolTip(
+            'Fits all the slices of the angular yield file at once: Fc and Pc (and gamma) are shared,\nN is fitted per slice, and Sr, Si and Psi follow the angle of each slice.'
+        )
+        self.ui.horizontalLayout_29.addWidget(self.pushButton_fit_global)
+        # parametric bootstrap of the last EY fit
+        self.pushButton_bootstrap = QPushButton('Bootstrap errors')
+        self.pushButton_bootstrap.setToolTip(
+            'Refits the last fit many times with the yield perturbed by its errors,\nand sigma and Delta E by those of the reflectivity fit.\nAdds the fit to the Argand diagram with the spread of Fc and Pc as errors.'
+        )
+        self.ui.horizontalLayout_29.addWidget(self.pushButton_bootstrap)
+        # chi^2 map over (Fc, Pc), next to the manual curve
+        self.checkBox_chi2_map = QCheckBox('\u03c7\u00b2 map')
+        self.checkBox_chi2_map.setToolTip(
+            'Shows the reduced \u03c7\u00b2 on a grid of (Fc, Pc) below the fit result,\nwith its minimum (+), the initial values (x) and the 1\u03c3 and 2\u03c3 contours.\nN is fixed to its initial value, or profiled if it is fitted.'
+        )
+        self.ui.horizontalLayout_3.addWidget(self.checkBox_chi2_map)
 
         self.prepare_the_plot_panels()
         self.Connect_QtWidgets_and_Functions()
@@ -5212,6 +5019,28 @@ class Torricelli(QMainWindow):
         self.ui.verticalLayout_fit_ey.addWidget(self.Pyqt_View_ey_fit)
         self.Pyqt_View_ey_fit.enableAutoRange()
 
+        self.Pyqt_View_chi2_map = pg.PlotWidget(
+            title='Reduced \u03c7\u00b2 (log scale)')
+        self.Pyqt_View_chi2_map.setLabel('left', 'Coherent fraction Fc')
+        self.Pyqt_View_chi2_map.setLabel('bottom', 'Coherent position Pc')
+        self.chi2_map_image = pg.ImageItem()
+        self.chi2_map_image.setLookupTable(
+            pg.colormap.get('viridis').getLookupTable())
+        self.Pyqt_View_chi2_map.addItem(self.chi2_map_image)
+        self.chi2_map_contours = []
+        for color in ((255, 255, 255), (255, 150, 0)):  # 1 and 2 sigma
+            contour = pg.IsocurveItem(pen=pg.mkPen(color, width=2))
+            contour.setParentItem(self.chi2_map_image)  # in the pixel coordinates of the image
+            self.chi2_map_contours.append(contour)
+        self.chi2_map_minimum = pg.ScatterPlotItem(
+            symbol='+', size=14, pen=pg.mkPen('r', width=2))
+        self.chi2_map_manual = pg.ScatterPlotItem(
+            symbol='x', size=10, pen=pg.mkPen('w', width=2))
+        self.Pyqt_View_chi2_map.addItem(self.chi2_map_minimum)
+        self.Pyqt_View_chi2_map.addItem(self.chi2_map_manual)
+        self.ui.verticalLayout_fit_ey.addWidget(self.Pyqt_View_chi2_map)
+        self.Pyqt_View_chi2_map.setVisible(False)
+
     ## Action to be taken when Torrivelli is quited:
     # Saves a number of information (folder, values)
     # This file will be read by next use by read_in_user_settings
@@ -5258,8 +5087,7 @@ class Torricelli(QMainWindow):
 
         user_file.close()
         # save argand diagram if there is one
-        root = self.ui.treeWidget_Argand_List.invisibleRootItem()
-        if root.childCount() > 0:
+        if len(self.Argand_store.groups) > 0:
             self.Argand_Save(
                 str(self.ui.LineEdit_CurrentWorkingDirectory.text()) + os.sep +
                 self.argand_SaveSubFolder + 'autosave_' + self.timestamp() +
@@ -5378,7 +5206,6 @@ class Torricelli(QMainWindow):
 
     ## Connects all GUI buttons, lineEdit, tab and so on to the appropriate functions.
     def Connect_QtWidgets_and_Functions(self):
-        root = self.ui.treeWidget_Argand_List.invisibleRootItem()
         self.ui.button_CurrentWorkingDirectory.clicked.connect(
             self.choose_dataFolder)
         self.ui.signal_name.textEdited.connect(self.update_component_list)
@@ -5499,6 +5326,9 @@ class Torricelli(QMainWindow):
         self.ui.pushButton_reset_initial_parameters.clicked.connect(
             self.reset_ey_par)
         self.ui.button_fit_ey.clicked.connect(self.fit_ElYield)
+        self.pushButton_fit_all_slices.clicked.connect(self.fit_all_slices)
+        self.pushButton_fit_global.clicked.connect(self.fit_global_angular)
+        self.pushButton_bootstrap.clicked.connect(self.bootstrap_ElYield)
         self.ui.pushButton_set_fitParam_for_manual.clicked.connect(
             self.set_fitEYparam_forManualUse)
         self.ui.horizontalSlider_manual_fc.sliderMoved.connect(
@@ -5514,6 +5344,21 @@ class Torricelli(QMainWindow):
         self.ui.doubleSpinBox_pc.valueChanged.connect(
             lambda val, who="pc": self.EY_initSpin_valueChanged(who))
         self.ui.checkBox_display_manual_EY.clicked.connect(self.update_EY_plot)
+        self.checkBox_chi2_map.toggled.connect(self.update_chi2_map)
+        for spinBox in (self.ui.doubleSpinBox_ReflFit_sigma,
+                        self.ui.doubleSpinBox_ReflFit_de,
+                        self.ui.doubleSpinBox_n,
+                        self.ui.doubleSpinBox_EYinit_man_SR,
+                        self.ui.doubleSpinBox_EYinit_abs_si,
+                        self.ui.doubleSpinBox_EYinit_Psi,
+                        self.ui.doubleSpinBox_EYinit_man_gamma,
+                        self.ui.doubleSpinBox_EYinit_theo_gamma,
+                        self.ui.doubleSpinBox_EYinit_Delta):
+            spinBox.valueChanged.connect(self.update_chi2_map)
+        self.ui.radioButton_EYinit_man_SR.toggled.connect(self.update_chi2_map)
+        self.ui.checkBox_eyfit_fitN.clicked.connect(self.update_chi2_map)
+        self.ui.checkBox_ignore_MonteCarlo.toggled.connect(
+            self.update_chi2_map)
         self.ui.checkBox_ignore_MonteCarlo.toggled.connect(
             self.update_chiSquared)
         self.ui.pushButton_saveToArgand.clicked.connect(
@@ -5572,17 +5417,12 @@ class Torricelli(QMainWindow):
 
         ## Section: Argand diagram
         self.vb = self.argand.plotItem.vb  # define ViewBox of the ArgandPlotWidget
-        self.ui.treeWidget_Argand_List.invisibleRootItem().setFlags(
-            QtCore.Qt.ItemFlags(QtCore.Qt.ItemIsEnabled))
         self.Argand_QTreeWidgetSignalsSwitch(on=True)
-        # following line does not work for no apparent reason (using a combination of rowsInserted and rowsRemoved instead)
-        #self.ui.treeWidget_Argand_List.model().rowsMoved.connect(lambda sourceParent,sourceStart,sourceEnd,destParent,destStart, testStr='moved': self.test(testStr))
-        #self.ui.treeWidget_Argand_List.model().rowsInserted.connect(lambda parentIndex, start, end, what='inserted': self.Argand_itemsMoved(parentIndex, start, end, what))
-        #self.ui.treeWidget_Argand_List.model().rowsRemoved.connect(lambda parentIndex,start,end, what='removed': self.Argand_itemsMoved(parentIndex, start, end, what))
+        # the groups are expanded again when the list was reset (e.g. after removing many points)
+        self.Argand_model.modelReset.connect(self.treeView_Argand.expandAll)
         self.ui.pushButton_Argand_AddGroup.clicked.connect(self.Argand_AddGroup)
         self.ui.pushButton_Argand_Remove.clicked.connect(
-            lambda: self.Argand_Remove(self.ui.treeWidget_Argand_List.
-                                       selectedItems()))
+            lambda: self.Argand_Remove(self.Argand_selectedItems()))
         self.ui.pushButton_Argand_removeAll.clicked.connect(
             self.Argand_RemoveAll)
         self.ui.pushButton_Argand_AddDataset.clicked.connect(
@@ -5591,6 +5431,7 @@ class Torricelli(QMainWindow):
             self.Argand_ManualValues)
         self.ui.pushButton_Argand_Save.clicked.connect(self.Argand_Save)
         self.ui.pushButton_Argand_Load.clicked.connect(self.Argand_Load)
+        self.argand.sigDataSetsSelected.connect(self.Argand_selectFromDiagram)
         self.ui.checkBox_splitVector.clicked.connect(
             self.Argand_update_Split_display)
         self.ui.checkBox_splitVector.clicked.connect(self.Argand_splitVector)
@@ -5613,11 +5454,11 @@ class Torricelli(QMainWindow):
         self.ui.pushButton_GpBySlice.clicked.connect(self.Argand_GpBySlice)
         self.ui.checkBox_Argand_display_originVectors.clicked.connect(
             lambda checked: self.Argand_updateItems(
-                item_list=list(map(root.child, list(range(root.childCount())))),
+                item_list=list(self.Argand_store.groups),
                 recalcGP=False))
         self.ui.checkBox_Argand_display_group_errorBars.clicked.connect(
             lambda checked: self.Argand_updateItems(
-                item_list=list(map(root.child, list(range(root.childCount())))),
+                item_list=list(self.Argand_store.groups),
                 recalcGP=False))
         self.ui.checkBox_Argand_display_errorBars.clicked.connect(
             self.Argand_replotDiagram)
@@ -5667,18 +5508,17 @@ class Torricelli(QMainWindow):
         ) == QtCore.QEvent.KeyPress and 16777238 == key:  #Ctrl+PageDown
             self.ui.tab_Main.setCurrentIndex(self.ui.tab_Main.currentIndex() -
                                              1)
-        # deletes a line in the Argand TreeWidget if pressing del
-        elif (len(self.ui.treeWidget_Argand_List.selectedItems()) > 0 and
+        # deletes a line in the Argand list if pressing del
+        elif (self.treeView_Argand.selectionModel().hasSelection() and
               event.type() == QtCore.QEvent.KeyPress and
               event.key() == QtCore.Qt.Key_Delete):
             # removes the selected Items
-            self.Argand_Remove(self.ui.treeWidget_Argand_List.selectedItems())
-        elif (len(self.ui.treeWidget_Argand_List.selectedItems()) > 0 and
+            self.Argand_Remove(self.Argand_selectedItems())
+        elif (self.treeView_Argand.selectionModel().hasSelection() and
               event.type() == QtCore.QEvent.KeyPress and
               event.key() == QtCore.Qt.Key_Escape):
-            for item in self.ui.treeWidget_Argand_List.selectedItems():
-                item.setSelected(False)
-        elif (len(self.ui.treeWidget_Argand_List.selectedItems()) > 0 and
+            self.treeView_Argand.clearSelection()
+        elif (self.treeView_Argand.selectionModel().hasSelection() and
               event.type() == QtCore.QEvent.KeyPress and
               event.key() == QtCore.Qt.Key_F2):
             pass
@@ -5708,15 +5548,6 @@ class Torricelli(QMainWindow):
                 np.sqrt(self.mousePoint.x()**2 + self.mousePoint.y()**2))
 
 
-
-class HashableQTreeWidgetItem(QTreeWidgetItem):
-
-    def __init__(self, *args):
-        super(HashableQTreeWidgetItem,self).__init__(*args)
-
-    def __hash__(self):
-        return hash(id(self))
-
 # Starts the program
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -24,7 +24,7 @@
 # Do not forget to activate the keyword for the file by for example
 # svn propset svn:keywords 'Id Revision LastChangedDate LastChangedBy' pyArgand.py
 # DO NOT CHANGE THE FOLLOWING LINES, unless you know what you are doing
-__revision__  = filter(str.isdigit, "$Revision: 482 $")
+__revision__  = ''.join(filter(str.isdigit, "$Revision: 482 $"))
 __modDate__   = "$LastChangedDate: 2018-04-16 06:56:45 +0200 (Mo, 16. Apr 2018) $"
 __modDate__   = __modDate__[49:61] + ' ' + __modDate__[28:38] + 'GMT' + __modDate__[38:43]
 __changedBy__ = "$LastChangedBy: m.franke $".split(' ')[1]
@@ -40,39 +40,353 @@ import datetime
 import colorsys
 import pyqtgraph as pg
 import numbers
-from scipy.ndimage import gaussian_filter1d
-from PyQt4 import QtCore, QtGui
-from pyqtgraph.Qt import QtGui, QtCore, USE_PYSIDE
+from scipy.ndimage import gaussian_filter, gaussian_filter1d
+from pyqtgraph.Qt import QtGui, QtCore, QtWidgets
 pg.setConfigOption('background', None)# means transparent background
 pg.setConfigOption('foreground', 'k')
-from PyQt4.QtCore import pyqtSignal, pyqtSlot
+from PyQt5.QtCore import pyqtSignal, pyqtSlot
+
+
+## Different (r,g,b) colors of an (n,3) array, and the index of the color of each point in them
+def uniqueColors(colors):
+    colors = np.asarray(colors, dtype=np.int64).reshape(-1, 3)
+    keys, inverse = np.unique(colors.dot([65536, 256, 1]), return_inverse=True)
+    unique = np.stack([keys // 65536, keys // 256 % 256, keys % 256], axis=1)
+    return unique, inverse.reshape(-1)
+
+
+## Vertices of the error bars of points: an arc of a circle for pc and a line for fc.
+# Returns x, y and connect (False at the last vertex of each arc or line) for pg.arrayToQPath.
+# Arcs are polylines with segments of at most arcStep degrees.
+def errorBarLines(pc, fc, pc_err, fc_err, arcStep=3.0):
+    pc, fc, pc_err, fc_err = [np.asarray(a, dtype=float) for a in (pc, fc, pc_err, fc_err)]
+    # Arcs of a circle for pc
+    segments = np.clip(np.ceil(720*np.abs(pc_err)/arcStep), 1, 360).astype(int)
+    counts = segments + 1
+    ends = np.cumsum(counts)
+    point = np.repeat(np.arange(len(pc)), counts)
+    t = (np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts, counts)) / np.repeat(segments, counts)
+    angle = 2*np.pi*(pc[point] + pc_err[point]*(2*t - 1))
+    arc_connect = np.ones(len(point), dtype=bool)
+    arc_connect[ends - 1] = False
+    # Just a line for fc
+    radius = np.stack([fc - fc_err, fc + fc_err], axis=1).reshape(-1)
+    bar_angle = 2*np.pi*np.repeat(pc, 2)
+    bar_connect = np.tile([True, False], len(pc))
+    x = np.concatenate([fc[point]*np.cos(angle), radius*np.cos(bar_angle)])
+    y = np.concatenate([fc[point]*np.sin(angle), radius*np.sin(bar_angle)])
+    return x, y, np.concatenate([arc_connect, bar_connect])
+
+
+## All the error bars of the diagram are drawn by this single item.
+# Each key (an origin vector or a group of data sets) has one precomputed QPainterPath
+# per color, holding the pc arcs and the fc lines of its points.
+class ErrorBarsItem(pg.GraphicsObject):
+    def __init__(self):
+        pg.GraphicsObject.__init__(self)
+        self.paths = {}
+        self.hiddenKinds = set() # first elements of the keys that are not drawn
+        self._boundingRect = None
+
+
+    ## Sets the error bars of a key, colors are (r,g,b) of each point
+    def setErrorBars(self, key, pc, fc, pc_err, fc_err, colors):
+        self.prepareGeometryChange()
+        self.paths.pop(key, None)
+        self._boundingRect = None
+        colors = np.asarray(colors, dtype=int).reshape(-1, 3)
+        if len(colors) > 0:
+            pc, fc, pc_err, fc_err = [np.asarray(a, dtype=float) for a in (pc, fc, pc_err, fc_err)]
+            unique, inverse = uniqueColors(colors)
+            paths = []
+            for k, color in enumerate(unique):
+                m = inverse == k
+                x, y, connect = errorBarLines(pc[m], fc[m], pc_err[m], fc_err[m])
+                paths.append((pg.mkPen(tuple(int(c) for c in color)), pg.arrayToQPath(x, y, connect)))
+            self.paths[key] = paths
+        self.update()
+
+
+    def removeErrorBars(self, key):
+        if key in self.paths:
+            self.prepareGeometryChange()
+            del self.paths[key]
+            self._boundingRect = None
+            self.update()
+
+
+    def clear(self):
+        self.prepareGeometryChange()
+        self.paths = {}
+        self._boundingRect = None
+        self.update()
+
+
+    def boundingRect(self):
+        if self._boundingRect is None:
+            self._boundingRect = QtCore.QRectF()
+            for paths in self.paths.values():
+                for pen, path in paths:
+                    self._boundingRect = self._boundingRect.united(path.boundingRect())
+        return self._boundingRect
+
+
+    ## Shows or hides the error bars of all the keys starting with kind
+    def setKindVisible(self, kind, visible):
+        if visible:
+            self.hiddenKinds.discard(kind)
+        else:
+            self.hiddenKinds.add(kind)
+        self.update()
+
+
+    def paint(self, painter, *args):
+        for key, paths in self.paths.items():
+            if key[0] in self.hiddenKinds:
+                continue
+            for pen, path in paths:
+                painter.setPen(pen)
+                painter.drawPath(path)
+
 
+## Lookup table of the density image: transparent for no data set, then from light to dark blue
+def densityLookupTable(n=256):
+    t = np.linspace(0, 1, n)[:, np.newaxis]
+    lut = np.hstack([(1 - t)*[190, 200, 255] + t*[0, 0, 110], np.full((n, 1), 255)])
+    lut[0, 3] = 0
+    return lut.astype(np.ubyte)
 
-class QGraphicsArcItem(pg.QtGui.QGraphicsEllipseItem):
-    #see: http://stackoverflow.com/questions/14279162/qt-qgraphicsscene-drawing-arc
-    # pos should be a list [pc,fc]
-    # color (r,g,b)
-    def __init__(self, pos, pc_err, color):
-        pg.QtGui.QGraphicsEllipseItem.__init__(self)
-        self.pos = pos
-        self.pc_err = pc_err
-        self.color = QtGui.QColor(color[0], color[1], color[2])
+
+## Data sets of a group, drawn by a single ScatterPlotItem.
+# The points are kept in arrays, in the order they were added. The data of the spots
+# of the ScatterPlotItem are the idents of the points.
+class DataSetBatch(object):
+    def __init__(self):
+        self.idents    = np.zeros(0, dtype=object)
+        self.pc        = np.zeros(0)
+        self.fc        = np.zeros(0)
+        self.pc_err    = np.zeros(0)
+        self.fc_err    = np.zeros(0)
+        self.colors    = np.zeros((0, 3), dtype=int)
+        self.symbols   = np.zeros(0, dtype=object)
+        self.sizes     = np.zeros(0)
+        self.drawError = np.zeros(0, dtype=bool)
+        self.selected  = np.zeros(0, dtype=bool)
+        self.scatter   = None
+        self.x         = np.zeros(0) # cartesian positions, set when the scatter is drawn
+        self.y         = np.zeros(0)
+        self._rows     = None
+
+
+    def __len__(self):
+        return len(self.idents)
+
+
+    ## Row of each ident in the arrays
+    def rows(self):
+        if self._rows is None:
+            self._rows = dict((ident, row) for row, ident in enumerate(self.idents))
+        return self._rows
+
+
+    def add(self, idents, pc, fc, pc_err, fc_err, colors, symbols, sizes, drawError):
+        idents_array = np.empty(len(idents), dtype=object)
+        idents_array[:] = list(idents)
+        self.idents    = np.concatenate([self.idents, idents_array])
+        self.pc        = np.concatenate([self.pc, pc])
+        self.fc        = np.concatenate([self.fc, fc])
+        self.pc_err    = np.concatenate([self.pc_err, pc_err])
+        self.fc_err    = np.concatenate([self.fc_err, fc_err])
+        self.colors    = np.concatenate([self.colors, colors])
+        self.symbols   = np.concatenate([self.symbols, symbols])
+        self.sizes     = np.concatenate([self.sizes, sizes])
+        self.drawError = np.concatenate([self.drawError, drawError])
+        self.selected  = np.concatenate([self.selected, np.zeros(len(idents), dtype=bool)])
+        self._rows = None
+
+
+    def remove(self, idents):
+        rows = self.rows()
+        keep = np.ones(len(self), dtype=bool)
+        keep[[rows[ident] for ident in idents if ident in rows]] = False
+        for name in ('idents', 'pc', 'fc', 'pc_err', 'fc_err', 'colors', 'symbols', 'sizes', 'drawError', 'selected'):
+            setattr(self, name, getattr(self, name)[keep])
+        self._rows = None
+
+
+## True for the points (x, y) inside the polygon of vertices (px, py) (even-odd rule)
+def pointsInPolygon(x, y, px, py):
+    x, y, px, py = [np.asarray(a, dtype=float) for a in (x, y, px, py)]
+    inside = np.zeros(len(x), dtype=bool)
+    j = len(px) - 1
+    for i in range(len(px)):
+        crossing = (py[i] > y) != (py[j] > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_crossing = (px[j] - px[i])*(y - py[i])/(py[j] - py[i]) + px[i]
+        inside ^= crossing & (x < x_crossing)
+        j = i
+    return inside
+
+
+## Grid of square cells over the cartesian positions of the data sets. It finds the data sets
+# near a point, in a rectangle or in a polygon by looking only at the cells around them,
+# instead of testing every item of the scene. Adding, moving or removing a data set is O(1).
+class SpatialIndex(object):
+    def __init__(self, cellSize=0.02):
+        self.cellSize = cellSize
+        self.cells = {}      # (i, j) -> set of idents
+        self.positions = {}  # ident -> (x, y, (i, j))
+
+
+    def __len__(self):
+        return len(self.positions)
+
+
+    def __contains__(self, ident):
+        return ident in self.positions
+
+
+    def clear(self):
+        self.cells = {}
+        self.positions = {}
+
+
+    ## Adds data sets at the given positions, or moves them if they are already there
+    def update(self, idents, x, y):
+        x = np.asarray(x, dtype=float).reshape(-1)
+        y = np.asarray(y, dtype=float).reshape(-1)
+        i = np.floor(x/self.cellSize).astype(int).tolist()
+        j = np.floor(y/self.cellSize).astype(int).tolist()
+        for ident, xk, yk, key in zip(idents, x.tolist(), y.tolist(), zip(i, j)):
+            old = self.positions.get(ident)
+            if old is not None and old[2] != key:
+                self._discard(ident, old[2])
+            self.cells.setdefault(key, set()).add(ident)
+            self.positions[ident] = (xk, yk, key)
+
+
+    ## Removes data sets, idents that are not in the index are ignored
+    def remove(self, idents):
+        for ident in idents:
+            old = self.positions.pop(ident, None)
+            if old is not None:
+                self._discard(ident, old[2])
+
+
+    def _discard(self, ident, key):
+        cell = self.cells[key]
+        cell.discard(ident)
+        if len(cell) == 0:
+            del self.cells[key]
+
+
+    ## Idents and positions of the data sets of the cells overlapping a rectangle
+    def _candidates(self, x0, y0, x1, y1):
+        i0, i1 = int(np.floor(x0/self.cellSize)), int(np.floor(x1/self.cellSize))
+        j0, j1 = int(np.floor(y0/self.cellSize)), int(np.floor(y1/self.cellSize))
+        if (i1 - i0 + 1)*(j1 - j0 + 1) > len(self.cells):  # fewer cells than in the rectangle
+            cells = [cell for (i, j), cell in self.cells.items() if i0 <= i <= i1 and j0 <= j <= j1]
+        else:
+            cells = [self.cells[(i, j)] for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)
+                     if (i, j) in self.cells]
+        idents = [ident for cell in cells for ident in cell]
+        xy = np.array([self.positions[ident][:2] for ident in idents], dtype=float).reshape(-1, 2)
+        return idents, xy[:, 0], xy[:, 1]
+
+
+    ## Ident of the data set closest to (x, y) within radius, None if there is none
+    def nearest(self, x, y, radius):
+        idents, px, py = self._candidates(x - radius, y - radius, x + radius, y + radius)
+        if len(idents) == 0:
+            return None
+        distance = np.hypot(px - x, py - y)
+        k = np.argmin(distance)
+        if distance[k] > radius:
+            return None
+        return idents[k]
+
+
+    ## Idents of the data sets inside the rectangle (x0, y0)-(x1, y1)
+    def inRect(self, x0, y0, x1, y1):
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        idents, px, py = self._candidates(x0, y0, x1, y1)
+        inside = (px >= x0) & (px <= x1) & (py >= y0) & (py <= y1)
+        return [ident for ident, k in zip(idents, inside) if k]
+
+
+    ## Idents of the data sets inside the polygon of vertices (px, py)
+    def inPolygon(self, px, py):
+        if len(px) < 3:
+            return []
+        idents, x, y = self._candidates(min(px), min(py), max(px), max(py))
+        inside = pointsInPolygon(x, y, px, py)
+        return [ident for ident, k in zip(idents, inside) if k]
+
+
+## ViewBox of the Argand diagram, that lets the user pick data sets with the mouse:
+# left click picks the closest one, Shift+drag a rectangle, Alt+drag a lasso.
+# With Ctrl the picked data sets are added to the selection. Other drags pan the view as usual.
+class ArgandViewBox(pg.ViewBox):
+    sigPointClicked = pyqtSignal(object, bool)    # position (view coordinates), extend
+    sigRectSelected = pyqtSignal(object, bool)    # QRectF (view coordinates), extend
+    sigLassoSelected = pyqtSignal(object, bool)   # list of QPointF (view coordinates), extend
+
+    def __init__(self, *args, **kwds):
+        pg.ViewBox.__init__(self, *args, **kwds)
+        self.lassoPoints = []
+        self.lassoItem = QtWidgets.QGraphicsPathItem()
+        self.lassoItem.setPen(pg.mkPen('k', style=QtCore.Qt.DashLine))
+        self.lassoItem.hide()
+        self.addItem(self.lassoItem, ignoreBounds=True)
+
+
+    def mouseClickEvent(self, ev):
+        if ev.button() == QtCore.Qt.LeftButton:
+            ev.accept()
+            self.sigPointClicked.emit(self.mapToView(ev.pos()),
+                                      bool(ev.modifiers() & QtCore.Qt.ControlModifier))
+        else:
+            pg.ViewBox.mouseClickEvent(self, ev)
 
 
-    ## redefine the paint function to draw arcs.
-    def paint(self, painter, option, widget=0):
-        radius = self.pos[1]
-        rect = QtCore.QRectF(-1*radius, -1*radius, 2*radius, 2*radius)
-        startAngle = int( -360*16* (self.pos[0] + self.pc_err)) #360*16: full circle
-        spanAngle  = int(  360*16* self.pc_err*2)
-        painter.setPen(self.color)
-        painter.drawArc(rect, startAngle, spanAngle)
+    def mouseDragEvent(self, ev, axis=None):
+        modifiers = ev.modifiers()
+        if ev.button() != QtCore.Qt.LeftButton or axis is not None or \
+           not modifiers & (QtCore.Qt.ShiftModifier | QtCore.Qt.AltModifier):
+            pg.ViewBox.mouseDragEvent(self, ev, axis)
+            return
+        ev.accept()
+        extend = bool(modifiers & QtCore.Qt.ControlModifier)
+        if modifiers & QtCore.Qt.ShiftModifier:  # rectangle
+            if ev.isFinish():
+                self.rbScaleBox.hide()
+                self.sigRectSelected.emit(QtCore.QRectF(self.mapToView(ev.buttonDownPos()),
+                                                        self.mapToView(ev.pos())).normalized(), extend)
+            else:
+                self.updateScaleBox(ev.buttonDownPos(), ev.pos())
+        else:  # lasso
+            if ev.isStart():
+                self.lassoPoints = [self.mapToView(ev.buttonDownPos())]
+                self.lassoItem.show()
+            self.lassoPoints.append(self.mapToView(ev.pos()))
+            path = QtGui.QPainterPath()
+            path.addPolygon(QtGui.QPolygonF(self.lassoPoints))
+            path.closeSubpath()
+            self.lassoItem.setPath(path)
+            if ev.isFinish():
+                self.lassoItem.hide()
+                self.sigLassoSelected.emit(self.lassoPoints, extend)
+                self.lassoPoints = []
 
 
 ## Redefining the standard pyqtgraph class to enable easy drawing of a polar plot.
 class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibility the other plot options
+    # idents of the data sets picked with the mouse, and True if they extend the selection
+    sigDataSetsSelected = pyqtSignal(list, bool)
+
     def __init__(self):
-        pg.PlotWidget.__init__(self)
+        pg.PlotWidget.__init__(self, viewBox=ArgandViewBox())
         self.setAspectLocked()
         self.setAntialiasing(True) # looks prettier
         self.keysSelectedBefore = set()
@@ -81,15 +395,55 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
         self.setCursor(QtCore.Qt.CrossCursor)
         self.vectorList = []
         self.originVectorDict = {}
+        # group of each data set, the data sets of a group are drawn together (see DataSetBatch)
         self.dataSetDict = {}
+        self.dataSetBatches = {}
         self.splitVectorList = []
-        self.errorBarDictPc = {}
-        self.errorBarDictFc = {}
         self.polarGridLines = []
         self.radialGridLines = []
         self.radialTickmarks = []
         self.radialTickLabels = []
         self.createAxisAndGrid()
+        self.errorBars = ErrorBarsItem()
+        self.errorBars.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+        self.addItem(self.errorBars)
+        self.selectedSizeDiff = 5
+        self.selectedPen = pg.mkPen(color='k', width=2)
+        # the ScatterPlotItems of the groups whose data sets changed are updated
+        # once control returns to the event loop, or by calling updateDataSets()
+        self.dirtyBatches = set()
+        self.updateTimer = QtCore.QTimer()
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.timeout.connect(self.updateDataSets)
+        # positions of the data sets, used to pick them with the mouse
+        self.spatialIndex = SpatialIndex()
+        self.pickRadius = 6 # pixels
+        vb = self.plotItem.vb
+        vb.sigPointClicked.connect(self.selectNearest)
+        vb.sigRectSelected.connect(
+            lambda rect, extend: self.sigDataSetsSelected.emit(
+                self.spatialIndex.inRect(rect.left(), rect.top(), rect.right(), rect.bottom()), extend))
+        vb.sigLassoSelected.connect(
+            lambda points, extend: self.sigDataSetsSelected.emit(
+                self.spatialIndex.inPolygon([p.x() for p in points], [p.y() for p in points]), extend))
+        # Level of detail: when more than lodThreshold data sets are in view (None: never),
+        # an image of their density is drawn instead of their symbols and error bars.
+        # It is computed again (at most every lodInterval ms) when the view changes.
+        self.lodThreshold = 20000
+        self.lodBinSize = 3 # pixels
+        self.lodSmoothing = 1.0 # bins, width of the gaussian smoothing the histogram
+        self.lodInterval = 40
+        self.densityShown = False
+        self.densityImage = pg.ImageItem(axisOrder='col-major')
+        self.densityImage.setLookupTable(densityLookupTable())
+        self.densityImage.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+        self.densityImage.hide()
+        vb.addItem(self.densityImage, ignoreBounds=True)
+        self._positions = None
+        self.lodTimer = QtCore.QTimer()
+        self.lodTimer.setSingleShot(True)
+        self.lodTimer.timeout.connect(self.updateLevelOfDetail)
+        vb.sigRangeChanged.connect(self.scheduleLevelOfDetail)
         self.__version__   = __version__
         self.__revision__  = __revision__
         self.__modDate__   = __modDate__
@@ -100,7 +454,7 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
 
     def createAxisAndGrid(self, polarGridNr = 10.0, radialGridNr = 20.0):
         # Add polar "Axis"
-        self.polarAxis = pg.QtGui.QGraphicsEllipseItem(-1, -1, 2, 2)
+        self.polarAxis = QtWidgets.QGraphicsEllipseItem(-1, -1, 2, 2)
         #self.polarAxis.setStartAngle(500) #Get part of the pie only shown
         #self.polarAxis.setSpanAngle(500)
         self.polarAxis.setPen(pg.mkPen(0.0)) # DotLine
@@ -109,7 +463,7 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
 
         # Add polar grid lines
         for r in np.arange(0.1, 1.0, 1.0/polarGridNr):
-            self.polarGridLine = pg.QtGui.QGraphicsEllipseItem(-r, -r, r*2, r*2)
+            self.polarGridLine = QtWidgets.QGraphicsEllipseItem(-r, -r, r*2, r*2)
             if r==0.2 or r==0.4 or r==0.6 or r==0.8: # draw these lines as solid
                 self.polarGridLine.setPen(pg.mkPen(0.7,style=QtCore.Qt.SolidLine,color="r")) # SolidLine, DashLine or DotLine
             else: # the rest as dashed
@@ -120,13 +474,13 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
         # Add radial grid lines
         self.radialGridParam = [0 , 2.0*np.pi, 2.0*np.pi/radialGridNr] # angles in rad
         for a in np.arange(self.radialGridParam[0],self.radialGridParam[1],self.radialGridParam[2]):
-            self.radialGridLine = pg.QtGui.QGraphicsLineItem(0, 0, np.cos(a), np.sin(a))
+            self.radialGridLine = QtWidgets.QGraphicsLineItem(0, 0, np.cos(a), np.sin(a))
             self.radialGridLine.setPen(pg.mkPen(0.8,style=QtCore.Qt.DashLine))
             self.radialGridLines.append(self.radialGridLine)
             self.addItem(self.radialGridLine)
         # add radial tickmarks
         for a in np.arange(self.radialGridParam[0],self.radialGridParam[1],self.radialGridParam[2]):
-            self.radialGridLine = pg.QtGui.QGraphicsLineItem(np.cos(a), np.sin(a),np.cos(a)*1.03, np.sin(a)*1.03)
+            self.radialGridLine = QtWidgets.QGraphicsLineItem(np.cos(a), np.sin(a),np.cos(a)*1.03, np.sin(a)*1.03)
             self.radialGridLine.setPen(pg.mkPen(0.0))
             self.radialTickmarks.append(self.radialGridLine)
             self.addItem(self.radialGridLine)
@@ -218,63 +572,181 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
 
 
     ## Add scattered points
-    # return a pointer to the Item (to be removed with removeItem)
     # color can be given (R,G,B), default is black
     # data_argand = [pc, fc]
     # data_err    = [pc_err, fc_err]
-    def addDataSet(self, data_argand, data_err, drawError=True, color=(0,0,0), symb='o', size=-1, ident=None):
+    # the point is drawn together with the other points of the same group, see addDataSets
+    def addDataSet(self, data_argand, data_err, drawError=True, color=(0,0,0), symb='o', size=-1, ident=None, group=None):
         if ident==None:
             print("ERROR while adding DataSet: You have not specified the ident-parameter.\n"\
             +"You have to give each item an unique identification!\n"\
             +"It does not matter if it is an integer number or a string.")
             return
-
-        if np.isnan(data_argand[0]) or np.isnan(data_argand[1]) or np.isnan(data_err[0]) or np.isnan(data_err[1])\
-        or not(isinstance(data_argand[0], numbers.Real)) or not(isinstance(data_argand[1], numbers.Real)) or not(isinstance(data_err[0], numbers.Real)) or not(isinstance(data_err[1], numbers.Real)):
-            print("\n-------------------------\n## Warning from pyArgand: DataSet coordinates were not given in int or float or was NaN! ##\n## Set all coordinates to zero.##\n-------------------------\n")
-
-            data_argand = [0.0, 0.0]
-            data_err    = [0.0, 0.0]
-
-        data_cartesian = np.array([self.convertPcFc_to_cartesian(data_argand[0], data_argand[1])]) # needs a list although we treat the points one by one...
-
-        if 'n' == symb:
-            symbSize=0
-            symb='o'
-        elif size==-1:
-            symbSize=self.standardSizeDataSet
-        else:
-            symbSize=size
-
-        ptSet=GraphItemExtended()
-        ptSet.setData(pos=data_cartesian, symbolPen=color, symbolBrush=color, size=symbSize, symbol=symb, text=[''], dragable=[False], arraowHead=[False])
-
-        self.addItem(ptSet)
-        self.dataSetDict.update({ident:ptSet})
-
-        # ErrorBars get the same id as the item they belong to
-        if drawError:
-            self.addErrorBars(data_argand, data_err, color, ident=ident)
+        self.addDataSets([data_argand[0]], [data_argand[1]], [data_err[0]], [data_err[1]], [ident],
+                         drawError=drawError, colors=[color], symbols=[symb], size=size, group=group)
+
+
+    ## Add many scattered points of a group at once
+    # pc, fc, pc_err and fc_err are arrays, idents a list of unique identifications
+    # colors (R,G,B) and symbols can be given for each point or for all of them.
+    # Points that are already displayed are replaced.
+    def addDataSets(self, pc, fc, pc_err, fc_err, idents, drawError=True, colors=(0,0,0), symbols='o', size=-1, group=None):
+        idents = list(idents)
+        n = len(idents)
+        if n == 0:
+            return
+        pc, fc, pc_err, fc_err = [np.array(a, dtype=float).reshape(-1) for a in (pc, fc, pc_err, fc_err)]
+        invalid = ~(np.isfinite(pc) & np.isfinite(fc) & np.isfinite(pc_err) & np.isfinite(fc_err))
+        if np.any(invalid):
+            print("\n-------------------------\n## Warning from pyArgand: DataSet coordinates were NaN for %d data sets! ##\n## Set all their coordinates to zero.##\n-------------------------\n" % np.sum(invalid))
+            for a in (pc, fc, pc_err, fc_err):
+                a[invalid] = 0.0
+        colors = np.broadcast_to(np.asarray(colors, dtype=int).reshape(-1, 3), (n, 3))
+        symbols = np.array([str(s) for s in np.broadcast_to(np.asarray(symbols, dtype=object), (n,))], dtype=object)
+
+        if size==-1:
+            size = self.standardSizeDataSet
+        sizes = np.where(symbols == 'n', 0.0, size)
+        symbols[symbols == 'n'] = 'o'
+
+        vanishing = (pc_err < 1e-4) | (fc_err < 1e-4)
+        if drawError and np.any(vanishing):
+            print("==>", np.sum(vanishing), "data sets have none or vanishing Error bars!")
+
+        self.remove_dataSets(idents)
+        if group not in self.dataSetBatches:
+            self.dataSetBatches[group] = DataSetBatch()
+        self.dataSetBatches[group].add(idents, pc, fc, pc_err, fc_err, colors, symbols, sizes,
+                                       np.full(n, bool(drawError)))
+        self.dataSetDict.update((ident, group) for ident in idents)
+        self.spatialIndex.update(idents, *self.convertPcFc_to_cartesian(pc, fc))
+        self.invalidateBatch(group)
+
+
+    ## Picks the data set closest to pos (view coordinates), within pickRadius pixels.
+    # Clicking far from any data set clears the selection, unless it is extended.
+    def selectNearest(self, pos, extend=False):
+        radius = self.pickRadius*max(self.plotItem.vb.viewPixelSize())
+        ident = self.spatialIndex.nearest(pos.x(), pos.y(), radius)
+        if ident is not None:
+            self.sigDataSetsSelected.emit([ident], extend)
+        elif not extend:
+            self.sigDataSetsSelected.emit([], False)
+
+
+    ## Marks the data sets of a group to be redrawn
+    def invalidateBatch(self, group):
+        self.dirtyBatches.add(group)
+        if not self.updateTimer.isActive():
+            self.updateTimer.start(0)
+
+
+    ## Redraws the groups of data sets that changed: one ScatterPlotItem per group,
+    # and their error bars in the error bars item
+    def updateDataSets(self):
+        self.updateTimer.stop()
+        for group in self.dirtyBatches:
+            batch = self.dataSetBatches.get(group)
+            if batch is None:
+                continue
+            if len(batch) == 0:
+                if batch.scatter is not None:
+                    self.removeItem(batch.scatter)
+                self.errorBars.removeErrorBars(('dataSets', group))
+                del self.dataSetBatches[group]
+                continue
+            unique, inverse = uniqueColors(batch.colors)
+            brushes = np.empty(len(unique), dtype=object)
+            brushes[:] = [pg.mkBrush(tuple(int(c) for c in color)) for color in unique]
+            pens = np.empty(len(unique), dtype=object)
+            pens[:] = [pg.mkPen(tuple(int(c) for c in color)) for color in unique]
+            # a style shared by all the points is given once, which is much faster
+            if len(unique) == 1:
+                brushes = brushes[0]
+            else:
+                brushes = brushes[inverse]
+            if len(unique) == 1 and not np.any(batch.selected):
+                pens = pens[0]
+            else:
+                pens = pens[inverse]
+                pens[batch.selected] = self.selectedPen
+            symbols = batch.symbols
+            if np.all(symbols == symbols[0]):
+                symbols = symbols[0]
+            sizes = batch.sizes + self.selectedSizeDiff*batch.selected
+            if np.all(sizes == sizes[0]):
+                sizes = sizes[0]
+            x, y = self.convertPcFc_to_cartesian(batch.pc, batch.fc)
+            batch.x, batch.y = x, y
+            if batch.scatter is None:
+                batch.scatter = pg.ScatterPlotItem()
+                # data sets are picked through the spatial index, not by the scene
+                batch.scatter.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+                batch.scatter.setVisible(not self.densityShown)
+                self.addItem(batch.scatter)
+            batch.scatter.setData(x=x, y=y, symbol=symbols, size=sizes, pen=pens,
+                                  brush=brushes, data=batch.idents)
+            m = batch.drawError
+            self.errorBars.setErrorBars(('dataSets', group), batch.pc[m], batch.fc[m],
+                                        batch.pc_err[m], batch.fc_err[m], batch.colors[m])
+        if len(self.dirtyBatches) > 0:
+            self._positions = None
+            self.scheduleLevelOfDetail()
+        self.dirtyBatches = set()
+
+
+    ## Cartesian positions (x, y) of all the drawn data sets
+    def dataSetPositions(self):
+        if self._positions is None:
+            batches = list(self.dataSetBatches.values())
+            self._positions = (np.concatenate([np.zeros(0)] + [b.x for b in batches]),
+                               np.concatenate([np.zeros(0)] + [b.y for b in batches]))
+        return self._positions
+
+
+    def scheduleLevelOfDetail(self, *args):
+        if not self.lodTimer.isActive():
+            self.lodTimer.start(self.lodInterval)
+
+
+    ## Draws the density of the data sets in view instead of their symbols if there are
+    # more than lodThreshold of them, and draws the symbols again otherwise.
+    # The density is a 2D histogram over the view with bins of lodBinSize pixels,
+    # smoothed by a gaussian (a simple kernel density estimate), on a logarithmic scale.
+    def updateLevelOfDetail(self):
+        vb = self.plotItem.vb
+        (x0, x1), (y0, y1) = vb.viewRange()
+        x, y = self.dataSetPositions()
+        visible = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        showDensity = self.lodThreshold is not None and int(np.count_nonzero(visible)) > self.lodThreshold
+        if showDensity:
+            pixelWidth, pixelHeight = vb.viewPixelSize()
+            bins = (max(1, int((x1 - x0)/(pixelWidth*self.lodBinSize))),
+                    max(1, int((y1 - y0)/(pixelHeight*self.lodBinSize))))
+            density = np.histogram2d(x[visible], y[visible], bins=bins, range=((x0, x1), (y0, y1)))[0]
+            if self.lodSmoothing > 0:
+                density = gaussian_filter(density, self.lodSmoothing)
+            density = np.log1p(density)
+            self.densityImage.setImage(density, autoLevels=False, levels=(0, max(density.max(), 1e-3)))
+            self.densityImage.setRect(QtCore.QRectF(x0, y0, x1 - x0, y1 - y0))
+        if showDensity != self.densityShown:
+            self.densityShown = showDensity
+            self.densityImage.setVisible(showDensity)
+            self.errorBars.setKindVisible('dataSets', not showDensity)
+            for batch in self.dataSetBatches.values():
+                if batch.scatter is not None:
+                    batch.scatter.setVisible(not showDensity)
 
 
     ## Add error bars to the given point with the given color
     def addErrorBars(self, data_argand, data_err, color, ident=None):
         if data_err[0]<1e-4 or data_err[1]<1e-4:
-            print "==>", data_argand, "<== has none or vanishing Error bars!"
-        # Arc of a circle for pc
-        errBar_pc = QGraphicsArcItem(data_argand, data_err[0], color)
-        # Just a line for fc
-        x1,y1 = self.convertPcFc_to_cartesian(data_argand[0], data_argand[1]-data_err[1])
-        x2,y2 = self.convertPcFc_to_cartesian(data_argand[0], data_argand[1]+data_err[1])
-        errBar_fc = pg.QtGui.QGraphicsLineItem(x1,y1, x2,y2)
-        errBar_fc.setPen(pg.mkPen(color))
-        self.addItem(errBar_fc)
-        self.addItem(errBar_pc)
+            print("==>", data_argand, "<== has none or vanishing Error bars!")
         if ident==None:
-            print "ERROR while adding ErrorBars: errorBars need to be correlated to an object in the QTreeWidget. Set a proper ident parameter!"
+            print("ERROR while adding ErrorBars: errorBars need to be correlated to an object in the QTreeWidget. Set a proper ident parameter!")
             return
-        self.errorBarDictPc.update({ident:errBar_pc})
-        self.errorBarDictFc.update({ident:errBar_fc})
+        self.errorBars.setErrorBars(('originVector', ident), [data_argand[0]], [data_argand[1]],
+                                    [data_err[0]], [data_err[1]], [color])
 
 
     ## Display a polygon passing though (0,0) (pc1,fc1) (pc2,fc2) (pc3,fc3) and closing to (0,)
@@ -304,9 +776,9 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
 
     ## mark a selected datapoint or origin vector
     def markSelected(self, keysSelectedNow=None):
-        sizeDiff = 5
+        sizeDiff = self.selectedSizeDiff
         if keysSelectedNow==None:
-            print "ERROR: You have not specified the ident-parameter.\nI do not know what to mark!"
+            print("ERROR: You have not specified the ident-parameter.\nI do not know what to mark!")
             return
 
         notSelectedAnymore = self.keysSelectedBefore - set(keysSelectedNow)
@@ -317,9 +789,8 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
             if ident in self.originVectorDict:
                 self.originVectorDict[ident].setSymbolSize([1,self.standardSizeOriginVector])
                 self.originVectorDict[ident].setSymbolPen(self.originVectorDict[ident].data['symbolBrush'])
-            elif ident in self.dataSetDict:
-                self.dataSetDict[ident].setSymbolSize(self.standardSizeDataSet)
-                self.dataSetDict[ident].setSymbolPen(self.dataSetDict[ident].data['symbolBrush'])
+        self.markDataSets([ident for ident in notSelectedAnymore
+                           if ident not in self.originVectorDict and ident in self.dataSetDict], False)
 
         # change look of selected items
         for ident in newSelected:
@@ -327,42 +798,70 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
                 self.originVectorDict[ident].setSymbolSize([1,self.standardSizeOriginVector+sizeDiff])
                 self.originVectorDict[ident].setSymbolPen(pg.mkPen(color='k',width=2))
                 self.originVectorDict[ident].setPen(color=self.originVectorDict[ident].data['pen'], width=3)
-            elif ident in self.dataSetDict:
-                self.dataSetDict[ident].setSymbolSize(self.standardSizeDataSet+sizeDiff)
-                self.dataSetDict[ident].setSymbolPen(pg.mkPen(color='k',width=2))
+        self.markDataSets([ident for ident in newSelected
+                           if ident not in self.originVectorDict and ident in self.dataSetDict], True)
             # else:
-            #     print "ERROR in pyArgand: Item that is supposed to be marked is non existant"
-            #     print "Key not found: ",ident
+            #     print("ERROR in pyArgand: Item that is supposed to be marked is non existant")
+            #     print("Key not found: ",ident)
+
+
+    ## Changes the look of data sets. Only their spots are updated when they are few,
+    # otherwise their groups are redrawn at once.
+    def markDataSets(self, idents, selected, maxSpots=100):
+        groups = {}
+        for ident in idents:
+            groups.setdefault(self.dataSetDict[ident], []).append(ident)
+        for group, group_idents in groups.items():
+            batch = self.dataSetBatches[group]
+            rows = [batch.rows()[ident] for ident in group_idents]
+            batch.selected[rows] = selected
+            if batch.scatter is None or group in self.dirtyBatches:
+                continue  # it will be drawn with the look it has now
+            if len(rows) > maxSpots:
+                self.invalidateBatch(group)
+                continue
+            spots = batch.scatter.points()
+            for row in rows:
+                spots[row].setSize(batch.sizes[row] + self.selectedSizeDiff*selected)
+                spots[row].setPen(self.selectedPen if selected else pg.mkPen(tuple(int(c) for c in batch.colors[row])))
 
 
     ## Remove a single originVector together with its ErrorBars
     def remove_originVector(self, ident=None):
         if ident==None:
-            print "ERROR: You have not specified the ident-parameter.\nI do not know what to delete!"
+            print("ERROR: You have not specified the ident-parameter.\nI do not know what to delete!")
             return
-        self.removeItem(self.originVectorDict[ident])
+        self.removeItem(self.originVectorDict.pop(ident))
         self.remove_ErrorBars(ident)
 
 
     ## Remove a single dataSet together with its ErrorBars
     def remove_dataSet(self, ident=None):
         if ident==None:
-            print "ERROR: You have not specified the ident-parameter.\nI do not know what to delete!"
+            print("ERROR: You have not specified the ident-parameter.\nI do not know what to delete!")
             return
-        self.removeItem(self.dataSetDict[ident])
-        self.remove_ErrorBars(ident)
+        self.remove_dataSets([ident])
+
+
+    ## Remove dataSets together with their ErrorBars, idents that are not displayed are ignored
+    def remove_dataSets(self, idents):
+        groups = {}
+        for ident in idents:
+            if ident in self.dataSetDict:
+                groups.setdefault(self.dataSetDict.pop(ident), []).append(ident)
+        self.spatialIndex.remove(idents)
+        for group, group_idents in groups.items():
+            self.dataSetBatches[group].remove(group_idents)
+            self.invalidateBatch(group)
 
 
-    ## removes a pair of errorBars if the exist
+    ## removes the errorBars of an origin vector if they exist
     # they do not exist if the user decides to plot without errorBars
     def remove_ErrorBars(self, ident):
         if ident==None:
-            print "ERROR: You have not specified the ident-parameter.\nI do not know what to delete!"
+            print("ERROR: You have not specified the ident-parameter.\nI do not know what to delete!")
             return
-        if ident in self.errorBarDictPc:
-            self.removeItem(self.errorBarDictPc[ident])
-        if ident in self.errorBarDictFc:
-            self.removeItem(self.errorBarDictFc[ident])
+        self.errorBars.removeErrorBars(('originVector', ident))
 
 
     ## clears the Argand diagram by removing all its content
@@ -377,7 +876,7 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
     ## Remove all Origin vector
     # Usually used to refresh the display
     def removeAll_originVector(self):
-        for key,item in self.originVectorDict.iteritems():
+        for key,item in self.originVectorDict.items():
             self.remove_ErrorBars(ident=key)
             self.removeItem(item)
         self.originVectorDict.clear()
@@ -386,10 +885,16 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
     ## Remove all data points
     # Usually used to refresh the display
     def removeAll_dataSet(self):
-        for key,item in self.dataSetDict.iteritems():
-            self.remove_ErrorBars(ident=key)
-            self.removeItem(item)
+        for group,batch in self.dataSetBatches.items():
+            self.errorBars.removeErrorBars(('dataSets', group))
+            if batch.scatter is not None:
+                self.removeItem(batch.scatter)
+        self.dataSetBatches.clear()
         self.dataSetDict.clear()
+        self.spatialIndex.clear()
+        self.dirtyBatches = set()
+        self._positions = None
+        self.scheduleLevelOfDetail()
 
 
     ## Remove the split vector
@@ -403,12 +908,7 @@ class ArgandPlotWidget(pg.PlotWidget): # fig is ignored, just here for compatibi
     # should only be called if ONLY the errorbars should be removed
     # if a dataSet or originVector is removed it will remove its errorBars automatically
     def removeAll_ErrorBar(self):
-        for i in self.errorBarDictPc.itervalues():
-            self.removeItem(i)
-        for i in self.errorBarDictFc.itervalues():
-            self.removeItem(i)
-        self.errorBarDictPc.clear()
-        self.errorBarDictFc.clear()
+        self.errorBars.clear()
 
 
 #    def toggleCrosshair(self, draw=False):
@@ -502,7 +1002,7 @@ class GraphItemExtended(pg.GraphItem):
         if 'pos' in self.data:
             return self.data['pos']
         else:
-            print "ERROR: Cannot get Positions. Reason: No nodes set yet."
+            print("ERROR: Cannot get Positions. Reason: No nodes set yet.")
 
 
     # set the labels of the nodes (can be added directly with setDat(.a.., text='label'))
@@ -0,0 +1,800 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+## Data behind the Argand list: groups of points (Pc, Fc, errors and fit metadata).
+# ArgandStore keeps one array per column, so that averages, plots and saving work on
+# whole columns instead of reading back the text of tree items. Groups and points get
+# an int id when they are added, which never changes and is never reused: it is also
+# the ident of their symbols in the Argand diagram.
+# ArgandTreeModel shows a store in a QTreeView: groups are the top-level rows and
+# points their children. Only the visible rows are ever formatted, which keeps the
+# list responsive with 10^5 points.
+
+from ast import literal_eval
+import numpy as np
+from PyQt5 import QtCore
+from PyQt5.QtGui import QColor
+
+# Columns stored as float64 arrays. NaN is a missing value, shown as '-' or '' (see ArgandStore.dash)
+NUMERIC_COLUMNS = ('Slice nb', 'Phi', 'Pc', 'Fc', 'Pc_err', 'Fc_err', 'Gamma',
+                   'Gamma_err', 'Q_0', 'Q_H', 'Delta', 'P el', 'Sr', 'Sr_err',
+                   '|Si|', 'Psi', 'Zeta', 'b sample', 'b DCM', 'Xi', 'P Refl',
+                   'Temp.', 'delta hnu', 'Sigma', 'R2 Refl', 'X2 Yield')
+# Numeric columns shown and saved as integers
+INTEGER_COLUMNS = ('Slice nb', )
+# Above this number of blocks of consecutive rows to remove, the views are reset
+MAX_REMOVED_BLOCKS = 100
+# Columns of the points the group averages are computed from
+AVERAGED_COLUMNS = ('Pc', 'Fc', 'Pc_err', 'Fc_err')
+# Terms of a point summed in the group average (see average_terms)
+(T_COUNT, T_NO_ERRORS, T_NOT_COMPUTABLE, T_W_RE, T_W_IM, T_WX, T_WY, T_X, T_Y,
+ T_XX, T_YY) = range(11)
+N_TERMS = 11
+
+
+## Float value of a cell and True if it is '-' (not applicable) rather than empty
+def parse_number(value):
+    if isinstance(value, (bool, np.bool_)):
+        return float(value), False
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value), False
+    text = str(value).strip()
+    if text == '-':
+        return np.nan, True
+    try:
+        return float(text), False
+    except ValueError:
+        return np.nan, False
+
+
+## Arrays of float values and of '-' flags of a list of cells, see parse_number
+def parse_numbers(values):
+    cells = np.empty(len(values), dtype=object)
+    cells[:] = values
+    dash = cells == '-'
+    given = ~(dash | (cells == ''))
+    numbers = np.full(len(values), np.nan)
+    try:
+        numbers[given] = cells[given].astype(float)
+    except (ValueError, TypeError):
+        numbers, dash = (np.array(column) for column in zip(
+            *[parse_number(value) for value in values]))
+    return numbers, dash
+
+
+## (r, g, b) of a color given as a QColor, a tuple or the text of a tuple
+def parse_color(value):
+    if hasattr(value, 'getRgb'):
+        return value.getRgb()[0:3]
+    if isinstance(value, str):
+        try:
+            value = literal_eval(value)
+        except (ValueError, SyntaxError):
+            print('Unknown color:', value)
+            return (0, 0, 0)
+    try:
+        return tuple(int(c) for c in value)[0:3]
+    except (TypeError, ValueError):
+        print('Unknown color type:', type(value))
+        return (0, 0, 0)
+
+
+## (n, 3) array of the colors of a list of cells, each different text or tuple is parsed once
+def parse_colors(values):
+    parsed = {}
+    colors = np.empty((len(values), 3), dtype=np.uint8)
+    for k, value in enumerate(values):
+        if isinstance(value, (str, tuple)):
+            if value not in parsed:
+                parsed[value] = parse_color(value)
+            colors[k] = parsed[value]
+        else:
+            colors[k] = parse_color(value)
+    return colors
+
+
+## Cartesian coordinates (x, y) = Fc (cos, sin)(2 pi Pc), (0, 0) when Pc or Fc is not computable
+def cartesian(pc, fc):
+    not_computable = ~(np.isfinite(pc) & np.isfinite(fc))
+    pc = np.where(not_computable, 0.0, pc)
+    fc = np.where(not_computable, 0.0, fc)
+    return fc * np.cos(2 * np.pi * pc), fc * np.sin(2 * np.pi * pc)
+
+
+## (n, N_TERMS) array of the contributions of points to the sums of their group.
+# The average is weighted in cartesian coordinates with the weights 1/err^2 of the errors
+# propagated from Pc_err and Fc_err. The spread of the points is summed relative to a
+# reference point (x0, y0) of their group, close to the average, to keep its precision.
+# Points with a missing or zero error are only counted (their group gets no average),
+# a position or fraction that is not computable is taken as 0.
+def average_terms(pc, fc, pc_err, fc_err, x0, y0):
+    terms = np.zeros((len(pc), N_TERMS))
+    no_errors = ~((pc_err >= 1e-8) & (fc_err >= 1e-8))
+    not_computable = ~(np.isfinite(pc) & np.isfinite(fc))
+    pc = np.where(not_computable, 0.0, pc)
+    fc = np.where(not_computable, 0.0, fc)
+    cos = np.cos(2 * np.pi * pc)
+    sin = np.sin(2 * np.pi * pc)
+    x = fc * cos
+    y = fc * sin
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w_re = 1 / ((cos * fc_err)**2 + (2 * np.pi * fc * sin * pc_err)**2)
+        w_im = 1 / ((sin * fc_err)**2 + (2 * np.pi * fc * cos * pc_err)**2)
+    terms[:, T_COUNT] = 1
+    terms[:, T_NO_ERRORS] = no_errors
+    terms[:, T_NOT_COMPUTABLE] = not_computable
+    terms[:, T_W_RE] = w_re
+    terms[:, T_W_IM] = w_im
+    terms[:, T_WX] = x * w_re
+    terms[:, T_WY] = y * w_im
+    terms[:, T_X] = x - x0
+    terms[:, T_Y] = y - y0
+    terms[:, T_XX] = (x - x0)**2
+    terms[:, T_YY] = (y - y0)**2
+    # only finite terms are summed, so that they can be subtracted again
+    weighted = terms[:, T_W_RE:]
+    weighted[no_errors | ~np.all(np.isfinite(weighted), axis=1)] = 0
+    return terms
+
+
+## Weighted averages (Pc, Fc) and their errors (Pc_err, Fc_err) from the sums of average_terms
+# of groups of at least 2 points and their reference points: for each one the largest of the
+# propagated error and of the standard deviation of the points around the average is given.
+def weighted_averages(sums, x0, y0):
+    n = sums[:, T_COUNT]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        av_Re = sums[:, T_WX] / sums[:, T_W_RE]
+        av_Im = sums[:, T_WY] / sums[:, T_W_IM]
+        av_err_Re = np.sqrt(1 / sums[:, T_W_RE])
+        av_err_Im = np.sqrt(1 / sums[:, T_W_IM])
+        # In the case of data point spread larger than the propagated error bars,
+        # the std deviation with respect to weighted averages is used:
+        # sum((x - av)^2) = sum((x - x0)^2) - 2 (av - x0) sum(x - x0) + n (av - x0)^2
+        av_err_Re_StdDev = np.sqrt(
+            np.maximum(sums[:, T_XX] - 2 * (av_Re - x0) * sums[:, T_X] +
+                       n * (av_Re - x0)**2, 0) / (n - 1))
+        av_err_Im_StdDev = np.sqrt(
+            np.maximum(sums[:, T_YY] - 2 * (av_Im - y0) * sums[:, T_Y] +
+                       n * (av_Im - y0)**2, 0) / (n - 1))
+
+        # Now back to polar coordinates
+        av_pc = np.arctan2(av_Im, av_Re) / (2 * np.pi)
+        av_pc = np.where(av_pc < 0., av_pc + 1., av_pc)
+        av_fc = np.sqrt(av_Re**2 + av_Im**2)
+        av_err_pc_ErrorPropagation = np.sqrt(
+            (av_Im * av_err_Re / (2 * np.pi * av_fc**2))**2 +
+            (av_Re * av_err_Im / (2 * np.pi * av_fc**2))**2)
+        av_err_pc_StdDev = np.sqrt((av_Im * av_err_Re_StdDev /
+                                    (2 * np.pi * av_fc**2))**2 +
+                                   (av_Re * av_err_Im_StdDev /
+                                    (2 * np.pi * av_fc**2))**2)
+        av_err_fc_ErrorPropagation = np.sqrt((av_Re * av_err_Re / av_fc)**2 +
+                                             (av_Im * av_err_Im / av_fc)**2)
+        av_err_fc_StdDev = np.sqrt((av_Re * av_err_Re_StdDev / av_fc)**2 +
+                                   (av_Im * av_err_Im_StdDev / av_fc)**2)
+    return (av_pc, av_fc,
+            np.maximum(av_err_pc_ErrorPropagation, av_err_pc_StdDev),
+            np.maximum(av_err_fc_ErrorPropagation, av_err_fc_StdDev))
+
+
+class ArgandStore(object):
+
+    def __init__(self, columns, capacity=1024):
+        self.columns = list(columns)
+        self.numeric_columns = [c for c in self.columns if c in NUMERIC_COLUMNS]
+        # 'Path' is not a column of the list, it is shown as tool tip of the name
+        self.text_columns = [
+            c for c in self.columns if c not in NUMERIC_COLUMNS and c != 'Color'
+        ] + ['Path']
+        self.clear(capacity)
+
+    ## Removes all groups and points, and restarts the ids from 0
+    def clear(self, capacity=1024):
+        self.size = 0  # number of ids given so far
+        self.values = {c: np.full(capacity, np.nan) for c in self.numeric_columns}
+        # True where a missing numeric value is '-' (not applicable) instead of ''
+        self.dash = {
+            c: np.zeros(capacity, dtype=bool) for c in self.numeric_columns
+        }
+        self.texts = {
+            c: np.full(capacity, '', dtype=object) for c in self.text_columns
+        }
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.checked = np.zeros(capacity, dtype=bool)
+        # group id of the points, -1 for the groups
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        # tree order: ids of the groups, and ids of the points of each group
+        self.groups = []
+        self.children = {}
+        # average_terms of the points, their sums for each group (kept up to date
+        # by every change) and the reference point (x0, y0) of each group
+        self.terms = np.zeros((capacity, N_TERMS))
+        self.sums = np.zeros((capacity, N_TERMS))
+        self.reference = np.zeros((capacity, 2))
+        self.invalidate()
+
+    ## Forgets the cached positions and group index, to be called after any change of the tree structure
+    def invalidate(self):
+        self._positions = None
+        self._group_index = None
+
+    def _reserve(self, n):
+        capacity = len(self.alive)
+        if self.size + n <= capacity:
+            return
+        extra = max(capacity, self.size + n - capacity)
+        for column in self.numeric_columns:
+            self.values[column] = np.concatenate(
+                [self.values[column], np.full(extra, np.nan)])
+            self.dash[column] = np.concatenate(
+                [self.dash[column], np.zeros(extra, dtype=bool)])
+        for column in self.text_columns:
+            self.texts[column] = np.concatenate(
+                [self.texts[column], np.full(extra, '', dtype=object)])
+        self.color = np.concatenate(
+            [self.color, np.zeros((extra, 3), dtype=np.uint8)])
+        self.checked = np.concatenate([self.checked, np.zeros(extra, dtype=bool)])
+        self.parent = np.concatenate(
+            [self.parent, np.full(extra, -1, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self.terms = np.concatenate([self.terms, np.zeros((extra, N_TERMS))])
+        self.sums = np.concatenate([self.sums, np.zeros((extra, N_TERMS))])
+        self.reference = np.concatenate([self.reference, np.zeros((extra, 2))])
+
+    ## Fills new rows from a list of dicts (column name: value), one column at a time.
+    # Missing keys are left empty, 'checkState' is 'checked' (default) or 'unchecked'.
+    def _append(self, rows, parent):
+        n = len(rows)
+        self._reserve(n)
+        ids = np.arange(self.size, self.size + n)
+        self.size += n
+        if n == 0:
+            return ids
+        for column in self.numeric_columns:
+            self.values[column][ids], self.dash[column][ids] = parse_numbers(
+                [row.get(column, '') for row in rows])
+        for column in self.text_columns:
+            self.texts[column][ids] = [str(row.get(column, '')) for row in rows]
+        self.color[ids] = parse_colors([row.get('Color', (0, 0, 0)) for row in rows])
+        self.checked[ids] = [
+            row.get('checkState', 'checked') != 'unchecked' for row in rows
+        ]
+        self.parent[ids] = parent
+        self.alive[ids] = True
+        return ids
+
+    ## Adds a group at the end of the list and returns its id
+    def add_group(self, row):
+        gp = int(self._append([row], -1)[0])
+        self.groups.append(gp)
+        self.children[gp] = []
+        self.invalidate()
+        return gp
+
+    ## Adds points at the end of the group gp and returns their ids
+    def add_points(self, gp, rows):
+        ids = self._append(rows, gp)
+        self.children[gp].extend(ids.tolist())
+        self._add_terms(ids)
+        self.invalidate()
+        return ids
+
+    ## Removes groups (with their points) and points
+    def remove(self, ids):
+        ids = set(int(i) for i in ids)
+        groups = [i for i in ids if self.is_group(i)]
+        points = [i for i in ids if not self.is_group(i)]
+        for gp in set(int(self.parent[i]) for i in points):
+            self.children[gp] = [i for i in self.children[gp] if i not in ids]
+        self._subtract_terms(np.asarray(points, dtype=np.int64))
+        self.alive[points] = False
+        for gp in groups:
+            self.alive[self.children.pop(gp)] = False
+            self.alive[gp] = False
+        if groups:
+            self.groups = [gp for gp in self.groups if gp not in ids]
+        self.invalidate()
+
+    ## Moves points at the end of the group gp (or before position)
+    def move(self, ids, gp, position=None):
+        ids = [int(i) for i in ids if not self.is_group(i)]
+        moved = set(ids)
+        if position is not None:
+            position -= sum(1 for i in self.children[gp][:position] if i in moved)
+        for old_gp in set(int(self.parent[i]) for i in ids):
+            self.children[old_gp] = [
+                i for i in self.children[old_gp] if i not in moved
+            ]
+        if position is None:
+            self.children[gp].extend(ids)
+        else:
+            self.children[gp][position:position] = ids
+        ids = np.asarray(ids, dtype=np.int64)
+        self._subtract_terms(ids)
+        self.parent[ids] = gp
+        self._add_terms(ids)
+        self.invalidate()
+
+    ## Sorts the groups, and the points in each group, on a column
+    def sort(self, column, descending=False):
+        self.groups = self.sorted_ids(self.groups, column, descending)
+        for gp in self.groups:
+            self.children[gp] = self.sorted_ids(self.children[gp], column,
+                                                descending)
+        self.invalidate()
+
+    def sorted_ids(self, ids, column, descending=False):
+        ids = np.asarray(ids, dtype=np.int64)
+        if column in self.values:
+            key = self.values[column][ids]  # NaN are sorted last
+        elif column == 'Color':
+            key = self.color[ids].astype(np.int64).dot([65536, 256, 1])
+        else:
+            key = np.array(self.texts[column][ids], dtype=str)
+        order = np.argsort(key, kind='stable')
+        if descending:
+            order = order[::-1]
+        return ids[order].tolist()
+
+    def is_group(self, i):
+        return self.parent[i] < 0
+
+    ## Group of a point, or the group itself
+    def group_of(self, i):
+        return int(i) if self.is_group(i) else int(self.parent[i])
+
+    ## Row of a group in the list, or of a point in its group
+    def position(self, i):
+        if self._positions is None:
+            self._positions = {gp: row for row, gp in enumerate(self.groups)}
+            for gp in self.groups:
+                self._positions.update(
+                    (i, row) for row, i in enumerate(self.children[gp]))
+        return self._positions[int(i)]
+
+    ## Ids of all the points sorted by group, the first index of each group in them,
+    # and the groups (same order as self.groups). Used to compute all averages at once.
+    def group_index(self):
+        if self._group_index is None:
+            counts = np.array([len(self.children[gp]) for gp in self.groups],
+                              dtype=np.int64)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+            if len(self.groups) > 0:
+                ids = np.concatenate(
+                    [np.asarray(self.children[gp], dtype=np.int64) for gp in self.groups])
+            else:
+                ids = np.zeros(0, dtype=np.int64)
+            self._group_index = (ids, starts,
+                                 np.asarray(self.groups, dtype=np.int64))
+        return self._group_index
+
+    ## Ids of the points of the given groups (all groups by default), in tree order
+    def points(self, groups=None):
+        if groups is None:
+            return self.group_index()[0]
+        if len(groups) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(
+            [np.asarray(self.children[gp], dtype=np.int64) for gp in groups])
+
+    ## True if the cell is the Pc or Fc of a group averaged over several points,
+    # shown and saved with 4 decimals as '%.4f'
+    def is_fixed_average(self, i, column):
+        return column in ('Pc', 'Fc') and self.is_group(i) and \
+            self.sums[i, T_COUNT] >= 2 and self.sums[i, T_NO_ERRORS] == 0
+
+    ## Text of a cell as shown in the list
+    def text(self, i, column):
+        if column in self.values:
+            value = self.values[column][i]
+            if np.isnan(value):
+                return '-' if self.dash[column][i] else ''
+            if column in INTEGER_COLUMNS:
+                return str(int(value))
+            if self.is_fixed_average(i, column):
+                return '%.4f' % value
+            return str(float(value))
+        if column == 'Color':
+            return ''
+        return self.texts[column][i]
+
+    ## Value of a cell as written in a summary file: float, int, '' or '-' for numbers
+    # ('%.4f' text for the averages of groups, see is_fixed_average), str otherwise
+    def record_value(self, i, column):
+        if column in self.values:
+            value = self.values[column][i]
+            if np.isnan(value):
+                return '-' if self.dash[column][i] else ''
+            if column in INTEGER_COLUMNS:
+                return int(value)
+            if self.is_fixed_average(i, column):
+                return '%.4f' % value
+            return float(value)
+        if column == 'Color':
+            return tuple(int(c) for c in self.color[i])
+        return self.texts[column][i]
+
+    ## Dict of all columns of a group or a point, with 'Type', 'checkState' and 'Path'
+    def record(self, i):
+        row = {c: self.record_value(i, c) for c in self.columns + ['Path']}
+        row['Type'] = 'Group' if self.is_group(i) else 'Point'
+        row['checkState'] = 'checked' if self.checked[i] else 'unchecked'
+        return row
+
+    ## Sets a column for several ids, to one value or one value per id
+    def set_values(self, ids, column, values):
+        ids = np.asarray(ids, dtype=np.int64)
+        if np.ndim(values) == 0 or (column == 'Color' and np.ndim(values) == 1) \
+           or hasattr(values, 'getRgb'):
+            values = [values] * len(ids)
+        if len(ids) == 0:
+            return
+        if column in self.values:
+            self.set_numbers(ids, column, *parse_numbers(list(values)))
+        elif column == 'Color':
+            self.color[ids] = parse_colors(list(values))
+        else:
+            self.texts[column][ids] = [str(value) for value in values]
+
+    ## Sets a numeric column from arrays, dash marks the NaN to be shown as '-'
+    def set_numbers(self, ids, column, numbers, dash=False):
+        self.values[column][ids] = numbers
+        self.dash[column][ids] = dash
+        if column in AVERAGED_COLUMNS:
+            ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+            points = ids[self.parent[ids] >= 0]
+            self._subtract_terms(points)
+            self._add_terms(points)
+
+    ## Adds the terms of points to the sums of their group. A group without points
+    # takes the mean position of the first points it gets as reference.
+    def _add_terms(self, ids):
+        parents = self.parent[ids]
+        empty = np.unique(parents[self.sums[parents, T_COUNT] == 0])
+        if len(empty) > 0:
+            new = ids[np.isin(parents, empty)]
+            x, y = cartesian(self.values['Pc'][new], self.values['Fc'][new])
+            index = np.searchsorted(empty, self.parent[new])
+            counts = np.bincount(index, minlength=len(empty))
+            self.reference[empty, 0] = np.bincount(index, x, len(empty)) / counts
+            self.reference[empty, 1] = np.bincount(index, y, len(empty)) / counts
+        self.terms[ids] = average_terms(
+            *(self.values[c][ids] for c in AVERAGED_COLUMNS),
+            self.reference[parents, 0], self.reference[parents, 1])
+        np.add.at(self.sums, parents, self.terms[ids])
+
+    ## Takes the terms of points out of the sums of their group
+    def _subtract_terms(self, ids):
+        np.subtract.at(self.sums, self.parent[ids], self.terms[ids])
+        # an empty group starts again from exact zeros
+        self.sums[self.parent[ids][self.sums[self.parent[ids], T_COUNT] == 0]] = 0
+
+    ## Computes all the sums again from the values, which removes the rounding
+    # errors accumulated by adding and subtracting the terms of single points
+    # The mean position of each group becomes its reference point.
+    def update_sums(self):
+        ids, starts, groups = self.group_index()
+        self.sums[groups] = 0
+        if len(ids) == 0:
+            return
+        full = np.diff(np.append(starts, len(ids))) > 0
+        groups, starts = groups[full], starts[full]
+        x, y = cartesian(self.values['Pc'][ids], self.values['Fc'][ids])
+        counts = np.diff(np.append(starts, len(ids)))
+        self.reference[groups, 0] = np.add.reduceat(x, starts) / counts
+        self.reference[groups, 1] = np.add.reduceat(y, starts) / counts
+        parents = self.parent[ids]
+        self.terms[ids] = average_terms(
+            *(self.values[c][ids] for c in AVERAGED_COLUMNS),
+            self.reference[parents, 0], self.reference[parents, 1])
+        self.sums[groups] = np.add.reduceat(self.terms[ids], starts, axis=0)
+
+    ## Averages of groups as {column: (numbers, dash)} for Pc, Fc, Pc_err and Fc_err:
+    # '-' for an empty group, (0, 0, '-', '-') if a point has no error bars,
+    # the values of the point for a group of one point, and the weighted average otherwise.
+    # Pc and Fc of the average are kept with 4 decimals.
+    def averages(self, groups):
+        groups = np.asarray(groups, dtype=np.int64)
+        sums = self.sums[groups]
+        n = sums[:, T_COUNT]
+        no_errors = sums[:, T_NO_ERRORS] > 0
+        averaged = (n >= 2) & ~no_errors
+        single = (n == 1) & ~no_errors
+        results = {}
+        for column, average in zip(
+                AVERAGED_COLUMNS,
+                weighted_averages(sums[averaged],
+                                  *self.reference[groups[averaged]].T)):
+            numbers = np.full(len(groups), np.nan)
+            dash = n == 0
+            if column in ('Pc', 'Fc'):
+                numbers[no_errors] = 0.0
+                average = [float('%.4f' % value) for value in average]
+            else:
+                dash = dash | no_errors
+            numbers[averaged] = average
+            # the only point of a group
+            first = np.array(
+                [self.children[gp][0] for gp in groups[single]], dtype=np.int64)
+            numbers[single] = self.values[column][first]
+            dash[single] = self.dash[column][first]
+            results[column] = (numbers, dash)
+        return results
+
+    ## True for the groups of which a point has a position or a fraction that is not computable
+    def not_computable(self, groups):
+        sums = self.sums[np.asarray(groups, dtype=np.int64)]
+        return (sums[:, T_NOT_COMPUTABLE] > 0) & (sums[:, T_NO_ERRORS] == 0) & \
+            (sums[:, T_COUNT] >= 2)
+
+    def set_checked(self, ids, checked):
+        self.checked[np.asarray(ids, dtype=np.int64)] = checked
+
+
+class ArgandTreeModel(QtCore.QAbstractItemModel):
+    # ids of the items edited in the list, and name of the edited column
+    itemsEdited = QtCore.pyqtSignal(list, str)
+    # ids of the items checked or unchecked in the list
+    checkStateChanged = QtCore.pyqtSignal(list)
+    # ids of the groups that gave or received points by drag and drop
+    groupsChanged = QtCore.pyqtSignal(list)
+
+    MIME_TYPE = 'application/x-torricelli-argand-ids'
+
+    def __init__(self, store, parent=None):
+        super(ArgandTreeModel, self).__init__(parent)
+        self.store = store
+        # indexes of the columns that can be edited in the list
+        self.editable_columns = set()
+        self.group_icon = None
+
+    ## The internal id of an index is 0 for a group, 1 + id of its group for a point
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+        return self.createIndex(row, column, self.id_of(parent) + 1)
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == 0:
+            return QtCore.QModelIndex()
+        gp = index.internalId() - 1
+        return self.createIndex(self.store.position(gp), 0, 0)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return len(self.store.groups)
+        if parent.column() > 0 or parent.internalId() != 0:
+            return 0
+        return len(self.store.children[self.store.groups[parent.row()]])
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.store.columns)
+
+    ## Store id of the group or point of an index
+    def id_of(self, index):
+        if index.internalId() == 0:
+            return self.store.groups[index.row()]
+        return self.store.children[index.internalId() - 1][index.row()]
+
+    def index_of(self, i, column=0):
+        if self.store.is_group(i):
+            return self.createIndex(self.store.position(i), column, 0)
+        return self.createIndex(self.store.position(i), column,
+                                int(self.store.parent[i]) + 1)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self.id_of(index)
+        column = self.store.columns[index.column()]
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return self.store.text(i, column)
+        if role == QtCore.Qt.CheckStateRole and index.column() == 0:
+            return QtCore.Qt.Checked if self.store.checked[i] else QtCore.Qt.Unchecked
+        if role == QtCore.Qt.BackgroundRole and column == 'Color':
+            return QColor(*(int(c) for c in self.store.color[i]))
+        if role == QtCore.Qt.ToolTipRole and index.column() == 0:
+            return self.store.texts['Path'][i]
+        if role == QtCore.Qt.DecorationRole and index.column() == 0 \
+           and self.store.is_group(i):
+            return self.group_icon
+        return None
+
+    ## Edition in the list: the change is announced by itemsEdited or checkStateChanged
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid():
+            return False
+        i = self.id_of(index)
+        if role == QtCore.Qt.EditRole:
+            column = self.store.columns[index.column()]
+            self.store.set_values([i], column, value)
+            self.dataChanged.emit(index, index)
+            self.itemsEdited.emit([i], column)
+            return True
+        if role == QtCore.Qt.CheckStateRole:
+            # the points of a group follow its check state
+            self.set_checked([i] + self.store.children.get(i, []),
+                             value == QtCore.Qt.Checked)
+            self.checkStateChanged.emit([i])
+            return True
+        return False
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        flags = QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsUserCheckable
+        if self.store.is_group(self.id_of(index)):
+            return flags | QtCore.Qt.ItemIsDropEnabled
+        if index.column() in self.editable_columns:
+            flags |= QtCore.Qt.ItemIsEditable
+        return flags | QtCore.Qt.ItemIsDragEnabled
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.store.columns[section]
+        return None
+
+    ## Changes of the data that do not come from the list: the views are refreshed, nothing is announced
+
+    def add_group(self, row):
+        n = len(self.store.groups)
+        self.beginInsertRows(QtCore.QModelIndex(), n, n)
+        gp = self.store.add_group(row)
+        self.endInsertRows()
+        return gp
+
+    def add_points(self, gp, rows):
+        n = len(self.store.children[gp])
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int64)
+        self.beginInsertRows(self.index_of(gp), n, n + len(rows) - 1)
+        ids = self.store.add_points(gp, rows)
+        self.endInsertRows()
+        return ids
+
+    ## Removes groups (with their points) and points, one block of consecutive rows at a time.
+    # The views are reset instead when the rows to remove are scattered in many blocks.
+    def remove(self, ids):
+        ids = set(int(i) for i in ids)
+        groups = set(i for i in ids if self.store.is_group(i))
+        points = [
+            i for i in ids
+            if not self.store.is_group(i) and int(self.store.parent[i]) not in groups
+        ]
+        # all rows are found before removing anything, from the last to the first
+        blocks = []
+        for gp in set(int(self.store.parent[i]) for i in points):
+            rows = sorted((self.store.position(i) for i in points
+                           if self.store.parent[i] == gp), reverse=True)
+            blocks += [(self.index_of(gp), gp, first, last)
+                       for first, last in self._blocks(rows)]
+        rows = sorted((self.store.position(gp) for gp in groups), reverse=True)
+        blocks += [(QtCore.QModelIndex(), None, first, last)
+                   for first, last in self._blocks(rows)]
+        if len(blocks) > MAX_REMOVED_BLOCKS:
+            self.beginResetModel()
+            self.store.remove(ids)
+            self.endResetModel()
+            return
+        for parent, gp, first, last in blocks:
+            self.beginRemoveRows(parent, first, last)
+            if gp is None:
+                self.store.remove(self.store.groups[first:last + 1])
+            else:
+                self.store.remove(self.store.children[gp][first:last + 1])
+            self.endRemoveRows()
+
+    ## (first, last) of the blocks of consecutive rows, from the rows in decreasing order
+    @staticmethod
+    def _blocks(rows):
+        blocks = []
+        for row in rows:
+            if blocks and blocks[-1][0] == row + 1:
+                blocks[-1][0] = row
+            else:
+                blocks.append([row, row])
+        return blocks
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self.endResetModel()
+
+    def move(self, ids, gp, position=None):
+        self._change_layout(lambda: self.store.move(ids, gp, position))
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self._change_layout(lambda: self.store.sort(
+            self.store.columns[column], order == QtCore.Qt.DescendingOrder))
+
+    ## Reorders the rows while keeping the selection and the expanded groups of the views
+    def _change_layout(self, change):
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        targets = [(self.id_of(index), index.column()) for index in old]
+        change()
+        new = [
+            self.index_of(i, column) if self.store.alive[i] else QtCore.QModelIndex()
+            for i, column in targets
+        ]
+        self.changePersistentIndexList(old, new)
+        self.layoutChanged.emit()
+
+    def set_values(self, ids, column, values):
+        self.store.set_values(ids, column, values)
+        self.refresh(ids, self.store.columns.index(column))
+
+    def set_numbers(self, ids, column, numbers, dash=False):
+        self.store.set_numbers(ids, column, numbers, dash)
+        self.refresh(ids, self.store.columns.index(column))
+
+    def set_checked(self, ids, checked):
+        self.store.set_checked(ids, checked)
+        self.refresh(ids, 0)
+
+    ## Redraws a column (all by default) of the rows of the given ids
+    def refresh(self, ids, column=None):
+        first = 0 if column is None else column
+        last = len(self.store.columns) - 1 if column is None else column
+        for i in ids:
+            self.dataChanged.emit(self.index_of(i, first), self.index_of(i, last))
+
+    ## Drag and drop moves points between groups
+
+    def supportedDropActions(self):
+        return QtCore.Qt.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        ids = []
+        for index in indexes:
+            i = self.id_of(index)
+            if not self.store.is_group(i) and i not in ids:
+                ids.append(i)
+        data = QtCore.QMimeData()
+        data.setData(self.MIME_TYPE,
+                     QtCore.QByteArray(' '.join(map(str, ids)).encode()))
+        return data
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if not data.hasFormat(self.MIME_TYPE) or not parent.isValid():
+            return False
+        gp = self.store.group_of(self.id_of(parent))
+        ids = [
+            int(i) for i in bytes(data.data(self.MIME_TYPE)).decode().split()
+            if self.store.alive[int(i)]
+        ]
+        if not ids:
+            return False
+        changed = set(int(self.store.parent[i]) for i in ids) | {gp}
+        self.move(ids, gp, row if row >= 0 and parent.internalId() == 0 else None)
+        self.groupsChanged.emit(sorted(changed))
+        return True
+
+    ## The points were moved by dropMimeData: the view must not remove the dragged rows
+    def removeRows(self, row, count, parent=QtCore.QModelIndex()):
+        return False
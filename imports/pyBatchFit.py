@@ -0,0 +1,397 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+
+## Fits of many electron-yield data sets (the slices of an angular file times the
+# components) in a pool of processes. A task only holds arrays and numbers: the
+# theory, sampled once on the experimental energies with the sigma and Delta E of
+# the reflectivity fit, is shared by all the tasks and no worker needs the GUI.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import lmfit
+import numpy as np
+from scipy.stats import qmc
+
+from pyFit import fit_yield, solve_yield_linear, yield_residuals
+
+
+## lmfit.Parameters from a list of (name, value, vary)
+def make_parameters(specification):
+    params = lmfit.Parameters()
+    for name, value, vary in specification:
+        params.add(name, value=value, vary=vary)
+    return params
+
+
+## A yield fit task.
+# key: identifies the data set, e.g. (slice, component), and is returned with the result
+# params: list of (name, value, vary) of Fc, Pc, N, Delta, Sr and gamma
+# basis: (4, n_points) sampled pyModel.YieldBasis; y, sigma: yield and its errors
+# Si, Psi: used unless gamma is free; ndp: pyModel.NonDipolarModel of the data set, or None
+# linear: use the closed-form solver when Fc and Pc are free
+def yield_fit_task(key, params, basis, y, sigma, Si, Psi, ndp=None,
+                   linear=False):
+    return {
+        'key': key,
+        'params': params,
+        'basis': basis,
+        'y': y,
+        'sigma': sigma,
+        'Si': Si,
+        'Psi': Psi,
+        'ndp': ndp,
+        'linear': linear
+    }
+
+
+## Fc and Pc of a result, with a negative Fc turned into -Fc and Pc + 1/2
+def _coherent_position(result):
+    Fc, Pc = result['values']['Fc'], result['values']['Pc']
+    if Fc < 0:
+        Fc, Pc = -Fc, Pc + 0.5
+    return Fc, Pc % 1
+
+
+## Runs one task, in any process.
+# Returns a dict of plain numbers: 'key', 'success', 'message' and, for a successful fit,
+# 'values' and 'stderr' (dicts by parameter name, stderr None if unknown), 'chisqr', 'redchi',
+# 'R_squared', 'nfev' and 'ndp', the (Sr, Si, Psi, Q_0, Q_H) at the fitted gamma (None without ndp).
+# The values have Fc >= 0 and Pc in [0, 1).
+def run_yield_fit(task):
+    params = make_parameters(task['params'])
+    args = (task['basis'], task['y'], task['sigma'], task['Si'], task['Psi'],
+            task['ndp'])
+    try:
+        result = fit_yield(params, *args, linear=task['linear'])
+    except (np.linalg.LinAlgError, ValueError) as err:
+        return {'key': task['key'], 'success': False, 'message': str(err)}
+    if result.success is not True:
+        return {
+            'key': task['key'],
+            'success': False,
+            'message': result.message
+        }
+
+    N = result.params['N'].value
+    y_normalized = task['y'] / N
+    model = y_normalized - yield_residuals(result.params, *
+                                           args) * task['sigma'] / N
+    ss_tot = np.sum((y_normalized - np.mean(y_normalized))**2)
+    ss_res = np.sum((y_normalized - model)**2)
+    ndp = None
+    if task['ndp'] is not None:
+        ndp = tuple(
+            float(x) for x in task['ndp'](result.params['gamma'].value))
+    fit = {
+        'key': task['key'],
+        'success': True,
+        'message': result.message,
+        'values': dict((name, float(p.value))
+                       for name, p in result.params.items()),
+        'stderr': dict((name, None if p.stderr is None else float(p.stderr))
+                       for name, p in result.params.items()),
+        'chisqr': float(result.chisqr),
+        'redchi': float(result.redchi),
+        'R_squared': float(1 - ss_res / ss_tot),
+        'nfev': int(result.nfev),
+        'ndp': ndp
+    }
+    # a negative Fc is the same coherent position as -Fc at Pc + 1/2
+    Fc, Pc = _coherent_position(fit)
+    fit['values'].update(Fc=Fc, Pc=Pc)
+    return fit
+
+
+## Runs the tasks in a pool of max_workers processes (one per CPU by default).
+# Generator: the results are yielded as soon as each fit completes, not in the order of the tasks.
+# With max_workers=1 the fits run one after the other in the calling process.
+def run_yield_fits(tasks, max_workers=None):
+    if max_workers is None:
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+    if max_workers <= 1:
+        for task in tasks:
+            yield run_yield_fit(task)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_yield_fit, task) for task in tasks]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:  # the caller stopped early: do not start the remaining fits
+            for future in futures:
+                future.cancel()
+
+
+# Default number of start points of a multi-start fit
+MULTISTART_STARTS = 16
+# Start points of gamma are drawn in gamma0 * (1 -/+ MULTISTART_GAMMA_SPREAD)
+MULTISTART_GAMMA_SPREAD = 0.5
+# Two fits reached the same optimum if their Fc and Pc (modulo 1) differ by less than
+# MULTISTART_TOLERANCE and their chi^2 by less than MULTISTART_TOLERANCE in relative terms
+MULTISTART_TOLERANCE = 1e-3
+
+
+## Start points of a multi-start fit: a Latin hypercube over Fc in [0, 1), Pc in [0, 1)
+# and gamma around its start value, for those of them which are free.
+# Returns a list of (n_starts) dicts of start values, by name.
+def multistart_points(params, n_starts=MULTISTART_STARTS, seed=None):
+    bounds = []
+    for name, value, vary in params:
+        if not vary:
+            continue
+        if name in ('Fc', 'Pc'):
+            bounds.append((name, 0.0, 1.0))
+        elif name == 'gamma':
+            bounds.append((name, value * (1 - MULTISTART_GAMMA_SPREAD),
+                           value * (1 + MULTISTART_GAMMA_SPREAD)))
+    if not bounds:
+        return [{}]
+    unit = qmc.LatinHypercube(d=len(bounds), seed=seed).random(n_starts)
+    return [
+        dict((name, low + u * (high - low))
+             for (name, low, high), u in zip(bounds, point))
+        for point in unit
+    ]
+
+
+## Expands a yield_fit_task into one task per start point, with the keys (key, i_start)
+def multistart_tasks(task, n_starts=MULTISTART_STARTS, seed=None):
+    tasks = []
+    for i, start in enumerate(
+            multistart_points(task['params'], n_starts, seed)):
+        copy = dict(task)
+        copy['key'] = (task['key'], i)
+        copy['params'] = [(name, start.get(name, value), vary)
+                          for name, value, vary in task['params']]
+        tasks.append(copy)
+    return tasks
+
+
+## Best of the results of the starts of one data set, as a result of run_yield_fit
+# (with Fc >= 0 and Pc in [0, 1), the starts may reach equivalent optima), with 'n_starts', 'n_converged' and 'n_same': the number of converged starts which
+# reached the same optimum as the best one (itself included).
+def best_of_starts(key, results):
+    converged = [result for result in results if result['success']]
+    if not converged:
+        best = dict(results[0])
+        best['key'] = key
+        best['message'] = 'None of the %i starts converged: %s' % (
+            len(results), results[0]['message'])
+        best.update({'n_starts': len(results), 'n_converged': 0, 'n_same': 0})
+        return best
+    best = dict(min(converged, key=lambda result: result['chisqr']))
+    Fc, Pc = _coherent_position(best)
+    n_same = 0
+    for result in converged:
+        other_Fc, other_Pc = _coherent_position(result)
+        if (abs(result['chisqr'] - best['chisqr']) <=
+                MULTISTART_TOLERANCE * best['chisqr']
+                and abs(other_Fc - Fc) < MULTISTART_TOLERANCE
+                and abs((other_Pc - Pc + 0.5) % 1 - 0.5) < MULTISTART_TOLERANCE):
+            n_same += 1
+    best['key'] = key
+    best['values'] = dict(best['values'], Fc=Fc, Pc=Pc)
+    best.update({
+        'n_starts': len(results),
+        'n_converged': len(converged),
+        'n_same': n_same
+    })
+    return best
+
+
+## Multi-start fits of the tasks: every task is fitted from n_starts start points
+# (multistart_points), all the local fits running concurrently as in run_yield_fits.
+# Generator of the best_of_starts result of each task, as soon as all its starts are done.
+def run_multistart_fits(tasks, n_starts=MULTISTART_STARTS, seed=None,
+                        max_workers=None):
+    streams = np.random.SeedSequence(seed).spawn(len(tasks))
+    expanded = []
+    for task, stream in zip(tasks, streams):
+        expanded += multistart_tasks(task, n_starts,
+                                     np.random.default_rng(stream))
+    n_expected = {}  # number of starts of each task
+    for task in expanded:
+        n_expected[task['key'][0]] = n_expected.get(task['key'][0], 0) + 1
+    pending = dict((key, []) for key in n_expected)
+    for result in run_yield_fits(expanded, max_workers):
+        key = result['key'][0]
+        pending[key].append(result)
+        if len(pending[key]) == n_expected[key]:
+            yield best_of_starts(key, pending.pop(key))
+
+
+# Number of replicates refitted by one task of the bootstrap. The random streams belong to
+# the tasks, not to the processes: the samples do not depend on the number of workers.
+BOOTSTRAP_CHUNK_SIZE = 50
+# Probability of the confidence intervals of bootstrap_summary (1 sigma)
+BOOTSTRAP_CONFIDENCE = 0.6827
+
+
+## Tasks of a parametric bootstrap of a yield fit, to be run by run_bootstrap.
+# Each replicate refits, from the best fit, the yield perturbed by a Gaussian noise of
+# standard deviation noise, with the basis sampled at a sigma and a Delta E drawn around
+# those of the reflectivity fit (with their standard errors).
+# params: list of (name, value, vary) at the best fit
+# yield_basis: pyModel.YieldBasis; energies: experimental energies (without Delta E)
+# refl_sigma, delta_E: (value, standard error) of the reflectivity fit
+# y, sigma, Si, Psi, ndp, linear: as in yield_fit_task
+# seed: seed of the numpy.random.SeedSequence from which the streams of the tasks are spawned
+def bootstrap_tasks(params, yield_basis, energies, refl_sigma, delta_E, y,
+                    sigma, noise, Si, Psi, ndp=None, linear=False,
+                    n_replicates=1000, seed=None):
+    sizes = [BOOTSTRAP_CHUNK_SIZE] * (n_replicates // BOOTSTRAP_CHUNK_SIZE)
+    if n_replicates % BOOTSTRAP_CHUNK_SIZE:
+        sizes.append(n_replicates % BOOTSTRAP_CHUNK_SIZE)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = []
+    for i, (size, stream) in enumerate(zip(sizes, streams)):
+        task = yield_fit_task(i, params, None, y, sigma, Si, Psi, ndp, linear)
+        task.update({
+            'yield_basis': yield_basis,
+            'energies': np.asarray(energies, dtype=float),
+            'refl_sigma': refl_sigma,
+            'delta_E': delta_E,
+            'noise': noise,
+            'n_replicates': size,
+            'stream': stream
+        })
+        tasks.append(task)
+    return tasks
+
+
+## Runs one bootstrap task, in any process.
+# Returns a dict with 'key', 'names' of the free parameters, 'samples' (n_converged, n_names)
+# of their fitted values and 'n_failed'. A negative Fc is stored as -Fc with Pc + 1/2, and Pc in [0, 1).
+def run_bootstrap_chunk(task):
+    rng = np.random.default_rng(task['stream'])
+    names = [name for name, value, vary in task['params'] if vary]
+    convolution = task['yield_basis'].convolution
+    energies = task['energies']
+    sampled = task['yield_basis'].sampled(task['refl_sigma'][0],
+                                          energies + task['delta_E'][0])
+    samples = []
+    n_failed = 0
+    for _ in range(task['n_replicates']):
+        y = task['y'] + task['noise'] * rng.standard_normal(len(task['y']))
+        refl_sigma = abs(task['refl_sigma'][0] +
+                         task['refl_sigma'][1] * rng.standard_normal())
+        delta_E = task['delta_E'][0] + task['delta_E'][1] * rng.standard_normal()
+        try:
+            if task['refl_sigma'][1] == 0 and task['delta_E'][1] == 0:
+                basis = sampled
+            else:
+                curves = convolution.convolve(task['yield_basis'].curves,
+                                              refl_sigma)
+                basis = convolution.sample_rows(
+                    curves,
+                    np.broadcast_to(energies + delta_E,
+                                    (len(curves), len(energies))))
+            values = _refit_replicate(task, basis, y)
+        except (np.linalg.LinAlgError, ValueError):
+            values = None
+        if values is None:
+            n_failed += 1
+            continue
+        if values.get('Fc', 0) < 0:
+            values['Fc'] = -values['Fc']
+            values['Pc'] = values.get('Pc', 0) + 0.5
+        if 'Pc' in values:
+            values['Pc'] %= 1
+        samples.append([values[name] for name in names])
+    return {
+        'key': task['key'],
+        'names': names,
+        'samples': np.array(samples, dtype=float).reshape(-1, len(names)),
+        'n_failed': n_failed
+    }
+
+
+## Fitted values (dict by name) of one bootstrap replicate, None if the fit did not converge.
+# Without free gamma, the closed-form solution is used directly: building lmfit.Parameters
+# and their covariance would cost more than the solution itself.
+def _refit_replicate(task, basis, y):
+    start = dict((name, (value, vary)) for name, value, vary in task['params'])
+    if task['linear'] and start['Fc'][1] and start['Pc'][1] and not start['gamma'][1]:
+        solution = solve_yield_linear(
+            basis, y, task['sigma'], task['Si'], task['Psi'],
+            N=None if start['N'][1] else start['N'][0],
+            Sr=None if start['Sr'][1] else start['Sr'][0])
+        return dict(zip(solution['names'], solution['values']))
+    result = fit_yield(make_parameters(task['params']), basis, y,
+                       task['sigma'], task['Si'], task['Psi'], task['ndp'],
+                       linear=task['linear'])
+    if result.success is not True:
+        return None
+    return dict((name, p.value) for name, p in result.params.items())
+
+
+## Runs the bootstrap tasks in a pool of max_workers processes, as run_yield_fits.
+# Generator of the results of run_bootstrap_chunk, as soon as each task completes.
+def run_bootstrap(tasks, max_workers=None):
+    if max_workers is None:
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+    if max_workers <= 1:
+        for task in tasks:
+            yield run_bootstrap_chunk(task)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_bootstrap_chunk, task) for task in tasks]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+## Statistics of bootstrap samples, (n_samples, len(names)).
+# For each name: 'mean', 'std' and the central confidence interval ('low', 'high').
+# Pc is periodic: its mean is the circular mean, and its deviations are taken in [-1/2, 1/2)
+# around it, so that samples on both sides of Pc = 0 are not spread over the whole period.
+# 'correlation' is the correlation coefficient of Fc and Pc (NaN if one of them is fixed).
+def bootstrap_summary(samples, names, confidence=BOOTSTRAP_CONFIDENCE):
+    samples = np.array(samples, dtype=float).reshape(-1, len(names))
+    if 'Pc' in names:
+        j = names.index('Pc')
+        angle = np.angle(np.mean(np.exp(2j * np.pi * samples[:, j])))
+        center = (angle / (2 * np.pi)) % 1
+        samples[:, j] = center + (samples[:, j] - center + 0.5) % 1 - 0.5
+    tails = 100 * (1 - confidence) / 2
+    summary = {'n_samples': len(samples), 'confidence': confidence}
+    for j, name in enumerate(names):
+        low, high = np.percentile(samples[:, j], [tails, 100 - tails])
+        summary[name] = {
+            'mean': np.mean(samples[:, j]),
+            'std': np.std(samples[:, j], ddof=1),
+            'low': low,
+            'high': high
+        }
+    if 'Pc' in names:  # back in [0, 1), the interval may then wrap around Pc = 0
+        for key in ('mean', 'low', 'high'):
+            summary['Pc'][key] %= 1
+    summary['correlation'] = np.nan
+    if 'Fc' in names and 'Pc' in names:
+        summary['correlation'] = np.corrcoef(
+            samples[:, names.index('Fc')], samples[:, names.index('Pc')])[0, 1]
+    return summary
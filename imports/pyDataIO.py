@@ -0,0 +1,206 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+
+## Import stage of the experimental reflectivity and electron yield.
+# The files are handled as whole columns: the normalization to I0, the sum of
+# the fit components and the check of the photon energies are array operations.
+# Parsed files are kept in a ParsedFileCache for the whole session, so that
+# switching between the slices of an angular file does not read it again.
+
+import os
+import numpy as np
+
+# Largest difference (eV) accepted between the photon energies of the reflectivity and yield files
+ENERGY_TOLERANCE = 1e-1
+
+
+## Columns of the signal and of its error of the CasaXPS components.
+# Component c is stored in the column 1 + 2*c, its standard deviation in the next one.
+def component_columns(components):
+    signal = 1 + 2 * np.asarray(components, dtype=int).ravel()
+    return signal, signal + 1
+
+
+## Indices of the rows whose photon energies differ by more than tolerance
+def mismatched_energy_rows(energies_refl, energies_ey,
+                           tolerance=ENERGY_TOLERANCE):
+    return np.flatnonzero(
+        np.abs(np.asarray(energies_refl) - np.asarray(energies_ey)) > tolerance)
+
+
+## Normalizes the reflectivity and the sum of the yield components to I0.
+# data_r:     (n, 3) energy, reflectivity, I0
+# data_ey:    (n, n_columns) the CasaXPS yield, as columns signal/error of each component
+# components: indices of the components to sum
+# Both signals are divided by I0 and multiplied by its average. The error of the
+# reflectivity is estimated as sqrt(refl_normalised), the error of the yield is
+# the normalized quadrature sum of the CasaXPS errors of the components.
+# Returns a dict of the five (n,) experimental arrays.
+def normalize_to_I0(data_r, data_ey, components):
+    data_r = np.asarray(data_r, dtype=float)
+    data_ey = np.asarray(data_ey, dtype=float)
+    signal, error = component_columns(components)
+    if np.any(error >= data_ey.shape[-1]):
+        raise IndexError('The component number you asked for does not exist!')
+
+    scale = np.mean(data_r[:, 2]) / data_r[:, 2]
+    refl = data_r[:, 1] * scale
+    return {
+        'energy': data_r[:, 0].copy(),
+        'refl': refl,
+        'refl_error': np.sqrt(refl),
+        'ey': data_ey[:, signal].sum(axis=1) * scale,
+        'ey_error': np.sqrt(np.sum(data_ey[:, error]**2, axis=1)) * scale
+    }
+
+
+## A string identifying the current state of a file: absolute path, size and modification time
+def file_signature(path):
+    stat = os.stat(path)
+    return '%s|%i|%i' % (os.path.abspath(path), stat.st_size,
+                         stat.st_mtime_ns)
+
+
+## Parsed files of the session, keyed by path.
+# A file is parsed again only if its size or modification time has changed.
+class ParsedFileCache(object):
+
+    def __init__(self):
+        self.entries = {}
+
+    ## Content of the file, as returned by reader(path)
+    def load(self, path, reader):
+        key = (os.path.abspath(path), reader)
+        signature = file_signature(path)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != signature:
+            entry = (signature, reader(path))
+            self.entries[key] = entry
+        return entry[1]
+
+    def clear(self):
+        self.entries.clear()
+
+
+## Error in an experimental file, with the number (from 1) of the offending line
+class DataFileError(ValueError):
+
+    def __init__(self, path, line_number, message):
+        ValueError.__init__(self,
+                            '%s, line %i: %s' % (path, line_number, message))
+        self.path = path
+        self.line_number = line_number
+
+
+## Parses the numerical rows of a file into one contiguous (n_rows, n_columns) float64 block.
+# lines: the text lines of the body, the first one being the line first_line_number of the file
+# n_columns: expected number of values per row, any consistent number if None
+# Blank lines are skipped. All the numbers are converted at once by the C tokenizer of
+# np.loadtxt; the rows are only checked one by one if it fails, to report the first
+# malformed line.
+def parse_rows(lines, first_line_number, path, n_columns=None):
+    if not any(line.strip() for line in lines):
+        return np.empty((0, n_columns or 0))
+    try:
+        values = np.loadtxt(lines, dtype=float, ndmin=2)
+    except ValueError:
+        values = None
+    if values is None or (n_columns is not None
+                          and values.shape[1] != n_columns):
+        if n_columns is None:
+            n_columns = len(next(line for line in lines if line.strip()).split())
+        _raise_malformed_row(lines, first_line_number, path, n_columns)
+    return values
+
+
+def _raise_malformed_row(lines, first_line_number, path, n_columns):
+    for line_number, line in enumerate(lines, first_line_number):
+        fields = line.split()
+        if not fields:
+            continue
+        if len(fields) != n_columns:
+            raise DataFileError(
+                path, line_number, '%i values instead of %i: %r' %
+                (len(fields), n_columns, line.strip()))
+        for field in fields:
+            try:
+                float(field)
+            except ValueError:
+                raise DataFileError(path, line_number,
+                                    'could not convert %r to a number' % field)
+    raise DataFileError(path, first_line_number, 'could not read the data')
+
+
+## Reads a file in one pass: (header lines, body lines)
+def _read_lines(path, n_header):
+    with open(path, 'r') as data_file:
+        lines = data_file.read().splitlines()
+    if len(lines) < n_header:
+        raise DataFileError(path, len(lines),
+                            'the header should have %i lines' % n_header)
+    return lines[:n_header], lines[n_header:]
+
+
+## Experimental reflectivity (.refl): one header line, then energy, reflectivity, I0
+def read_refl_file(path):
+    header, body = _read_lines(path, 1)
+    return parse_rows(body, 2, path, 3)
+
+
+## Slice number to angle of a slice to angles file (.ang): five header lines, then slice, angle.
+# Returns (info, slice_to_angle): the second and third lines of the header, and a dict.
+def read_angles_file(path):
+    header, body = _read_lines(path, 5)
+    table = parse_rows(body, 6, path, 2)
+    slice_to_angle = dict(zip(table[:, 0].astype(int).tolist(),
+                              table[:, 1].tolist()))
+    return header[1] + '\n' + header[2], slice_to_angle
+
+
+## Electron yield exported by CasaXPS (.txt): the column names in the third
+# line, then the energy (or data set number) and a signal/error pair per component.
+# A file of the angular mode holds all the slices one after the other.
+class YieldTable(object):
+
+    def __init__(self, column_names, data):
+        self.column_names = column_names
+        self.data = data  # (n_rows, n_columns), C-contiguous
+        self._slices = None
+
+    ## (n_slices, n_energies, n_columns) view of the data, without copy.
+    # Raises ValueError if the number of rows is not a multiple of n_energies.
+    def slices(self, n_energies):
+        if self._slices is None or self._slices.shape[1] != n_energies:
+            if n_energies <= 0 or len(self.data) % n_energies != 0:
+                raise ValueError(
+                    'Could not calculate the number of slices: %i rows for %i photon energies.'
+                    % (len(self.data), n_energies))
+            self._slices = self.data.reshape(-1, n_energies,
+                                             self.data.shape[1])
+        return self._slices
+
+
+## Reads a CasaXPS yield file (three header lines) into a YieldTable
+def read_yield_file(path):
+    header, body = _read_lines(path, 3)
+    return YieldTable(header[2].split('\t'), parse_rows(body, 4, path))
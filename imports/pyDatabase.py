@@ -0,0 +1,185 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+## Compiled access to the tabulated data of imports/Databases.
+# The text files are parsed once into NumPy arrays and stored in a binary
+# cache (npz) next to them. The cache is rebuilt only when one of the source
+# files has changed (size or modification time).
+
+import os
+import csv
+import glob
+import numpy as np
+
+# Increase when the layout of the cache changes
+CACHE_FORMAT = 1
+
+
+## Converts a coordinate of the AtomCoordinates files ('.5', '-.125', '1/3.', '11/24.0') to a float, without eval()
+def parse_fractional_coordinate(text):
+    numerator, slash, denominator = str(text).strip().partition('/')
+    if slash:
+        return float(numerator) / float(denominator)
+    return float(numerator)
+
+
+## Reads every imports/Databases/Lattices/AtomCoordinates_<cell>.csv once.
+# Returns a dict: cell type -> (coordinates, species)
+# coordinates: (n_atoms, 3) fractional coordinates in units of (a, b, c)
+# species:     (n_atoms,) integer index, 0 for the element A and 1 for the element B
+def load_lattice_bases(lattices_folder):
+    bases = {}
+    for fname in glob.glob(
+            os.path.join(lattices_folder, 'AtomCoordinates_*.csv')):
+        cell_type = os.path.splitext(
+            os.path.basename(fname))[0][len('AtomCoordinates_'):]
+        coordinates = []
+        species = []
+        with open(fname, 'r') as atomPos:
+            spamreader = csv.DictReader(atomPos, delimiter=',')
+            for row in spamreader:
+                coordinates.append([
+                    parse_fractional_coordinate(row['x (a)']),
+                    parse_fractional_coordinate(row['y (b)']),
+                    parse_fractional_coordinate(row['z (c)'])
+                ])
+                species.append(ord(str(row['Element']).strip()) - ord('A'))
+        bases[cell_type] = (np.array(coordinates, dtype=float).reshape(-1, 3),
+                            np.array(species, dtype=int))
+    return bases
+
+
+## Linear interpolation which, like scipy.interpolate.interp1d, refuses to extrapolate
+def interpolate_in_range(x, xp, fp):
+    x = np.asarray(x, dtype=float)
+    if np.any(x < xp[0]):
+        raise ValueError("A value in x_new is below the interpolation range.")
+    if np.any(x > xp[-1]):
+        raise ValueError("A value in x_new is above the interpolation range.")
+    return np.interp(x, xp, fp)
+
+
+## Scattering factors f0(1/2d), f1(E), f2(E) and the Zywietz mean-square displacements
+# All look-ups are vectorized: the abscissa may be a scalar or an array.
+class ScatteringFactorDatabase(object):
+
+    def __init__(self, database_folder, cache_file=None):
+        self.database_folder = database_folder
+        if cache_file is None:
+            cache_file = os.path.join(database_folder,
+                                      'scattering_factors_cache.npz')
+        self.cache_file = cache_file
+        self.arrays = {}
+        self.load()
+
+    ## List of the source files the cache depends on
+    def source_files(self):
+        return [os.path.join(self.database_folder, 'f0.csv')]\
+          + sorted(glob.glob(os.path.join(self.database_folder, 'f1 and f2', '*.nff')))\
+          + sorted(glob.glob(os.path.join(self.database_folder, 'DW', 'DW_Zywietz_*.csv')))
+
+    ## A string identifying the current state of the source files
+    def signature(self):
+        entries = ['format=%i' % CACHE_FORMAT]
+        for fname in self.source_files():
+            stat = os.stat(fname)
+            entries.append('%s|%i|%i' % (os.path.relpath(
+                fname, self.database_folder), stat.st_size, stat.st_mtime_ns))
+        return '\n'.join(entries)
+
+    ## Loads the cache if it is up to date, rebuilds it otherwise
+    def load(self):
+        signature = self.signature()
+        try:
+            with np.load(self.cache_file, allow_pickle=False) as cache:
+                if str(cache['signature']) == signature:
+                    self.arrays = {
+                        key: cache[key]
+                        for key in cache.files if key != 'signature'
+                    }
+                    return
+        except (IOError, OSError, KeyError, ValueError):
+            pass  # no cache yet, or unreadable: rebuild it
+        self.arrays = self.parse_source_files()
+        try:
+            np.savez(self.cache_file, signature=np.array(signature),
+                     **self.arrays)
+        except (IOError, OSError):
+            print('Could not write the database cache', self.cache_file)
+
+    ## Parses all the text files into a flat dict of arrays
+    def parse_source_files(self):
+        arrays = {}
+        with open(os.path.join(self.database_folder, 'f0.csv'), 'r') as f0File:
+            spamreader = csv.reader(f0File, delimiter=',')
+            header = next(spamreader)
+            table = np.array([[float(val) if val != '' else np.nan
+                               for val in row] for row in spamreader])  # a few values are missing
+        arrays['f0_x'] = table[:, 0]  # 1/2dhkl
+        for col, element in enumerate(header[1:], start=1):
+            arrays['f0_' + element] = table[:, col]
+
+        for fname in glob.glob(
+                os.path.join(self.database_folder, 'f1 and f2', '*.nff')):
+            element = os.path.splitext(os.path.basename(fname))[0].capitalize()
+            table = np.loadtxt(fname, skiprows=1, usecols=(0, 1, 2))
+            table = table[np.argsort(table[:, 0], kind='mergesort')]  # a few edges are not sorted
+            arrays['nff_E_' + element] = table[:, 0]
+            arrays['nff_f1_' + element] = table[:, 1]
+            arrays['nff_f2_' + element] = table[:, 2]
+
+        for fname in glob.glob(
+                os.path.join(self.database_folder, 'DW', 'DW_Zywietz_*.csv')):
+            species = os.path.splitext(os.path.basename(fname))[0].split('_')[-1]
+            table = np.loadtxt(fname, delimiter=',', skiprows=1)
+            arrays['zywietz_T_' + species] = table[:, 0]
+            arrays['zywietz_u2_' + species] = table[:, 1]
+        return arrays
+
+    def _table(self, key, element):
+        try:
+            return self.arrays[key + element]
+        except KeyError:
+            raise KeyError('No ' + key.rstrip('_') + ' data for ' + str(element))
+
+    ## Atomic form factor f0 for the given 1/2d_hkl (Ang-1)
+    def f0(self, element, inv_2d):
+        return interpolate_in_range(inv_2d, self.arrays['f0_x'],
+                                    self._table('f0_', element))
+
+    ## Anomalous scattering factors (f1, f2) at the given photon energy (eV)
+    def f1f2(self, element, energy):
+        E = self._table('nff_E_', element)
+        return interpolate_in_range(energy, E, self._table('nff_f1_', element)),\
+               interpolate_in_range(energy, E, self._table('nff_f2_', element))
+
+    def f1(self, element, energy):
+        return self.f1f2(element, energy)[0]
+
+    def f2(self, element, energy):
+        return self.f1f2(element, energy)[1]
+
+    ## Mean-square displacement <u^2> (in 1e-2 Ang**2) of the species ('Si' or 'C') of 6H-SiC, from Zywietz et al.
+    def zywietz_u2(self, species, temperature):
+        return interpolate_in_range(temperature,
+                                    self._table('zywietz_T_', species),
+                                    self._table('zywietz_u2_', species))
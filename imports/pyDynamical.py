@@ -0,0 +1,166 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+## Dynamical diffraction theory of a single (sample or monochromator) crystal.
+# All functions work on whole arrays of photon energies at once: no Python loop
+# over the theoretical energy grid is needed.
+# Notation follows Zegenhagen, Surf. Sci. Rep. 18 (1993) 199 and the book
+# "The X-ray Standing Wave Technique" (2013), Chap. 13.
+
+import numpy as np
+
+
+## Structure factors F_0, F_H and F_Hbar of a unit cell.
+# All atoms are summed with one broadcasted exp(2*pi*i h.r) evaluation, and one
+# call can serve many reflections and photon energies.
+# hkl:         (3,) or (n_refl, 3) Miller indices
+# coordinates: (n_atoms, 3) fractional atomic coordinates
+# species:     (n_atoms,) index of the atomic species of each atom
+# f_forward:   (n_species, ...) forward scattering factors f1 + i*f2
+# f_H:         (n_species, ...) or (n_species, n_refl, ...) scattering factors f0 - Z + f1 + i*f2
+# DW:          (n_species,) or (n_species, n_refl) Debye-Waller exponents
+# The trailing dimensions (...) are typically photon energies.
+def structure_factors(hkl, coordinates, species, f_forward, f_H, DW=0.0):
+    hkl = np.asarray(hkl, dtype=float)
+    single_reflection = hkl.ndim == 1
+    hkl = np.atleast_2d(hkl)
+    f_forward = np.asarray(f_forward, dtype=complex)
+    f_H = np.asarray(f_H, dtype=complex)
+    n_species = f_forward.shape[0]
+    if f_H.ndim == 1:
+        f_H = f_H[:, np.newaxis]  # same value for all reflections
+
+    # occupation[atom, s] is True if the atom belongs to the species s
+    occupation = species[:, np.newaxis] == np.arange(n_species)[np.newaxis, :]
+    # geometric factor of each species: sum of exp(2*pi*i h.r) over its atoms, (n_refl, n_species)
+    geometric = np.exp(2j * np.pi * hkl.dot(coordinates.T)).dot(occupation)
+    DW = np.asarray(DW, dtype=float)
+    if DW.ndim == 1:
+        DW = DW[:, np.newaxis]  # same value for all reflections
+    DW_factor = np.exp(-np.broadcast_to(DW, (n_species, hkl.shape[0])))
+    trailing = (1, ) * (f_H.ndim - 2)
+    weight_H = (geometric.T * DW_factor).reshape(DW_factor.shape + trailing)
+    weight_Hbar = (np.conj(geometric).T * DW_factor).reshape(DW_factor.shape + trailing)
+
+    F_0 = np.tensordot(occupation.sum(axis=0), f_forward, axes=1)
+    F_H = np.sum(f_H * weight_H, axis=0)
+    F_Hbar = np.sum(f_H * weight_Hbar, axis=0)
+    if single_reflection:
+        F_H = F_H[0]
+        F_Hbar = F_Hbar[0]
+    return F_0, F_H, F_Hbar
+
+
+## Computes eta and both branches of EH/E0 for an array of photon energies.
+# energy:    photon energies relative to the Bragg energy (eV)
+# E_bragg:   Bragg energy (eV)
+# sin_theta: sine of the Bragg angle (may be complex for the monochromator)
+# b, P:      asymmetry and polarization factors
+# gamma:     r_e * lambda**2 / (pi * V)
+# F_0, F_H, F_Hbar: structure factors
+# Returns a dict of arrays with the same length as energy.
+def dynamical_branches(energy, E_bragg, sin_theta, b, P, gamma, F_0, F_H,
+                       F_Hbar):
+    energy = np.asarray(energy, dtype=float)
+    eta = ( 2*b*( energy/E_bragg )*sin_theta**2 + gamma*F_0*(1-b)/2 )\
+      / ( np.absolute(P)*gamma*np.sqrt(np.absolute(b)*F_H*F_Hbar) )
+    sqrt_eta = np.sqrt(eta**2 - 1)
+    prefactor = -1 * (P / np.absolute(P)) * np.sqrt(
+        np.absolute(b) * F_H / F_Hbar)
+    EH_over_EO_plus = prefactor * (eta + sqrt_eta)
+    EH_over_EO_minus = prefactor * (eta - sqrt_eta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        phi_plus = np.arctan(
+            np.imag(EH_over_EO_plus) / np.real(EH_over_EO_plus))
+        phi_minus = np.arctan(
+            np.imag(EH_over_EO_minus) / np.real(EH_over_EO_minus))
+    return {
+        'eta': eta,
+        'EH_over_EO_plus': EH_over_EO_plus,
+        'EH_over_EO_minus': EH_over_EO_minus,
+        'phi_plus': phi_plus,
+        'phi_minus': phi_minus,
+        'refl_plus': np.absolute(EH_over_EO_plus)**2,
+        'refl_minus': np.absolute(EH_over_EO_minus)**2
+    }
+
+
+## Energy width of the total-reflection region (-1 < eta < 1) and energy of its center (eta = 0),
+# both in eV and relative to E_bragg. Same arguments as dynamical_branches.
+def darwin_width_and_center(E_bragg, sin_theta, b, P, gamma, F_0, F_H, F_Hbar):
+    # eta is linear in the energy: eta = (energy - center) / (width / 2)
+    scale = E_bragg / (2 * b * sin_theta**2)
+    width = 2 * np.absolute(
+        np.absolute(P) * gamma * np.sqrt(np.absolute(b) * F_H * F_Hbar) *
+        scale)
+    center = np.real(-gamma * F_0 * (1 - b) / 2 * scale)
+    return width, center
+
+
+## Index of the last energy for which Re(eta) > 0, i.e. where the two branches swap.
+# Returns -1 if Re(eta) is never positive on the grid.
+def critical_point_index(eta):
+    positive = np.nonzero(np.real(eta) > 0)[0]
+    if len(positive) == 0:
+        return -1
+    return positive[-1]
+
+
+## Reflectivity and phase of the sample crystal.
+# The plus branch is used on the side of the critical point where it stays
+# physically meaningful (0 <= R <= 1), the minus branch on the other side.
+# The phase is shifted by pi when Re(EH/E0) > 0 for pi-polarization, or when
+# Re(EH/E0) < 0 for sigma-polarization (Zegenhagen 1993 Eq. 2.10, 2.11).
+def sample_reflectivity_and_phase(branches, pi_polarization):
+    n = len(branches['eta'])
+    critical_index = critical_point_index(branches['eta'])
+    left_side = np.arange(n) <= critical_index
+
+    refl_plus = branches['refl_plus']
+    plus_is_unphysical = (refl_plus < 0) | (refl_plus > 1)
+    plus_on_left_side = not np.any(plus_is_unphysical[left_side])
+    use_plus = left_side if plus_on_left_side else ~left_side
+
+    refl = np.where(use_plus, refl_plus, branches['refl_minus'])
+    phase = np.where(use_plus, branches['phi_plus'], branches['phi_minus'])
+    EH_real = np.where(use_plus, np.real(branches['EH_over_EO_plus']),
+                       np.real(branches['EH_over_EO_minus']))
+    if pi_polarization:
+        pi_shift = EH_real > 0
+    else:
+        pi_shift = EH_real < 0
+    phase = phase + np.pi * pi_shift
+    return refl, phase
+
+
+## Reflectivity and phase of the monochromator crystal.
+# The minus branch is used wherever 0 < R < 1, the plus branch elsewhere.
+# Only the reflectivity is used later on, the phase is kept for reference.
+def monochromator_reflectivity_and_phase(branches):
+    refl_minus = branches['refl_minus']
+    use_minus = (refl_minus > 0) & (refl_minus < 1)
+    refl = np.where(use_minus, refl_minus, branches['refl_plus'])
+    phase = np.where(
+        use_minus, branches['phi_minus'] +
+        np.pi * (np.real(branches['EH_over_EO_plus']) < 0),
+        branches['phi_plus'])
+    return refl, phase
@@ -0,0 +1,546 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+## Fitting procedures of the reflectivity and of the electron yield which do
+# not depend on the GUI. The models come from pyModel.
+
+import time
+import lmfit
+import numpy as np
+from scipy import optimize, sparse
+from scipy.fft import next_fast_len
+
+from pyModel import yield_model
+
+
+## Same attributes as the lmfit.minimize() result used by Torricelli, for fits done without lmfit
+class FitResult(object):
+
+    def __init__(self, params, chisqr, ndata, nfev, message):
+        self.params = params
+        self.chisqr = chisqr
+        self.ndata = ndata
+        self.nvarys = len([p for p in params.values() if p.vary])
+        self.nfree = ndata - self.nvarys
+        self.redchi = chisqr / self.nfree if self.nfree > 0 else np.nan
+        self.nfev = nfev
+        self.success = True
+        self.message = message
+
+
+## Weighted linear least squares: minimizes sum(((y - coefficients.design) / sigma)**2)
+# design: (n_coefficients, n_points)
+# Returns the coefficients, their unscaled covariance (inverse of the normal matrix) and chi^2
+def weighted_linear_least_squares(design, y, sigma):
+    A = (design / sigma).T
+    b = y / sigma
+    coefficients, _, rank, _ = np.linalg.lstsq(A, b, rcond=None)
+    if rank < A.shape[1]:
+        raise np.linalg.LinAlgError('The linear problem is singular.')
+    chisqr = np.sum((b - A.dot(coefficients))**2)
+    return coefficients, np.linalg.inv(A.T.dot(A)), chisqr
+
+
+## Design matrix of the electron yield for the coefficients
+# (N, N*Sr, N*Fc*cos(2*pi*Pc), N*Fc*sin(2*pi*Pc)), from a (4, ...) basis of pyModel.YieldBasis
+def yield_design_matrix(basis, Si, Psi):
+    cos_psi, sin_psi = np.cos(Psi), np.sin(Psi)
+    return np.array([
+        basis[0], basis[1],
+        2 * Si * (cos_psi * basis[2] - sin_psi * basis[3]),
+        2 * Si * (sin_psi * basis[2] + cos_psi * basis[3])
+    ])
+
+
+## Solves the yield fit with Sr, Si and Psi known (or Sr as a free, linear parameter).
+# y, sigma: experimental yield and its errors (ones for an unweighted fit)
+# N: None if free, else its fixed value
+# Sr: None if free, else its fixed value
+# Returns dict of values, covariance of (Fc, Pc[, N][, Sr]) in that order, the names, chi^2
+# and the linear coefficients with their unscaled covariance.
+def solve_yield_linear(basis, y, sigma, Si, Psi, N=None, Sr=None):
+    columns = dict(enumerate(yield_design_matrix(basis, Si, Psi)))
+    target = np.array(y, dtype=float)
+    if Sr is not None:
+        columns[0] = columns[0] + Sr * columns.pop(1)
+    if N is not None:
+        target -= N * columns.pop(0)
+    rows = sorted(columns)
+    design = np.array([columns[row] for row in rows])
+    coefficients, cov_a, chisqr = weighted_linear_least_squares(
+        design, target, sigma)
+    values, jacobian, names = yield_parameters_from_coefficients(
+        dict(zip(rows, coefficients)), rows, N)
+    return {
+        'names': names,
+        'values': values,
+        'jacobian': jacobian,
+        'coefficients': coefficients,
+        'cov_coefficients': cov_a,
+        'design': design,
+        'target': target,
+        'chisqr': chisqr
+    }
+
+
+## Transforms the linear coefficients back to (Fc, Pc[, N][, Sr]).
+# Also returns the Jacobian d(parameters)/d(coefficients), used to propagate the covariance.
+def yield_parameters_from_coefficients(a, rows, N=None):
+    index = dict((row, i) for i, row in enumerate(rows))
+    a_c, a_s = a[2], a[3]
+    r = np.hypot(a_c, a_s)
+    if N is None:
+        N = a[0]
+    names = ['Fc', 'Pc']
+    values = [r / N, (np.arctan2(a_s, a_c) / (2 * np.pi)) % 1]
+    jacobian = np.zeros((2, len(rows)))
+    jacobian[0, index[2]] = a_c / (r * N)
+    jacobian[0, index[3]] = a_s / (r * N)
+    jacobian[1, index[2]] = -a_s / (2 * np.pi * r**2)
+    jacobian[1, index[3]] = a_c / (2 * np.pi * r**2)
+    if 0 in index:
+        jacobian[0, index[0]] = -r / N**2
+        names.append('N')
+        values.append(N)
+        row = np.zeros(len(rows))
+        row[index[0]] = 1
+        jacobian = np.vstack([jacobian, row])
+    if 1 in index:
+        names.append('Sr')
+        values.append(a[1] / N)
+        row = np.zeros(len(rows))
+        row[index[1]] = 1 / N
+        if 0 in index:
+            row[index[0]] = -a[1] / N**2
+        jacobian = np.vstack([jacobian, row])
+    return np.array(values), jacobian, names
+
+
+## Fit of the electron yield without iterations on Fc, Pc, N (and Sr).
+# The yield is linear in N, N*Fc*cos(2*pi*Pc), N*Fc*sin(2*pi*Pc) (and N*Sr): it is solved
+# as a weighted linear least-squares problem and transformed back with propagated covariances.
+# gamma is not fitted: the GUI only frees it when Fc and Pc are fixed.
+# The objective is the one of yield_residuals: sum((y - N*model)^2) for unit errors.
+# params: lmfit.Parameters with Fc, Pc, N, Delta, Sr and gamma, as built by fit_ElYield
+# Returns a FitResult with the same params as lmfit.minimize would.
+def fit_yield_linear(params, basis, y, sigma, Si, Psi):
+    N = None if params['N'].vary else params['N'].value
+    if params['Sr'].vary:
+        solution = solve_yield_linear(basis, y, sigma, Si, Psi, N=N)
+    else:
+        solution = solve_yield_linear(basis, y, sigma, Si, Psi, N=N,
+                                      Sr=params['Sr'].value)
+
+    ndata = len(y)
+    nvarys = len(solution['values'])
+    redchi = solution['chisqr'] / (ndata - nvarys) if ndata > nvarys else np.nan
+    # like lmfit (scale_covar=True), the covariance is scaled by the reduced chi^2
+    covariance = solution['jacobian'].dot(
+        solution['cov_coefficients']).dot(solution['jacobian'].T) * redchi
+
+    result_params = params.copy()
+    for name in result_params:
+        result_params[name].vary = name in solution['names']
+        result_params[name].stderr = None
+        result_params[name].correl = None
+    stderr = np.sqrt(np.abs(np.diag(covariance)))
+    for i, name in enumerate(solution['names']):
+        result_params[name].value = float(solution['values'][i])
+        result_params[name].stderr = float(stderr[i])
+        result_params[name].correl = dict(
+            (other, float(covariance[i, j] / (stderr[i] * stderr[j])))
+            for j, other in enumerate(solution['names']) if j != i)
+    return FitResult(result_params, solution['chisqr'], ndata, 1,
+                     'Linear least-squares solution.')
+
+
+## Weighted residuals (y - N*model) / sigma of the electron yield, as Torricelli.residual_ey
+# with the Monte Carlo errors. With unit errors, sum((y - N*model)^2) is minimised, not the
+# sum((y/N - model)^2) of Torricelli.residual_ey when the Monte Carlo errors are ignored.
+# params: lmfit.Parameters with Fc, Pc, N, Delta, Sr and gamma; basis: (4, n_points) sampled YieldBasis
+# Sr, Si and Psi come from ndp_from_gamma(gamma) -> (Sr, Si, Psi, ...) if gamma is free and Sr is not.
+def yield_residuals(params, basis, y, sigma, Si, Psi, ndp_from_gamma=None):
+    names = [name for name in YIELD_BATCH_NAMES if params[name].vary]
+    fixed = dict((name, params[name].value) for name in YIELD_BATCH_NAMES)
+    return yield_residuals_batch([[params[name].value for name in names]],
+                                 names, basis, y, sigma, Si, Psi, fixed,
+                                 ndp_from_gamma)[0]
+
+
+# Parameters of the electron yield which can be columns of yield_residuals_batch
+YIELD_BATCH_NAMES = ('Fc', 'Pc', 'N', 'Sr', 'gamma')
+
+
+## Weighted residuals of the electron yield for M parameter sets at once, (M, n_points).
+# parameters: (M, len(names)) array; names: its columns, among YIELD_BATCH_NAMES
+# fixed: dict of the values of the parameters which are not columns
+# Si, Psi: used unless gamma is a column; ndp_from_gamma: as in yield_residuals, and must
+# accept an array of gamma (pyModel.NonDipolarModel does).
+# The model is broadcast over the sampled basis: no Python loop over the parameter sets.
+def yield_residuals_batch(parameters, names, basis, y, sigma, Si, Psi,
+                          fixed=None, ndp_from_gamma=None):
+    parameters = np.atleast_2d(np.asarray(parameters, dtype=float))
+    values = dict(fixed or {})
+    for i, name in enumerate(names):
+        values[name] = parameters[:, i:i + 1]  # (M, 1) columns broadcast over the points
+    Sr = values['Sr']
+    if 'gamma' in names and 'Sr' not in names and ndp_from_gamma is not None:
+        Sr, Si, Psi = ndp_from_gamma(values['gamma'])[:3]
+    model = yield_model(basis, Sr, values['Fc'], values['Pc'], Si, Psi)
+    return (y - values['N'] * model) / sigma * np.ones((len(parameters), 1))
+
+
+# Default size of the chi^2 map (points along Fc and along Pc) and its largest Fc
+CHI2_MAP_SIZE = 500
+CHI2_MAP_FC_MAX = 1.2
+# Delta chi^2 of the 1 sigma (68.27 %) and 2 sigma (95.45 %) regions of 2 parameters
+CHI2_CONTOUR_DELTAS = (2.2958, 6.1801)
+
+
+## chi^2 of the electron yield for arrays of (Fc, Pc), with Sr, Si and Psi fixed.
+# The yield is N*(c + Fc*cos(2*pi*Pc)*d_c + Fc*sin(2*pi*Pc)*d_s) with c, d_c, d_s the rows of
+# yield_design_matrix, so chi^2 is a quadratic form in k = (1, Fc*cos(2*pi*Pc), Fc*sin(2*pi*Pc)):
+# once the 3x3 weighted Gram matrix of the rows is known, no sum over the points is left.
+# N: fixed value, or None to minimize chi^2 over N at each (Fc, Pc) (profile).
+# Fc, Pc: broadcastable arrays. Returns chi^2 and N, with the broadcast shape.
+def yield_chi2_map(basis, y, sigma, Sr, Si, Psi, Fc, Pc, N=None):
+    design = yield_design_matrix(basis, Si, Psi)
+    rows = np.array([design[0] + Sr * design[1], design[2], design[3]]) / sigma
+    b = y / sigma
+    gram = rows.dot(rows.T)
+    h = rows.dot(b)
+    Fc, Pc = np.broadcast_arrays(np.asarray(Fc, dtype=float),
+                                 np.asarray(Pc, dtype=float))
+    k = np.stack([np.ones_like(Fc), Fc * np.cos(2 * np.pi * Pc),
+                  Fc * np.sin(2 * np.pi * Pc)], axis=-1)
+    hk = k.dot(h)
+    kGk = np.einsum('...i,ij,...j->...', k, gram, k)
+    if N is None:
+        N = hk / kGk
+    else:
+        N = np.full_like(hk, N)
+    chisqr = b.dot(b) - 2 * N * hk + N**2 * kGk
+    return np.maximum(chisqr, 0), N  # rounding errors may go below 0 at a perfect fit
+
+
+## Reduced chi^2 of the electron yield on a (Fc, Pc) grid, for the chi^2 map of the EY fit tab.
+# Fc goes from 0 to Fc_max and Pc from 0 to 1; N is fixed, or profiled if None.
+# Returns a dict with the axes, the (n_Fc, n_Pc) maps of redchi and N, the position and value
+# of the minimum and the redchi levels of the 1 and 2 sigma contours. Like the covariance
+# of the fits (lmfit, scale_covar=True), the levels are scaled by the minimal reduced chi^2.
+def yield_chi2_landscape(basis, y, sigma, Sr, Si, Psi, N=None,
+                         n_Fc=CHI2_MAP_SIZE, n_Pc=CHI2_MAP_SIZE,
+                         Fc_max=CHI2_MAP_FC_MAX):
+    Fc = np.linspace(0, Fc_max, n_Fc)
+    Pc = np.linspace(0, 1, n_Pc)
+    chisqr, N_map = yield_chi2_map(basis, y, sigma, Sr, Si, Psi,
+                                   Fc[:, np.newaxis], Pc[np.newaxis, :], N)
+    nfree = len(y) - (3 if N is None else 2)
+    redchi = chisqr / nfree
+    i, j = np.unravel_index(np.argmin(redchi), redchi.shape)
+    return {
+        'Fc': Fc,
+        'Pc': Pc,
+        'redchi': redchi,
+        'N': N_map,
+        'minimum': (Fc[i], Pc[j], redchi[i, j]),
+        'levels': [redchi[i, j] * (1 + delta / nfree)
+                   for delta in CHI2_CONTOUR_DELTAS]
+    }
+
+
+## Residuals (y - DR) - Norm*T(E + DE; sigma) of the reflectivity for M parameter sets, (M, n_points).
+# parameters: (M, 4) array of (sigma, Norm, DR, DE), as the params of Torricelli.residuals_Refl
+# convolution: pyModel.ConvolutionEngine; refl: ideal sample reflectivity on its grid
+# Each distinct sigma is convolved once, all of them in one batch of FFTs.
+def reflectivity_residuals_batch(convolution, refl, energies, y, parameters):
+    parameters = np.atleast_2d(np.asarray(parameters, dtype=float))
+    sigma, Norm, DR, DE = parameters.T
+    sigmas, rows = np.unique(np.abs(sigma), return_inverse=True)
+    T = convolution.sample_rows(
+        convolution.convolve_sigmas(refl, sigmas),
+        np.asarray(energies)[np.newaxis, :] + DE[:, np.newaxis], rows)
+    return (y - DR[:, np.newaxis]) - Norm[:, np.newaxis] * T
+
+
+## Fit of the electron yield without the GUI: closed form (fit_yield_linear) if linear is True
+# and Fc and Pc are free, lmfit.minimize of yield_residuals otherwise.
+def fit_yield(params, basis, y, sigma, Si, Psi, ndp_from_gamma=None,
+              linear=False):
+    if linear and params['Fc'].vary and params['Pc'].vary:
+        return fit_yield_linear(params, basis, y, sigma, Si, Psi)
+    return lmfit.minimize(yield_residuals, params,
+                          args=(basis, y, sigma, Si, Psi, ndp_from_gamma))
+
+
+# Names of the parameters (sigma, Norm, DR, DE) of the reflectivity fit in its trace
+REFL_TRACE_NAMES = ('Sigma', 'Norm', 'Bgd', 'DeltaEn')
+
+
+## Reflectivity fit by variable projection.
+# The model Norm*T(E + DE; sigma) + DR is linear in Norm and DR: they are eliminated
+# analytically, and only (sigma, DE) are iterated, with the analytic derivatives of the
+# broadened curve T with respect to sigma and to the energy shift.
+# convolution: pyModel.ConvolutionEngine; refl: ideal sample reflectivity on its grid
+# energies, y: experimental photon energies (Bragg centered) and reflectivity
+# Returns a dict with 'params' (sigma, Norm, DR, DE), 'cov_x' (inverse of J^T J of the
+# four parameters, as returned by scipy.optimize.leastsq), 'fvec' (residuals), 'theory'
+# (Norm*T on the experimental points), 'nfev', 'njev', 'time' (s), 'success' and 'message'.
+# trace: optional pyFitTrace.FitTrace with REFL_TRACE_NAMES, which records every evaluation
+def fit_reflectivity_varpro(convolution, refl, energies, y, sigma0, DE0,
+                            trace=None):
+    start_time = time.perf_counter()
+    energies = np.asarray(energies, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ones = np.ones_like(y)
+
+    def sampled(x, derivatives):
+        sigma, DE = x
+        if derivatives:
+            curves = np.array(convolution.convolve_with_derivatives(refl, sigma))
+        else:
+            curves = convolution.convolve(refl, sigma)[np.newaxis]
+        return convolution.sample(curves, energies + DE)
+
+    def linear_solution(T):
+        design = np.array([T, ones])
+        coefficients, _, _, _ = np.linalg.lstsq(design.T, y, rcond=None)
+        return coefficients  # Norm, DR
+
+    def projected_residual(x):
+        T = sampled(x, False)[0]
+        Norm, DR = linear_solution(T)
+        residual = y - DR - Norm * T
+        if trace is not None:
+            trace.record([x[0], Norm, DR, x[1]], np.sum(residual**2))
+        return residual
+
+    def projected_jacobian(x):
+        T, dT_dsigma, dT_dE = sampled(x, True)
+        Norm = linear_solution(T)[0]
+        # Kaufman's approximation: derivative of the model at fixed linear parameters,
+        # projected on the orthogonal complement of span(T, 1)
+        Q, _ = np.linalg.qr(np.array([T, ones]).T)
+        J = -Norm * np.array([dT_dsigma, dT_dE]).T
+        return J - Q.dot(Q.T.dot(J))
+
+    outer = optimize.least_squares(projected_residual, [abs(sigma0), DE0],
+                                   jac=projected_jacobian,
+                                   bounds=([0, -np.inf], [np.inf, np.inf]),
+                                   x_scale='jac')
+    sigma, DE = outer.x
+    T, dT_dsigma, dT_dE = sampled(outer.x, True)
+    Norm, DR = linear_solution(T)
+    # Jacobian of the full residual (y - DR - Norm*T) with respect to (sigma, Norm, DR, DE)
+    J = -np.array([Norm * dT_dsigma, T, ones, Norm * dT_dE]).T
+    try:
+        cov_x = np.linalg.inv(J.T.dot(J))
+    except np.linalg.LinAlgError:
+        cov_x = None
+    return {
+        'params': np.array([sigma, Norm, DR, DE]),
+        'cov_x': cov_x,
+        'fvec': y - DR - Norm * T,
+        'theory': Norm * T,
+        'nfev': outer.nfev,
+        'njev': outer.njev,
+        'time': time.perf_counter() - start_time,
+        'success': outer.success,
+        'message': outer.message
+    }
+
+
+## Candidate Gaussian widths (eV) of the reflectivity initial guess
+REFL_GUESS_SIGMAS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.4)
+
+
+## Initial (sigma, Norm, DR, DE) of the reflectivity fit.
+# The experimental reflectivity is resampled on the step of the theoretical grid. For each
+# candidate sigma, its Pearson correlation with the broadened theory is computed for all shifts
+# at once by FFT cross-correlation (Norm and DR do not change the correlation). The best shift
+# is refined by a parabola through its neighbours, then Norm and DR come from a linear fit.
+# Returns None if the experimental range is wider than the theoretical one.
+def reflectivity_initial_guess(convolution, refl, energies, y,
+                               sigmas=REFL_GUESS_SIGMAS):
+    energies = np.asarray(energies, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.argsort(energies)
+    energies, y = energies[order], y[order]
+    step = convolution.step
+    m = int(np.floor((energies[-1] - energies[0]) / step)) + 1
+    n = convolution.n
+    if m < 3 or m > n - 2:
+        return None
+    u = np.interp(energies[0] + step * np.arange(m), energies, y)
+    u = u - u.mean()
+
+    curves = convolution.convolve_sigmas(refl, sigmas)  # (n_sigmas, n)
+    n_shifts = n - m + 1
+    n_fft = next_fast_len(n + m)
+    # cross[s, j] = sum_k curves[s, j + k] * u[k], for all shifts j
+    cross = np.fft.irfft(
+        np.fft.rfft(curves, n_fft, axis=-1) *
+        np.conj(np.fft.rfft(u, n_fft)), n_fft, axis=-1)[:, :n_shifts]
+    # sums of the curves and of their squares over each window of m points
+    cumsum = np.concatenate(
+        [np.zeros((len(sigmas), 1)),
+         np.cumsum(curves, axis=-1)], axis=-1)
+    cumsum2 = np.concatenate(
+        [np.zeros((len(sigmas), 1)),
+         np.cumsum(curves**2, axis=-1)], axis=-1)
+    window_sum = cumsum[:, m:] - cumsum[:, :n_shifts]
+    window_var = cumsum2[:, m:] - cumsum2[:, :n_shifts] - window_sum**2 / m
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = cross / np.sqrt(window_var * np.sum(u**2))
+    correlation[~np.isfinite(correlation)] = -np.inf
+
+    i_sigma, j = np.unravel_index(np.argmax(correlation), correlation.shape)
+    shift = float(j)
+    if 0 < j < n_shifts - 1:
+        left, center, right = correlation[i_sigma, j - 1:j + 2]
+        curvature = left - 2 * center + right
+        if np.isfinite(curvature) and curvature < 0:
+            shift += 0.5 * (left - right) / curvature
+    DE = convolution.energy[0] + shift * step - energies[0]
+    sigma = sigmas[i_sigma]
+    T = convolution.sample(curves[i_sigma], energies + DE)
+    Norm, DR = np.linalg.lstsq(np.array([T, np.ones_like(T)]).T, y,
+                               rcond=None)[0]
+    return sigma, Norm, DR, DE
+
+
+## Global fit of the electron yield of several slices (emission angles).
+# Fc and Pc (and gamma if fit_gamma) are shared by all the slices, N is fitted per slice,
+# and Sr, Si and Psi of each slice come from its non-dipolar model at gamma.
+# bases: list of (4, n_points) sampled YieldBasis, one per slice
+# ys, sigmas: lists of the yields and of their errors
+# models: list of pyModel.NonDipolarModel, (gamma) -> (Sr, Si, Psi, Q_0, Q_H)
+# fit_Fc, fit_Pc, fit_N: False to keep Fc, Pc or all the N at their start values
+# Sr: Sr of all the slices (manual Sr), None to take it from the models
+# The residuals of all the slices are stacked; the Jacobian is sparse, with dense columns for
+# the shared parameters and one diagonal block per N, and is solved iteratively (lsmr).
+# Returns a dict with 'names' (Fc, Pc[, gamma], N_0, N_1...), 'values', 'stderr' (nan for the
+# fixed parameters), 'covariance' (of the free parameters, scaled by the reduced chi^2, as lmfit),
+# 'chisqr', 'redchi', 'ndata', 'nfev', 'fvec', 'success' and 'message'.
+# Fc is returned positive and Pc in [0, 1).
+def fit_yield_global(bases, ys, sigmas, models, Fc0, Pc0, N0, gamma0,
+                     fit_gamma=False, fit_Fc=True, fit_Pc=True, fit_N=True,
+                     Sr=None):
+    n_slices = len(bases)
+    sizes = [len(y) for y in ys]
+    n_shared = 3 if fit_gamma else 2
+    sigma = np.concatenate(sigmas)
+    y = np.concatenate(ys)
+    start = np.array([Fc0, Pc0] + ([gamma0] if fit_gamma else []) + list(N0),
+                     dtype=float)
+    free = np.flatnonzero([fit_Fc, fit_Pc] + ([True] if fit_gamma else []) +
+                          [fit_N] * n_slices)
+
+    def slice_parameters(gamma):
+        parameters = [model(gamma)[:3] for model in models]
+        if Sr is not None:
+            parameters = [(Sr, Si, Psi) for _, Si, Psi in parameters]
+        return parameters
+
+    def models_and_derivatives(x):
+        Fc, Pc = x[0], x[1]
+        gamma = x[2] if fit_gamma else gamma0
+        ndp = slice_parameters(gamma)
+        curves = []
+        for basis, (Sr, Si, Psi) in zip(bases, ndp):
+            shift = Psi - 2 * np.pi * Pc
+            oscillation = np.cos(shift) * basis[2] - np.sin(shift) * basis[3]
+            quadrature = np.sin(shift) * basis[2] + np.cos(shift) * basis[3]
+            curves.append((basis[0] + Sr * basis[1] + 2 * Fc * Si * oscillation,
+                           2 * Si * oscillation,
+                           4 * np.pi * Fc * Si * quadrature))
+        return [np.concatenate(c) for c in zip(*curves)]
+
+    def d_model_d_gamma(x):
+        step = 1e-6 * max(abs(x[2]), 1.0)
+        up, down = np.array(x, dtype=float), np.array(x, dtype=float)
+        up[2] += step
+        down[2] -= step
+        return (models_and_derivatives(up)[0] -
+                models_and_derivatives(down)[0]) / (2 * step)
+
+    def N_of_points(x):
+        return np.repeat(x[n_shared:], sizes)
+
+    # x: all the parameters; the optimizer only sees x[free]
+    def all_parameters(x_free):
+        x = start.copy()
+        x[free] = x_free
+        return x
+
+    def residual(x):
+        return (y - N_of_points(x) * models_and_derivatives(x)[0]) / sigma
+
+    def jacobian(x):
+        model, d_Fc, d_Pc = models_and_derivatives(x)
+        N = N_of_points(x)
+        shared = [-N * d_Fc / sigma, -N * d_Pc / sigma]
+        if fit_gamma:
+            shared.append(-N * d_model_d_gamma(x) / sigma)
+        # one column per slice for its N, non-zero on the points of that slice only
+        rows = np.arange(len(y))
+        columns = np.repeat(np.arange(n_slices), sizes)
+        blocks = sparse.csr_matrix((-model / sigma, (rows, columns)),
+                                   shape=(len(y), n_slices))
+        return sparse.hstack([sparse.csr_matrix(np.array(shared).T),
+                              blocks]).tocsr()[:, free]
+
+    outer = optimize.least_squares(
+        lambda x_free: residual(all_parameters(x_free)), start[free],
+        jac=lambda x_free: jacobian(all_parameters(x_free)), method='trf',
+        tr_solver='lsmr', x_scale='jac')
+    x = all_parameters(outer.x)
+    if x[0] < 0:  # same yield with a positive Fc
+        x[0], x[1] = -x[0], x[1] + 0.5
+    x[1] = x[1] % 1
+    fvec = residual(x)
+    chisqr = np.sum(fvec**2)
+    ndata = len(y)
+    redchi = chisqr / (ndata - len(free)) if ndata > len(free) else np.nan
+    J = jacobian(x).toarray()
+    stderr = np.full(len(x), np.nan)
+    try:
+        covariance = np.linalg.inv(J.T.dot(J)) * redchi
+        stderr[free] = np.sqrt(np.abs(np.diag(covariance)))
+    except np.linalg.LinAlgError:
+        covariance = None
+    names = ['Fc', 'Pc'] + (['gamma'] if fit_gamma else []) + [
+        'N_%i' % i for i in range(n_slices)
+    ]
+    return {
+        'names': names,
+        'values': x,
+        'stderr': stderr,
+        'covariance': covariance,
+        'chisqr': chisqr,
+        'redchi': redchi,
+        'ndata': ndata,
+        'nfev': outer.nfev,
+        'fvec': fvec,
+        'success': outer.success,
+        'message': outer.message
+    }
@@ -0,0 +1,96 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+## In-memory trace of a fit: every tested parameter vector and its chi^2, and free text lines.
+# Nothing is written while the optimizer runs: the log file is written once per fit by
+# flush(), and the GUI collects the new lines at most every GUI_UPDATE_INTERVAL seconds.
+
+import time
+import numpy as np
+
+# Minimum time (s) between two updates of the GUI view of a trace
+GUI_UPDATE_INTERVAL = 0.5
+
+
+class FitTrace(object):
+
+    def __init__(self, names, capacity=1024):
+        self.names = list(names)
+        # one row per evaluation: the parameters, then chi^2 (NaN if unknown)
+        self.values = np.empty((capacity, len(self.names) + 1))
+        self.n_evaluations = 0
+        # in order: int entries are rows of self.values, str entries are text lines
+        self.entries = []
+        self._n_flushed = 0
+        self._n_shown = 0
+        self._last_gui_update = 0.0
+
+    ## Records one evaluation of the fit function
+    def record(self, values, chisqr=np.nan):
+        if self.n_evaluations == len(self.values):
+            self.values = np.concatenate(
+                [self.values, np.empty_like(self.values)])
+        self.values[self.n_evaluations, :-1] = values
+        self.values[self.n_evaluations, -1] = chisqr
+        self.entries.append(self.n_evaluations)
+        self.n_evaluations += 1
+
+    ## Records a line of text
+    def message(self, text):
+        self.entries.append(str(text))
+
+    ## (n_evaluations, n_parameters + 1) array of the parameters and chi^2 of all evaluations
+    def evaluations(self):
+        return self.values[:self.n_evaluations]
+
+    ## Log line of an entry, 'name=value' separated by tabulations for an evaluation
+    def format(self, entry):
+        if isinstance(entry, str):
+            return entry
+        row = self.values[entry]
+        line = '\t'.join(name + '=' + str(value)
+                         for name, value in zip(self.names, row[:-1]))
+        if np.isfinite(row[-1]):
+            line += '\tchi2=' + str(row[-1])
+        return line
+
+    ## True if the GUI view was not updated for GUI_UPDATE_INTERVAL seconds
+    def gui_update_due(self):
+        return time.perf_counter(
+        ) - self._last_gui_update >= GUI_UPDATE_INTERVAL
+
+    ## Lines not shown in the GUI yet
+    def take_new_lines(self):
+        lines = [self.format(entry) for entry in self.entries[self._n_shown:]]
+        self._n_shown = len(self.entries)
+        self._last_gui_update = time.perf_counter()
+        return lines
+
+    ## Appends the lines not written yet to the log file, in one write
+    def flush(self, path):
+        lines = [
+            self.format(entry) for entry in self.entries[self._n_flushed:]
+        ]
+        if lines:
+            with open(path, 'a') as log_file:
+                log_file.write('\n'.join(lines) + '\n')
+        self._n_flushed = len(self.entries)
@@ -0,0 +1,317 @@
+# python3
+# -*- coding: utf-8 -*-
+
+#    Copyright (c) 2010 Giuseppe Mercurio
+#    Copyright (c) 2013-2024 Francois C. Bocquet
+#    Copyright (c) 2014-2018 Markus Franke
+#    Copyright (c) 2026 Sergey Subach
+#    This file is part of Torricelli.
+#
+#    Torricelli is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    any later version.
+#
+#    Torricelli is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Torricelli.  If not, see <http://www.gnu.org/licenses/>.
+
+## Models of the measured reflectivity and electron yield.
+# The ideal curves of the sample are cross-correlated with the squared
+# reflectivity of the monochromator and broadened by a Gaussian (sigma).
+# Both operations are done at once in Fourier space on the theoretical grid.
+
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+from scipy.fft import next_fast_len
+
+# Number of interpolation operators (sets of experimental energies and Delta E) kept by a ConvolutionEngine
+INTERPOLATION_CACHE_SIZE = 8
+
+
+## Uniform theoretical energy grid, symmetric around 0, with exactly one point at E=0.
+# half_range: the grid spans [-half_range, half_range], rounded up to a multiple of step
+def symmetric_energy_grid(half_range, step):
+    n = int(np.ceil(round(half_range / step, 6)))
+    return step * np.arange(-n, n + 1)
+
+
+# Theoretical grid: points per Darwin width (or per 2.5 sigma) of the narrowest feature,
+# Darwin widths (and sigmas) kept on each side for the support of the convolution kernels,
+# and largest number of points
+GRID_POINTS_PER_WIDTH = 15
+GRID_KERNEL_SUPPORT = 3
+GRID_MAX_POINTS = 20001
+
+
+## Plans the theoretical energy grid from the Darwin widths of the crystals and the Gaussian sigma.
+# widths, centers: Darwin widths and centers (eV) of the sample and of the monochromator
+# sigma: fitted Gaussian broadening (eV), 0 if unknown
+# experimental_energies: experimental photon energies relative to E_bragg, empty if not imported yet
+# default_half_range: half range set in the GUI, used when no experimental energies are known
+# delta_E: offset (eV) applied to the experimental energies by the fit, kept as headroom
+# manual: use default_half_range even if experimental energies are known
+# Returns (half_range, step): the step resolves the narrowest of the Darwin curves and of the
+# Gaussian, and the range covers the experimental span, the refraction shifts and the support
+# of the monochromator and Gaussian kernels, plus the offset.
+def plan_energy_grid(widths, centers, sigma=0.0, experimental_energies=(),
+                     default_half_range=10.0, delta_E=0.0, manual=False):
+    sigma = abs(sigma)
+    narrowest = min(widths)
+    if sigma > 0:
+        narrowest = min(narrowest, 2.5 * sigma)
+    step = narrowest / GRID_POINTS_PER_WIDTH
+
+    if len(experimental_energies) > 0 and not manual:
+        half_range = np.max(np.abs(experimental_energies)) + np.max(
+            np.abs(centers)) + GRID_KERNEL_SUPPORT * (max(widths) + sigma)
+    else:
+        half_range = default_half_range
+    half_range += abs(delta_E)
+    if 2 * half_range / step + 1 > GRID_MAX_POINTS:
+        step = 2 * half_range / (GRID_MAX_POINTS - 1)
+    return half_range, step
+
+
+## Linear interpolation from a uniform grid to the given energies, as a sparse (n_energies, n_grid) matrix.
+# Each row has two non-zeros. Raises ValueError outside the grid, like scipy.interpolate.interp1d.
+def interpolation_matrix(grid, energies):
+    energies = np.asarray(energies, dtype=float)
+    n = len(grid)
+    step = grid[1] - grid[0]
+    if np.any(energies < grid[0]):
+        raise ValueError("A value in x_new is below the interpolation range.")
+    if np.any(energies > grid[-1]):
+        raise ValueError("A value in x_new is above the interpolation range.")
+    position = (energies - grid[0]) / step
+    left = np.clip(np.floor(position).astype(int), 0, n - 2)
+    weight = position - left
+    rows = np.repeat(np.arange(len(energies)), 2)
+    columns = np.column_stack([left, left + 1]).ravel()
+    values = np.column_stack([1 - weight, weight]).ravel()
+    return sparse.csr_matrix((values, (rows, columns)),
+                             shape=(len(energies), n))
+
+
+## Cross-correlation with the monochromator and Gaussian broadening through FFTs.
+# The spectrum of the monochromator kernel is computed once per theoretical
+# calculation; the Gaussian is applied analytically in Fourier space, so a new
+# sigma costs one forward and one inverse real FFT.
+# energy: uniform grid of the theoretical curves, containing E=0 (see symmetric_energy_grid)
+# monochromator_kernel: the normalized squared reflectivity of the monochromator on that grid
+class ConvolutionEngine(object):
+
+    def __init__(self, energy, monochromator_kernel):
+        self.energy = np.asarray(energy, dtype=float)
+        self.n = len(self.energy)
+        self.step = self.energy[1] - self.energy[0]
+        zero = -self.energy[0] / self.step
+        if abs(zero - round(zero)) > 1e-6:
+            raise ValueError('The theoretical grid must contain E=0.')
+        self.zero_index = int(round(zero))
+
+        # Zero padding: no wrap-around of the correlation nor of the Gaussian tails
+        self.n_fft = next_fast_len(3 * self.n)
+        # np.correlate(a, M, 'full') at the lag L=j-zero_index is, for the point j of the
+        # grid, a convolution with kernel[d] = M[zero_index - d]
+        kernel = np.zeros(self.n_fft)
+        d = self.zero_index - np.arange(self.n)
+        kernel[d % self.n_fft] = monochromator_kernel
+        self.kernel_spectrum = np.fft.rfft(kernel)
+        self.frequency = np.fft.rfftfreq(self.n_fft, self.step)
+        self._gaussian_sigma = None
+        self._gaussian_spectrum = None
+        self._interpolation_operators = OrderedDict()
+
+    ## Fourier transform of the normalized Gaussian sampled on the grid (aliases included)
+    def gaussian_spectrum(self, sigma):
+        sigma = abs(float(sigma))
+        if sigma != self._gaussian_sigma:
+            self._gaussian_spectrum = self._gaussian_spectrum_and_derivative(
+                sigma)[0]
+            self._gaussian_sigma = sigma
+        return self._gaussian_spectrum
+
+    ## Gaussian spectrum and its derivative with respect to sigma
+    def _gaussian_spectrum_and_derivative(self, sigma):
+        if sigma < 1e-3 * self.step:  # narrower than the grid: no broadening
+            return np.ones_like(self.frequency), np.zeros_like(self.frequency)
+        # aliases m/step of the sampled Gaussian, until they fall below 1e-16
+        n_alias = int(np.ceil(1.4 * self.step / sigma)) + 1
+        m = np.arange(-n_alias, n_alias + 1)[:, np.newaxis] / self.step
+        terms = np.exp(-2 * (np.pi * sigma * (self.frequency - m))**2)
+        norm_terms = np.exp(-2 * (np.pi * sigma * m)**2)
+        numerator = np.sum(terms, axis=0)
+        norm = np.sum(norm_terms)
+        d_numerator = -4 * np.pi**2 * sigma * np.sum(
+            (self.frequency - m)**2 * terms, axis=0)
+        d_norm = -4 * np.pi**2 * sigma * np.sum(m**2 * norm_terms)
+        return numerator / norm, (d_numerator * norm -
+                                  numerator * d_norm) / norm**2
+
+    ## Correlated with the monochromator and broadened curve(s), on the theoretical grid.
+    # curves: (n,) or (n_curves, n) arrays on the theoretical grid
+    def convolve(self, curves, sigma=0.0):
+        spectrum = np.fft.rfft(curves, self.n_fft, axis=-1)
+        spectrum *= self.kernel_spectrum * self.gaussian_spectrum(sigma)
+        return np.fft.irfft(spectrum, self.n_fft, axis=-1)[..., :self.n]
+
+    ## One curve convolved with each of several sigmas at once, (n_sigmas, n) on the theoretical grid
+    def convolve_sigmas(self, curve, sigmas):
+        spectrum = np.fft.rfft(curve, self.n_fft) * self.kernel_spectrum
+        gaussians = np.array([
+            self._gaussian_spectrum_and_derivative(abs(float(sigma)))[0]
+            for sigma in sigmas
+        ])
+        return np.fft.irfft(spectrum * gaussians, self.n_fft,
+                            axis=-1)[:, :self.n]
+
+    ## Convolved curve(s) with their derivatives with respect to sigma and to the energy.
+    # Returns three arrays shaped like curves, on the theoretical grid.
+    def convolve_with_derivatives(self, curves, sigma):
+        sigma = abs(float(sigma))
+        gaussian, d_gaussian = self._gaussian_spectrum_and_derivative(sigma)
+        spectrum = np.fft.rfft(curves, self.n_fft, axis=-1) * self.kernel_spectrum
+        d_energy = 2j * np.pi * self.frequency
+        d_energy[-1] = 0  # Nyquist frequency of an even length: no derivative
+        return tuple(
+            np.fft.irfft(spectrum * factor, self.n_fft, axis=-1)[..., :self.n]
+            for factor in (gaussian, d_gaussian, d_energy * gaussian))
+
+    ## Sparse interpolation operator to the given energies (experimental energies + Delta E).
+    # Operators are cached, and only rebuilt for energies not seen recently.
+    def interpolation_operator(self, energies):
+        energies = np.asarray(energies, dtype=float)
+        key = energies.tobytes()
+        operator = self._interpolation_operators.get(key)
+        if operator is None:
+            operator = interpolation_matrix(self.energy, energies)
+            self._interpolation_operators[key] = operator
+            if len(self._interpolation_operators) > INTERPOLATION_CACHE_SIZE:
+                self._interpolation_operators.popitem(last=False)
+        else:
+            self._interpolation_operators.move_to_end(key)
+        return operator
+
+    ## Linear interpolation of curve(s) of the theoretical grid at the given energies.
+    # curves: (n,) or a stack (n_curves, n), interpolated with one sparse product.
+    # Raises ValueError outside the grid, like scipy.interpolate.interp1d.
+    def sample(self, curves, energies):
+        operator = self.interpolation_operator(energies)
+        curves = np.asarray(curves, dtype=float)
+        if curves.ndim == 1:
+            return operator.dot(curves)
+        return operator.dot(curves.T).T
+
+    ## Linear interpolation of curves at energies of their own, for many parameter sets at once.
+    # curves: (n_curves, n) on the theoretical grid; energies: (M, n_points)
+    # rows: (M,) index of the curve of each set of energies (0 to M-1 if None)
+    # Returns (M, n_points). Raises ValueError outside the grid, like sample().
+    def sample_rows(self, curves, energies, rows=None):
+        curves = np.atleast_2d(np.asarray(curves, dtype=float))
+        energies = np.asarray(energies, dtype=float)
+        if np.any(energies < self.energy[0]):
+            raise ValueError("A value in x_new is below the interpolation range.")
+        if np.any(energies > self.energy[-1]):
+            raise ValueError("A value in x_new is above the interpolation range.")
+        if rows is None:
+            rows = np.arange(len(energies))
+        position = (energies - self.energy[0]) / self.step
+        left = np.clip(np.floor(position).astype(int), 0, self.n - 2)
+        weight = position - left
+        flat = curves.ravel()
+        index = np.asarray(rows)[:, np.newaxis] * self.n + left
+        return (1 - weight) * flat[index] + weight * flat[index + 1]
+
+
+## The electron-yield model 1 + Sr*R + 2*Fc*Si*sqrt(R)*cos(phi - 2*pi*Pc + Psi)
+# is linear in the four curves 1, R, sqrt(R)*cos(phi) and sqrt(R)*sin(phi).
+# They are convolved once per sigma and sampled once per set of experimental
+# energies; a model evaluation is then a linear combination of four short arrays.
+class YieldBasis(object):
+
+    def __init__(self, convolution, refl, phase):
+        self.convolution = convolution
+        refl = np.asarray(refl, dtype=float)
+        sqrt_refl = np.sqrt(refl)
+        self.curves = np.array([
+            np.ones_like(refl), refl, sqrt_refl * np.cos(phase),
+            sqrt_refl * np.sin(phase)
+        ])
+        self._convolved_sigma = None
+        self._convolved = None
+        self._sampled_key = None
+        self._sampled = None
+
+    ## (4, n) basis on the theoretical grid, broadened with sigma
+    def convolved(self, sigma):
+        if sigma != self._convolved_sigma:
+            self._convolved = self.convolution.convolve(self.curves, sigma)
+            self._convolved_sigma = sigma
+        return self._convolved
+
+    ## (4, n_points) basis at the given (already shifted by Delta E) energies
+    def sampled(self, sigma, energies):
+        energies = np.asarray(energies, dtype=float)
+        key = (sigma, energies.tobytes())
+        if key != self._sampled_key:
+            self._sampled = self.convolution.sample(self.convolved(sigma),
+                                                    energies)
+            self._sampled_key = key
+        return self._sampled
+
+
+## Electron yield from a (4, ...) basis of YieldBasis
+def yield_model(basis, Sr, Fc, Pc, Si, Psi):
+    shift = Psi - 2 * np.pi * Pc
+    return basis[0] + Sr * basis[1] + 2 * Fc * Si * (
+        np.cos(shift) * basis[2] - np.sin(shift) * basis[3])
+
+
+## Polarization factor of the photoelectrons, P = sin(phi - 2*xi) / sin(phi), for pi-polarized light.
+# emission_angle (phi) and deviation_from_normal_incidence (xi) in degrees
+def electron_polarization_factor(emission_angle, deviation_from_normal_incidence):
+    phi = emission_angle * np.pi / 180
+    return np.sin(phi - 2 * deviation_from_normal_incidence * np.pi / 180) / np.sin(phi)
+
+
+## Non-dipolar parameters Sr, |Si|, Psi, Q_0 and Q_H from gamma, see
+# G. van Straaten et al. J. Elec. Spec. Relat. Phenom., 222, p106 (2018).
+# Delta: phase shift difference delta_d - delta_p (rad)
+# emission_angle (phi) and reflection_angle (2*xi) in rad
+# P_electrons: polarization factor of the photoelectrons
+def nondipolar_parameters(gamma, Delta, emission_angle, reflection_angle,
+                          P_electrons, pi_polarization=True):
+    if not pi_polarization:  # Both for dipole AND dipole+quadrupole!
+        return 1, 1, 0, 0, 0
+    Q_0 = gamma * np.cos(emission_angle) / 3.
+    Q_h = gamma * np.cos(emission_angle - reflection_angle) / 3.
+    Sr = P_electrons * P_electrons * (1 + Q_h) / (1 - Q_0)
+    S_I = P_electrons * (1 + (Q_h - Q_0) / 2. + 1j * np.tan(Delta) *
+                         (Q_h + Q_0) / 2.) / (1 - Q_0)
+    return Sr, np.abs(S_I), np.angle(S_I), Q_0, Q_h
+
+
+## Non-dipolar parameters of one emission angle as a function of gamma only.
+# Can be sent to other processes, unlike a closure on the GUI.
+class NonDipolarModel(object):
+
+    def __init__(self, Delta, emission_angle, reflection_angle, P_electrons,
+                 pi_polarization=True):
+        self.Delta = Delta
+        self.emission_angle = emission_angle
+        self.reflection_angle = reflection_angle
+        self.P_electrons = P_electrons
+        self.pi_polarization = pi_polarization
+
+    ## (Sr, |Si|, Psi, Q_0, Q_H)
+    def __call__(self, gamma):
+        return nondipolar_parameters(gamma, self.Delta, self.emission_angle,
+                                     self.reflection_angle, self.P_electrons,
+                                     self.pi_polarization)